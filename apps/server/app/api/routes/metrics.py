@@ -0,0 +1,121 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import PlainTextResponse
+
+from ...core.cache import cache_stats
+from ...core.config import settings
+from ...core.metrics import registry
+from ...core.upstream import pools
+from ...services import admission
+from ...services.github import http_cache_stats
+from ...services.rate_limit import github_scheduler
+
+router = APIRouter()
+
+
+def _cache_requests() -> dict[tuple[str, str], int]:
+    requests = {}
+    for namespace, stats in cache_stats()["namespaces"].items():
+        requests[(namespace, "hit")] = stats["hits"]
+        requests[(namespace, "miss")] = stats["misses"]
+    return requests
+
+
+# State the services already keep, read at scrape time
+registry.collected(
+    "pinpoint_github_in_flight",
+    "GitHub calls currently running.",
+    lambda: github_scheduler.in_flight,
+)
+registry.collected(
+    "pinpoint_github_queue_depth",
+    "GitHub calls waiting for a concurrency slot or rate-limit budget.",
+    lambda: github_scheduler.queue_depth,
+)
+registry.collected(
+    "pinpoint_github_concurrency_limit",
+    "Adaptive limit on concurrent GitHub calls.",
+    lambda: github_scheduler.concurrency_limit,
+)
+registry.collected(
+    "pinpoint_github_rate_limit_available_ratio",
+    "Share of each GitHub rate-limit budget left.",
+    lambda: {
+        (resource,): github_scheduler.available_share(resource)
+        for resource in github_scheduler.buckets
+    },
+    ("resource",),
+)
+registry.collected(
+    "pinpoint_github_http_cache_responses_total",
+    "GitHub responses by outcome against the conditional HTTP cache.",
+    lambda: {(outcome,): count for outcome, count in http_cache_stats.items()},
+    ("outcome",),
+    type="counter",
+)
+registry.collected(
+    "pinpoint_cache_requests_total",
+    "Shared cache lookups by namespace and result.",
+    _cache_requests,
+    ("namespace", "result"),
+    type="counter",
+)
+registry.collected(
+    "pinpoint_cache_backend_bytes",
+    "Bytes held by the shared cache backend, when it can tell.",
+    lambda: cache_stats()["backend"]["bytes"],
+)
+registry.collected(
+    "pinpoint_cache_backend_evictions_total",
+    "Entries the shared cache backend evicted to stay within its size.",
+    lambda: cache_stats()["backend"]["evictions"],
+    type="counter",
+)
+registry.collected(
+    "pinpoint_admission_active_searches",
+    "Searches holding an admission slot.",
+    lambda: admission.search_admission.active,
+)
+registry.collected(
+    "pinpoint_admission_queued_searches",
+    "Searches waiting in the admission queue.",
+    lambda: admission.search_admission.queued,
+)
+registry.collected(
+    "pinpoint_stage_in_flight",
+    "Search stages running under a process-wide concurrency limit.",
+    lambda: {
+        (stage,): limiter.in_flight for stage, limiter in admission.stage_limits.items()
+    },
+    ("stage",),
+)
+registry.collected(
+    "pinpoint_stage_waiting",
+    "Search stages waiting for their process-wide concurrency limit.",
+    lambda: {
+        (stage,): limiter.waiting for stage, limiter in admission.stage_limits.items()
+    },
+    ("stage",),
+)
+
+registry.collected(
+    "pinpoint_upstream_in_flight_requests",
+    "Requests to each upstream sent or waiting for a connection, not yet read.",
+    lambda: {(name,): pool.in_flight for name, pool in pools.items()},
+    ("upstream",),
+)
+registry.collected(
+    "pinpoint_upstream_max_connections",
+    "Connection limit of each upstream pool.",
+    lambda: {(name,): pool.limits.max_connections for name, pool in pools.items()},
+    ("upstream",),
+)
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics() -> PlainTextResponse:
+    """Prometheus metrics in the text exposition format."""
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return PlainTextResponse(
+        registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
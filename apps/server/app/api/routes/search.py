@@ -1,46 +1,313 @@
+import asyncio
+import logging
+import secrets
 import time
+from collections.abc import AsyncGenerator
+from contextlib import nullcontext
+from typing import Any
 
 from fastapi import APIRouter, Depends, HTTPException, Request
-from fastapi.responses import StreamingResponse
 
-from ...models import SearchRequest
-from ...services.gemini import generate_issue_queries, generate_streaming_answer
-from ...services.github import get_issues_with_comments, get_repository, search_issues
-from ...utils import check_repo_exists, event_message
+from ...core import tracing
+from ...core.cache import SharedCache
+from ...core.config import settings
+from ...core.metrics import (
+    StageTimer,
+    search_cancellations,
+    search_resumes,
+    searches,
+    server_timing,
+    stage_duration,
+)
+from ...core.singleflight import StreamFlight
+from ...core.sse import (
+    dumps,
+    encode_comment,
+    event_stream_response,
+    parse_event_id,
+    with_event_ids,
+)
+from ...exceptions.admission_exceptions import AdmissionRejected
+from ...models import BatchSearchRequest, SearchRequest
+from ...services import admission
+from ...services.admission import Ticket, client_id, retry_after_header
+from ...services.gemini import (
+    generate_issue_queries,
+    generate_streaming_answer,
+    plan_issue_queries,
+)
+from ...services.github import get_repository, stream_issues_with_comments
+from ...services.warmer import popularity
+from ...utils import check_repo_exists, event_message, remember_repo_exists
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+SearchEvent = tuple[str, Any]
+SearchCacheKey = tuple[str, str | None]
+
+# Recorded event sequences of completed searches, replayed on a cache hit
+search_cache: SharedCache[list[SearchEvent]] = SharedCache(
+    "search",
+    ttl=settings.SEARCH_CACHE_TTL_SECONDS,
+    stale_ttl=settings.SEARCH_CACHE_STALE_TTL_SECONDS,
+)
+
+# Background refreshes of stale cache entries, one per key
+_refresh_tasks: dict[SearchCacheKey, asyncio.Task] = {}
+
+# Running searches, shared by every concurrent request for the same key
+search_flights: StreamFlight[SearchCacheKey, SearchEvent] = StreamFlight()
+
+# The event streams of recent /search requests by stream id, so a client that
+# reconnects with Last-Event-ID resumes where it left off. Per worker: a reconnect
+# that lands on another worker starts the search over.
+search_streams: StreamFlight[str, bytes] = StreamFlight(
+    linger=settings.SSE_RESUME_GRACE_SECONDS,
+    retain=settings.SSE_RESUME_TTL_SECONDS,
+    max_retained=settings.SSE_RESUME_MAX_STREAMS,
+)
+
+
+# The stage a running search is in once it has emitted each event
+_STAGE_AFTER_EVENT = {
+    "search_queries": "repo_resolution",
+    "repo_invalid": "repo_resolution",
+    "get_repository": "issue_search",
+    "search_issues": "issue_search",
+    "get_issues_comments": "issue_search",
+    "generate_streaming_answer_start": "answer",
+    "streaming_answer_chunk": "answer",
+    "sources_update": "answer",
+}
+
+
+def search_cache_key(search_request: SearchRequest) -> SearchCacheKey:
+    """Normalize a search request so trivially different spellings share an entry."""
+    query = " ".join(search_request.query.lower().split())
+    repo = search_request.repo.strip().lower() if search_request.repo else None
+    return query, repo
+
+
+def _is_complete(events: list[SearchEvent]) -> bool:
+    """The run answered the query without an error."""
+    if not events or events[-1][0] != "streaming_answer_end":
+        return False
+    return all(event_type != "streaming_error" for event_type, _ in events)
+
+
+def _is_cacheable(events: list[SearchEvent]) -> bool:
+    """Complete runs that answered from every issue they found, worth replaying."""
+    return _is_complete(events) and not events[-1][1].get("partial")
 
-async def search_stream(search_request: SearchRequest, request: Request):
-    """Search for issues in a GitHub repository."""
+
+def _without_stages(events: list[SearchEvent]) -> list[SearchEvent]:
+    """Drop the stage durations of the run, a replay has its own."""
+    end_type, end_data = events[-1]
+    end_data = {k: v for k, v in end_data.items() if k != "stages"}
+    return [*events[:-1], (end_type, end_data)]
+
+
+def _outcome(events: list[SearchEvent]) -> str:
+    if _is_complete(events):
+        return "completed"
+    if any(event_type == "query_not_relevant" for event_type, _ in events):
+        return "not_relevant"
+    return "error"
+
+
+async def _run_and_cache(
+    key: SearchCacheKey, search_request: SearchRequest, request: Request
+) -> AsyncGenerator[SearchEvent, None]:
+    events = []
+    async for event in run_search(search_request, request):
+        events.append(event)
+        yield event
+    if _is_cacheable(events):
+        await search_cache.set(key, _without_stages(events))
+
+
+async def _refresh_search(
+    key: SearchCacheKey, search_request: SearchRequest, request: Request
+) -> None:
+    try:
+        events = [event async for event in run_search(search_request, request)]
+        if _is_cacheable(events):
+            await search_cache.set(key, _without_stages(events))
+    except Exception:
+        # Keep serving the stale entry, the next hit will try again
+        logger.exception("Refreshing a stale search failed")
+    finally:
+        _refresh_tasks.pop(key, None)
+
+
+def _schedule_refresh(
+    key: SearchCacheKey, search_request: SearchRequest, request: Request
+) -> None:
+    if key in _refresh_tasks:
+        return
+    _refresh_tasks[key] = asyncio.create_task(
+        _refresh_search(key, search_request, request)
+    )
+
+
+def _discard_task(task: asyncio.Task) -> None:
+    """Cancel a task that is no longer needed, or consume its result if it finished."""
+    if not task.done():
+        task.cancel()
+    elif not task.cancelled():
+        task.exception()
+
+
+async def search_stream(
+    search_request: SearchRequest, request: Request, ticket: Ticket | None = None
+):
+    """
+    Search for issues in a GitHub repository.
+
+    With an admission `ticket`, a search that has to run the pipeline first
+    waits for its slot, reporting its queue position in `queued` events; cache
+    hits and searches joining an identical running one give the slot back.
+    """
 
     start_time = time.time()
 
-    # Send SSE preamble to defeat proxy buffering and signal stream open
-    # The long comment chunk helps some proxies (and serverless providers) start streaming immediately
-    yield ":" + (" " * 1024) + "\n\n"
-    yield event_message("ready", {"message": "stream open"})
+    with (
+        tracing.span(
+            "search",
+            tracing.extract_trace_context(request.headers),
+            query=search_request.query,
+            repo=search_request.repo,
+        ) as current,
+        ticket or nullcontext(),
+    ):
+        # Send SSE preamble to defeat proxy buffering and signal stream open
+        # The long comment chunk helps some proxies (and serverless providers) start streaming immediately
+        # (compressed it shrinks to a few bytes, such proxies need SSE_COMPRESSION off)
+        yield encode_comment(" " * 1024)
+        yield event_message("ready", {"message": "stream open"})
+
+        key = search_cache_key(search_request)
+        timer = StageTimer()
+        with timer.stage("cache_lookup"):
+            cached = await search_cache.lookup(key)
+
+        if cached is not None:
+            # Replay the recorded run, refreshing it in the background once stale
+            events, is_stale = cached
+            stages = timer.durations
+            if ticket is not None:
+                ticket.release()
+            searches.inc(outcome="cache_hit")
+            current.set_attribute("outcome", "cache_hit")
+            if is_stale:
+                _schedule_refresh(key, search_request, request)
+            for event_type, data in events[:-1]:
+                yield event_message(event_type, data)
+        else:
+            if ticket is not None:
+                if key in search_flights:
+                    # Joining an identical running search costs nothing upstream
+                    ticket.release()
+                with timer.stage("admission_wait"):
+                    try:
+                        async for position in ticket.wait():
+                            yield event_message("queued", {"position": position})
+                    except (asyncio.CancelledError, GeneratorExit):
+                        # The client left the queue, its place goes to the next one
+                        search_cancellations.inc(stage="admission_wait")
+                        raise
+
+            # Join an identical search that is already running, or start one
+            events = []
+            async for event_type, data in search_flights.subscribe(
+                key, lambda: _run_and_cache(key, search_request, request)
+            ):
+                events.append((event_type, data))
+                if event_type != "streaming_answer_end":
+                    yield event_message(event_type, data)
+
+            outcome = _outcome(events)
+            searches.inc(outcome=outcome)
+            current.set_attribute("outcome", outcome)
+            # Errors and early exits have already been streamed
+            if not _is_complete(events):
+                return
+            # The stages of the run this request was served by, shared when coalesced
+            stages = {**timer.durations, **events[-1][1].get("stages", {})}
+
+        end_time = time.time()
+        elapsed_time = end_time - start_time
+        stage_duration.observe(elapsed_time, stage="total")
+
+        data = {k: v for k, v in events[-1][1].items() if k != "stages"}
+        if settings.SEARCH_SERVER_TIMING:
+            data["server_timing"] = server_timing({**stages, "total": elapsed_time})
+        yield event_message(
+            "streaming_answer_end",
+            {**data, "elapsed_time_seconds": round(elapsed_time, 2)},
+        )
+
+
+async def run_search(
+    search_request: SearchRequest, request: Request
+) -> AsyncGenerator[SearchEvent, None]:
+    """
+    Run the full search pipeline, yielding `(event_type, data)` pairs.
+
+    A complete run ends with a `streaming_answer_end` event; any other ending
+    means the pipeline stopped early on an error or an irrelevant query.
+    Closing or cancelling the run cancels its pending GitHub and Gemini calls.
+    """
+
+    # Repo validation does not depend on the generated queries, so start it right
+    # away and only await it once the repository is needed
+    repo_check = (
+        asyncio.create_task(check_repo_exists(repo=search_request.repo))
+        if search_request.repo
+        else None
+    )
+
+    stage = "query_generation"
+    try:
+        async for event in _search_stages(search_request, request, repo_check):
+            stage = _STAGE_AFTER_EVENT.get(event[0], stage)
+            yield event
+    except (asyncio.CancelledError, GeneratorExit):
+        # Nobody is waiting for the search anymore, its upstream calls were dropped
+        search_cancellations.inc(stage=stage)
+        raise
+    finally:
+        if repo_check is not None:
+            _discard_task(repo_check)
+
+
+async def _search_stages(
+    search_request: SearchRequest,
+    request: Request,
+    repo_check: asyncio.Task | None,
+) -> AsyncGenerator[SearchEvent, None]:
+    timer = StageTimer()
 
     # Use Gemini to generate 3 queries to search in Github Issues
     try:
         queries_response = await generate_issue_queries(
-            request=request, user_query=search_request.query
+            request=request, user_query=search_request.query, timer=timer
         )
     except HTTPException as he:
         # Emit a streaming error event and stop the stream
-        yield event_message("streaming_error", {"message": he.detail})
+        yield "streaming_error", {"message": he.detail}
         return
     except Exception:
-        yield event_message(
-            "streaming_error", {"message": "Failed to generate search queries."}
-        )
+        yield "streaming_error", {"message": "Failed to generate search queries."}
         return
 
     # Check if Gemini determined the query is irrelevant
     if queries_response.technology == "irrelevant" and queries_response.queries == [
         "irrelevant"
     ]:
-        yield event_message(
+        yield (
             "query_not_relevant",
             {
                 "message": "This query doesn't appear to be related to technical or coding issues.",
@@ -50,115 +317,292 @@ async def search_stream(search_request: SearchRequest, request: Request):
         )
         return
 
-    yield event_message("search_queries", data=queries_response.model_dump())
+    yield "search_queries", queries_response.model_dump()
 
     # Determine repository with safe fallback
+    repo_started = time.perf_counter()
     if not search_request.repo:
         repo = await get_repository(technology=queries_response.technology)
     else:
         try:
-            await check_repo_exists(repo=search_request.repo)
+            await repo_check
             repo = search_request.repo
         except HTTPException as he:
             # For invalid/non-existent repo (404/422), fall back to auto-selection
             if he.status_code in (404, 422):
                 # Inform client we are falling back
-                yield event_message("repo_invalid", {"provided": search_request.repo})
+                yield "repo_invalid", {"provided": search_request.repo}
                 repo = await get_repository(technology=queries_response.technology)
             else:
                 # For other errors (auth/rate-limit), notify client and stop
-                yield event_message("streaming_error", {"message": he.detail})
+                yield "streaming_error", {"message": he.detail}
                 return
 
+    timer.record("repo_resolution", time.perf_counter() - repo_started)
+
     # If still no repository could be determined, stop nicely
     if not repo:
-        yield event_message(
+        yield (
             "streaming_error",
             {"message": "No suitable repository found for this query."},
         )
         return
 
-    yield event_message("get_repository", {"repo": repo})
-
-    # Search for issues using Github REST API
-    try:
-        issues = await search_issues(repo=repo, queries=queries_response.queries)
-    except HTTPException as he:
-        yield event_message("streaming_error", {"message": he.detail})
-        return
-    except Exception:
-        yield event_message("streaming_error", {"message": "Failed to search issues."})
-        return
+    # The client sends the selected repo back on its next search, skip validating it then
+    await remember_repo_exists(repo)
+    popularity.record(repo, queries_response.queries)
 
-    yield event_message("search_issues", {"total_issues": len(issues)})
+    yield "get_repository", {"repo": repo}
 
-    # Get comments
+    # Search for issues and fetch their comments using Github REST API
+    issues_with_comments = []
+    complete = False
     try:
-        issues_with_comments = await get_issues_with_comments(repo=repo, issues=issues)
+        # GitHub-heavy stage, limited across all running searches
+        async with admission.stage_limits["github"].slot():
+            async for payload in stream_issues_with_comments(
+                repo=repo,
+                queries=queries_response.queries,
+                user_query=search_request.query,
+                timer=timer,
+            ):
+                kind = payload["type"]
+                data = payload["data"]
+                if kind == "issues":
+                    yield "search_issues", {"total_issues": data}
+                elif kind == "comments":
+                    yield "get_issues_comments", {"total_comments": data}
+                elif kind == "result":
+                    issues_with_comments = data
+                    complete = payload.get("complete", True)
     except HTTPException as he:
-        yield event_message("streaming_error", {"message": he.detail})
+        yield "streaming_error", {"message": he.detail}
         return
     except Exception:
-        yield event_message(
-            "streaming_error", {"message": "Failed to fetch issue comments."}
-        )
+        yield "streaming_error", {"message": "Failed to fetch issues."}
         return
 
-    total_comments = sum((len(issue["comments"]) for issue in issues_with_comments))
-    yield event_message("get_issues_comments", {"total_comments": total_comments})
-
     # Use Gemini to generate an answer based on the collected data
-    yield event_message(
-        "generate_streaming_answer_start",
-        {"message": "Generating AI response..."},
-    )
+    yield "generate_streaming_answer_start", {"message": "Generating AI response..."}
 
     try:
         async for payload in generate_streaming_answer(
             request=request,
             user_query=search_request.query,
             issues_with_comments=issues_with_comments,
+            timer=timer,
         ):
             if isinstance(payload, dict):
                 kind = payload.get("type")
                 data = payload.get("data")
                 if kind == "answer":
-                    yield event_message("streaming_answer_chunk", data)
+                    yield "streaming_answer_chunk", data
                 elif kind == "sources":
-                    yield event_message("sources_update", data)
+                    yield "sources_update", data
                 elif kind == "error":
-                    yield event_message("streaming_error", {"message": data})
+                    yield "streaming_error", {"message": data}
             else:
-                yield event_message("streaming_answer_chunk", payload)
+                yield "streaming_answer_chunk", payload
     except HTTPException as he:
-        yield event_message("streaming_error", {"message": he.detail})
+        yield "streaming_error", {"message": he.detail}
         return
     except Exception:
-        yield event_message(
-            "streaming_error", {"message": "Failed to generate AI answer."}
-        )
+        yield "streaming_error", {"message": "Failed to generate AI answer."}
         return
 
-    end_time = time.time()
-    elapsed_time = end_time - start_time
+    end = {"message": "Response complete", "stages": timer.durations}
+    if not (issues_with_comments and complete):
+        # Answered without any issues or without some of them, don't replay it
+        end["partial"] = True
+    yield "streaming_answer_end", end
+
+
+def _enter_admission(request: Request) -> Ticket | None:
+    if not settings.ADMISSION_ENABLED:
+        return None
+    try:
+        return admission.search_admission.enter(client_id(request))
+    except AdmissionRejected as e:
+        # Shed the search before streaming starts, so the client can back off
+        detail = (
+            "Too many searches, please slow down."
+            if e.reason == "client_rate"
+            else "The server is busy, please retry shortly."
+        )
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=detail,
+            headers={"Retry-After": retry_after_header(e.retry_after)},
+        )
+
 
+async def _stream_expired():
     yield event_message(
-        "streaming_answer_end",
-        {
-            "message": "Response complete",
-            "elapsed_time_seconds": round(elapsed_time, 2),
-        },
+        "stream_expired",
+        {"message": "The connection was lost and the search can't be resumed."},
     )
 
 
 @router.get("/search")
 async def search_get(request: Request, search_request: SearchRequest = Depends()):
-    return StreamingResponse(
-        search_stream(search_request=search_request, request=request),
-        media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache, no-transform",
-            "Connection": "keep-alive",
-            "X-Accel-Buffering": "no",
-        },
+    last_event = parse_event_id(request.headers.get("last-event-id"))
+    if last_event is not None:
+        stream_id, position = last_event
+        if stream_id in search_streams:
+            # The search is still running or recently done, and keeps its own slot
+            search_resumes.inc(outcome="resumed")
+            return event_stream_response(
+                search_streams.subscribe(stream_id, None, start=position + 1),
+                request,
+            )
+        # Gone (expired, or held by another worker): say so instead of quietly
+        # running the whole search again on every reconnect
+        search_resumes.inc(outcome="expired")
+        return event_stream_response(_stream_expired(), request)
+
+    ticket = _enter_admission(request)
+    stream_id = secrets.token_urlsafe(12)
+
+    def on_close() -> None:
+        # A running or lingering search holds on to its ticket and gives it back
+        # itself; one that never started or was dropped won't
+        if ticket is not None and stream_id not in search_streams:
+            ticket.release()
+
+    return event_stream_response(
+        search_streams.subscribe(
+            stream_id,
+            lambda: with_event_ids(
+                search_stream(
+                    search_request=search_request, request=request, ticket=ticket
+                ),
+                stream_id,
+            ),
+        ),
+        request,
+        on_close=on_close,
+    )
+
+
+def _batch_result(events: list[SearchEvent]) -> dict[str, Any]:
+    """What a batch client needs from the events of one search."""
+    result = {"repo": None, "queries": None, "answer": "", "sources": [], "error": None}
+    for event_type, data in events:
+        if event_type == "search_queries":
+            result["queries"] = data.get("queries")
+        elif event_type == "get_repository":
+            result["repo"] = data["repo"]
+        elif event_type == "streaming_answer_chunk":
+            result["answer"] += data
+        elif event_type == "sources_update":
+            result["sources"] = data
+        elif event_type in ("streaming_error", "query_not_relevant"):
+            result["error"] = data["message"]
+    return result
+
+
+async def _run_batch_search(
+    key: SearchCacheKey,
+    search_request: SearchRequest,
+    request: Request,
+    cached: tuple[list[SearchEvent], bool] | None,
+) -> tuple[str, list[SearchEvent]]:
+    if cached is not None:
+        events, is_stale = cached
+        if is_stale:
+            _schedule_refresh(key, search_request, request)
+        return "cache_hit", events
+    try:
+        events = [
+            event
+            async for event in search_flights.subscribe(
+                key, lambda: _run_and_cache(key, search_request, request)
+            )
+        ]
+    except Exception:
+        logger.exception("Batch search failed")
+        events = [("streaming_error", {"message": "Search failed."})]
+    return _outcome(events), events
+
+
+async def batch_search_stream(
+    batch: BatchSearchRequest, request: Request, ticket: Ticket | None = None
+):
+    """
+    Run a batch of searches, yielding one NDJSON line per search as it finishes.
+
+    Identical searches run once, the query plans of every search that is not
+    cached are made up front with grouped Gemini calls, and at most
+    BATCH_CONCURRENCY searches run at once. GitHub searches and comment fetches
+    are shared between the searches, and with every other search, through the
+    GitHub result cache and in-flight call coalescing.
+    """
+
+    with (
+        tracing.span(
+            "search_batch",
+            tracing.extract_trace_context(request.headers),
+            search_count=len(batch.searches),
+        ) as current,
+        ticket or nullcontext(),
+    ):
+        if ticket is not None:
+            # The whole batch holds one slot, its own concurrency is capped below
+            async for _ in ticket.wait():
+                pass
+
+        # Positions in the batch of each distinct search
+        indexes: dict[SearchCacheKey, list[int]] = {}
+        for index, search_request in enumerate(batch.searches):
+            indexes.setdefault(search_cache_key(search_request), []).append(index)
+        current.set_attribute("distinct_search_count", len(indexes))
+
+        cached = {key: await search_cache.lookup(key) for key in indexes}
+        await plan_issue_queries(
+            request=request,
+            user_queries=[
+                batch.searches[indexes[key][0]].query
+                for key, hit in cached.items()
+                if hit is None
+            ],
+        )
+
+        semaphore = asyncio.Semaphore(max(1, settings.BATCH_CONCURRENCY))
+
+        async def run(key: SearchCacheKey, search_request: SearchRequest):
+            async with semaphore:
+                return key, *await _run_batch_search(
+                    key, search_request, request, cached[key]
+                )
+
+        tasks = [
+            asyncio.create_task(run(key, batch.searches[positions[0]]))
+            for key, positions in indexes.items()
+        ]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                key, outcome, events = await finished
+                result = _batch_result(events)
+                for index in indexes[key]:
+                    searches.inc(outcome=outcome)
+                    line = {
+                        "index": index,
+                        "query": batch.searches[index].query,
+                        "outcome": outcome,
+                        **result,
+                    }
+                    yield dumps(line) + b"\n"
+        finally:
+            for task in tasks:
+                _discard_task(task)
+
+
+@router.post("/search/batch")
+async def search_batch(request: Request, batch: BatchSearchRequest):
+    ticket = _enter_admission(request)
+    return event_stream_response(
+        batch_search_stream(batch, request, ticket),
+        request,
+        media_type="application/x-ndjson",
+        on_close=ticket.release if ticket is not None else None,
     )
@@ -0,0 +1,196 @@
+import json
+import logging
+import struct
+import time
+import zlib
+from collections.abc import Callable
+from typing import Any, Protocol
+
+from pydantic import BaseModel
+
+from .cache_backends import CacheBackend, MemoryBackend, RedisBackend, SQLiteBackend
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+
+# Payloads above this size are worth the CPU to deflate
+COMPRESS_MIN_BYTES = 1024
+
+# Envelope header: fresh-until timestamp and whether the payload is deflated
+_HEADER = struct.Struct("<d?")
+
+
+class Codec[V](Protocol):
+    def dumps(self, value: V) -> bytes: ...
+
+    def loads(self, data: bytes) -> V: ...
+
+
+class JsonCodec:
+    """Compact JSON. Tuples come back as lists."""
+
+    def dumps(self, value: Any) -> bytes:
+        return json.dumps(value, separators=(",", ":")).encode()
+
+    def loads(self, data: bytes) -> Any:
+        return json.loads(data)
+
+
+class ModelCodec[M: BaseModel]:
+    """JSON for a pydantic model, validated back into the model on read."""
+
+    def __init__(self, model: type[M]):
+        self.model = model
+
+    def dumps(self, value: M) -> bytes:
+        return value.model_dump_json().encode()
+
+    def loads(self, data: bytes) -> M:
+        return self.model.model_validate_json(data)
+
+
+def create_cache_backend() -> CacheBackend:
+    """The backend configured by CACHE_BACKEND, shared by every cache namespace."""
+    if settings.CACHE_BACKEND == "sqlite":
+        return SQLiteBackend(
+            path=settings.CACHE_SQLITE_PATH, max_bytes=settings.CACHE_MAX_BYTES
+        )
+    if settings.CACHE_BACKEND == "redis":
+        return RedisBackend(
+            url=settings.CACHE_REDIS_URL,
+            command_timeout=settings.CACHE_REDIS_TIMEOUT_SECONDS,
+            max_connections=settings.CACHE_REDIS_MAX_CONNECTIONS,
+        )
+    return MemoryBackend(max_bytes=settings.CACHE_MAX_BYTES)
+
+
+cache_backend = create_cache_backend()
+
+# Every namespace by name, for reporting
+namespaces: dict[str, "SharedCache"] = {}
+
+
+class SharedCache[V]:
+    """
+    A namespace of typed entries in the shared cache backend.
+
+    An entry is fresh for `ttl` seconds after it is set, then stale for another
+    `stale_ttl` seconds, after which the backend drops it. Freshness is judged on
+    the wall clock, so every worker sharing the backend agrees on it.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        *,
+        ttl: float,
+        stale_ttl: float = 0,
+        codec: Codec[V] | None = None,
+        backend: CacheBackend | None = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.codec: Codec[V] = codec or JsonCodec()
+        self._backend = backend
+        self._clock = clock
+        self.hits = 0
+        self.misses = 0
+        namespaces[namespace] = self
+
+    @property
+    def backend(self) -> CacheBackend:
+        # Resolved on use, so the configured backend can be swapped at runtime
+        return self._backend if self._backend is not None else cache_backend
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def _key(self, key: Any) -> str:
+        if not isinstance(key, str):
+            key = json.dumps(key, separators=(",", ":"))
+        return f"{settings.CACHE_KEY_PREFIX}{self.namespace}:{key}"
+
+    def _encode(self, value: V, fresh_until: float) -> bytes:
+        payload = self.codec.dumps(value)
+        compressed = len(payload) >= COMPRESS_MIN_BYTES
+        if compressed:
+            payload = zlib.compress(payload)
+        return _HEADER.pack(fresh_until, compressed) + payload
+
+    def _decode(self, data: bytes) -> tuple[V, float]:
+        fresh_until, compressed = _HEADER.unpack_from(data)
+        payload = data[_HEADER.size :]
+        if compressed:
+            payload = zlib.decompress(payload)
+        return self.codec.loads(payload), fresh_until
+
+    async def lookup(self, key: Any) -> tuple[V, bool] | None:
+        """Return `(value, is_stale)` for a live entry, or None on a miss."""
+        try:
+            data = await self.backend.get(self._key(key))
+            found = self._decode(data) if data is not None else None
+        except Exception:
+            # An unreachable backend or an unreadable entry (e.g. written by an
+            # older release) is a miss, never a failed request
+            logger.warning("Cache lookup failed", exc_info=True)
+            found = None
+        if found is None:
+            self.misses += 1
+            return None
+        value, fresh_until = found
+        self.hits += 1
+        return value, self._clock() >= fresh_until
+
+    async def get(self, key: Any, default: V | None = None) -> V | None:
+        """Return the value for a fresh entry, or `default`."""
+        found = await self.lookup(key)
+        if found is None or found[1]:
+            return default
+        return found[0]
+
+    async def set(self, key: Any, value: V, *, ttl: float | None = None) -> None:
+        """Store `value`, optionally overriding the namespace TTL for this entry."""
+        ttl = self.ttl if ttl is None else ttl
+        try:
+            data = self._encode(value, self._clock() + ttl)
+            await self.backend.set(self._key(key), data, ttl + self.stale_ttl)
+        except Exception:
+            # Caching is best effort
+            logger.warning("Cache write failed", exc_info=True)
+
+    async def delete(self, key: Any) -> None:
+        await self.backend.delete(self._key(key))
+
+    async def clear(self) -> None:
+        await self.backend.clear(self._key(""))
+        self.hits = 0
+        self.misses = 0
+
+
+def cache_stats() -> dict[str, Any]:
+    """Hit rates of every namespace and of the backend as a whole."""
+    backend = cache_backend.stats
+    return {
+        "backend": {
+            "type": type(cache_backend).__name__,
+            "hits": backend.hits,
+            "misses": backend.misses,
+            "hit_rate": backend.hit_rate,
+            "sets": backend.sets,
+            "evictions": backend.evictions,
+            "bytes": backend.bytes,
+        },
+        "namespaces": {
+            cache.namespace: {
+                "hits": cache.hits,
+                "misses": cache.misses,
+                "hit_rate": cache.hit_rate,
+            }
+            for cache in namespaces.values()
+        },
+    }
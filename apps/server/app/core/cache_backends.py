@@ -0,0 +1,443 @@
+import asyncio
+import sqlite3
+import ssl
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, TypeVar
+from urllib.parse import unquote, urlparse
+
+T = TypeVar("T")
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    sets: int = 0
+    evictions: int = 0
+    # Bytes currently held, None when the backend cannot tell (e.g. Redis)
+    bytes: int | None = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class CacheBackend(ABC):
+    """Async byte store with per-entry TTL, shared by every cache namespace."""
+
+    def __init__(self):
+        self.stats = CacheStats()
+
+    @abstractmethod
+    async def get(self, key: str) -> bytes | None: ...
+
+    @abstractmethod
+    async def set(self, key: str, value: bytes, ttl: float) -> None: ...
+
+    @abstractmethod
+    async def delete(self, key: str) -> None: ...
+
+    @abstractmethod
+    async def clear(self, prefix: str = "") -> None:
+        """Drop every entry whose key starts with `prefix`."""
+
+    async def close(self) -> None:
+        return
+
+    def _record(self, value: bytes | None) -> bytes | None:
+        if value is None:
+            self.stats.misses += 1
+        else:
+            self.stats.hits += 1
+        return value
+
+
+class MemoryBackend(CacheBackend):
+    """In-process LRU bounded by the total size of keys and values."""
+
+    def __init__(self, *, max_bytes: int, clock: Callable[[], float] = time.time):
+        super().__init__()
+        self.max_bytes = max_bytes
+        self._clock = clock
+        # key -> (value, expires_at)
+        self._entries: OrderedDict[str, tuple[bytes, float]] = OrderedDict()
+
+    @staticmethod
+    def _size(key: str, value: bytes) -> int:
+        return len(key) + len(value)
+
+    def _drop(self, key: str) -> None:
+        value, _ = self._entries.pop(key)
+        self.stats.bytes -= self._size(key, value)
+
+    async def get(self, key: str) -> bytes | None:
+        entry = self._entries.get(key)
+        if entry is not None and self._clock() >= entry[1]:
+            self._drop(key)
+            entry = None
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return self._record(entry[0] if entry else None)
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        if key in self._entries:
+            self._drop(key)
+        self._entries[key] = (value, self._clock() + ttl)
+        self.stats.bytes += self._size(key, value)
+        self.stats.sets += 1
+        while self.stats.bytes > self.max_bytes and self._entries:
+            self._drop(next(iter(self._entries)))
+            self.stats.evictions += 1
+
+    async def delete(self, key: str) -> None:
+        if key in self._entries:
+            self._drop(key)
+
+    async def clear(self, prefix: str = "") -> None:
+        for key in [key for key in self._entries if key.startswith(prefix)]:
+            self._drop(key)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteBackend(CacheBackend):
+    """
+    On-disk cache in a SQLite file, shared by every worker on the host and kept
+    across restarts. Least recently read entries are evicted beyond `max_bytes`;
+    the read time is only refreshed once it is `touch_interval` seconds old, so
+    most hits are pure reads.
+
+    The total size of the entries is kept up to date by triggers, so a write
+    never scans the table, and the blocking sqlite3 calls run one at a time on
+    the backend's own thread instead of the event loop.
+    """
+
+    def __init__(
+        self,
+        *,
+        path: str,
+        max_bytes: int,
+        touch_interval: float = 60.0,
+        clock: Callable[[], float] = time.time,
+    ):
+        super().__init__()
+        self.path = path
+        self.max_bytes = max_bytes
+        self.touch_interval = touch_interval
+        self._clock = clock
+        self._conn: sqlite3.Connection | None = None
+        self._executor: ThreadPoolExecutor | None = None
+
+    async def _run(self, fn: Callable[..., T], *args: Any) -> T:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="sqlite-cache"
+            )
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, fn, *args)
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            # Several workers share the file, wait for their writes instead of failing
+            conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(
+                """
+                BEGIN IMMEDIATE;
+                CREATE TABLE IF NOT EXISTS cache (
+                    key TEXT PRIMARY KEY,
+                    value BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    expires_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS cache_accessed_at ON cache (accessed_at);
+                CREATE TABLE IF NOT EXISTS cache_size (
+                    id INTEGER PRIMARY KEY CHECK (id = 0),
+                    bytes INTEGER NOT NULL
+                );
+                -- Files from before the running total are summed once
+                INSERT INTO cache_size
+                    SELECT 0, (SELECT COALESCE(SUM(size), 0) FROM cache)
+                    WHERE NOT EXISTS (SELECT 1 FROM cache_size);
+                CREATE TRIGGER IF NOT EXISTS cache_size_insert AFTER INSERT ON cache
+                BEGIN
+                    UPDATE cache_size SET bytes = bytes + NEW.size;
+                END;
+                CREATE TRIGGER IF NOT EXISTS cache_size_update
+                AFTER UPDATE OF size ON cache
+                BEGIN
+                    UPDATE cache_size SET bytes = bytes - OLD.size + NEW.size;
+                END;
+                CREATE TRIGGER IF NOT EXISTS cache_size_delete AFTER DELETE ON cache
+                BEGIN
+                    UPDATE cache_size SET bytes = bytes - OLD.size;
+                END;
+                COMMIT;
+                """
+            )
+            self._conn = conn
+        return self._conn
+
+    def _size(self, conn: sqlite3.Connection) -> int:
+        return conn.execute("SELECT bytes FROM cache_size").fetchone()[0]
+
+    def _get(self, key: str) -> bytes | None:
+        conn = self._connect()
+        now = self._clock()
+        row = conn.execute(
+            "SELECT value, accessed_at FROM cache WHERE key = ? AND expires_at > ?",
+            (key, now),
+        ).fetchone()
+        if row is None:
+            return None
+        value, accessed_at = row
+        if now - accessed_at >= self.touch_interval:
+            with conn:
+                conn.execute(
+                    "UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key)
+                )
+        return value
+
+    def _set(self, key: str, value: bytes, ttl: float) -> tuple[int, int]:
+        conn = self._connect()
+        now = self._clock()
+        evicted = 0
+        with conn:
+            conn.execute(
+                """
+                INSERT INTO cache VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (key) DO UPDATE SET
+                    value = excluded.value,
+                    size = excluded.size,
+                    expires_at = excluded.expires_at,
+                    accessed_at = excluded.accessed_at
+                """,
+                (key, value, len(key) + len(value), now + ttl, now),
+            )
+            size = self._size(conn)
+            if size > self.max_bytes:
+                evicted = conn.execute(
+                    "DELETE FROM cache WHERE expires_at <= ?", (now,)
+                ).rowcount
+                size = self._size(conn)
+            # Then the least recently read entries, oldest first, until under budget
+            while size > self.max_bytes:
+                evicted += conn.execute(
+                    """
+                    DELETE FROM cache WHERE key IN (
+                        SELECT key FROM cache ORDER BY accessed_at LIMIT 1
+                    )
+                    """
+                ).rowcount
+                size = self._size(conn)
+        return size, evicted
+
+    def _delete(self, key: str) -> int:
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+            return self._size(conn)
+
+    def _clear(self, prefix: str) -> int:
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "DELETE FROM cache WHERE substr(key, 1, ?) = ?", (len(prefix), prefix)
+            )
+            return self._size(conn)
+
+    async def get(self, key: str) -> bytes | None:
+        return self._record(await self._run(self._get, key))
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        self.stats.bytes, evicted = await self._run(self._set, key, value, ttl)
+        self.stats.sets += 1
+        self.stats.evictions += evicted
+
+    async def delete(self, key: str) -> None:
+        self.stats.bytes = await self._run(self._delete, key)
+
+    async def clear(self, prefix: str = "") -> None:
+        self.stats.bytes = await self._run(self._clear, prefix)
+
+    def _close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    async def close(self) -> None:
+        if self._executor is not None:
+            await self._run(self._close)
+            self._executor.shutdown()
+            self._executor = None
+
+
+class RedisError(Exception):
+    pass
+
+
+@dataclass
+class _RedisConnection:
+    reader: asyncio.StreamReader
+    writer: asyncio.StreamWriter
+
+
+class RedisBackend(CacheBackend):
+    """
+    Cache on a Redis-protocol server (Redis, Valkey, KeyDB, ...), shared by every
+    worker and host. Speaks RESP directly, so it needs no client library. Entries
+    expire server-side; eviction is the server's policy.
+
+    Commands run on a pool of up to `max_connections` connections, one command
+    at a time on each, and fail after `command_timeout` seconds. `rediss://`
+    URLs connect over TLS; a username in the URL authenticates as that ACL user.
+    """
+
+    def __init__(
+        self,
+        *,
+        url: str,
+        connect_timeout: float = 5.0,
+        command_timeout: float = 1.0,
+        max_connections: int = 4,
+    ):
+        super().__init__()
+        self.stats.bytes = None
+        self.connect_timeout = connect_timeout
+        self.command_timeout = command_timeout
+        self.max_connections = max_connections
+        parsed = urlparse(url)
+        if parsed.scheme not in ("redis", "rediss"):
+            raise ValueError(f"Unsupported Redis URL scheme: {parsed.scheme!r}")
+        if parsed.username and not parsed.password:
+            raise ValueError("A username in the Redis URL needs a password")
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.tls = parsed.scheme == "rediss"
+        self.username = unquote(parsed.username) if parsed.username else None
+        self.password = unquote(parsed.password) if parsed.password else None
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self._idle: list[_RedisConnection] = []
+        self._slots: asyncio.Semaphore | None = None
+
+    @staticmethod
+    def _encode(*args: str | bytes | float) -> bytes:
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode()
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        return b"".join(parts)
+
+    @classmethod
+    async def _read_reply(cls, reader: asyncio.StreamReader) -> Any:
+        line = await reader.readline()
+        if not line:
+            raise ConnectionError("Redis connection closed")
+        kind, payload = line[:1], line[1:-2]
+        if kind == b"+":
+            return payload.decode()
+        if kind == b"-":
+            raise RedisError(payload.decode())
+        if kind == b":":
+            return int(payload)
+        if kind == b"$":
+            length = int(payload)
+            if length < 0:
+                return None
+            data = await reader.readexactly(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            length = int(payload)
+            if length < 0:
+                return None
+            return [await cls._read_reply(reader) for _ in range(length)]
+        raise RedisError(f"Unexpected reply: {line!r}")
+
+    async def _send(self, conn: _RedisConnection, *args: str | bytes | float) -> Any:
+        conn.writer.write(self._encode(*args))
+        await conn.writer.drain()
+        return await self._read_reply(conn.reader)
+
+    async def _open(self) -> _RedisConnection:
+        reader, writer = await asyncio.open_connection(
+            self.host,
+            self.port,
+            ssl=ssl.create_default_context() if self.tls else None,
+        )
+        conn = _RedisConnection(reader, writer)
+        try:
+            if self.password:
+                credentials = [self.username] if self.username else []
+                await self._send(conn, "AUTH", *credentials, self.password)
+            if self.db:
+                await self._send(conn, "SELECT", self.db)
+        except BaseException:
+            writer.close()
+            raise
+        return conn
+
+    async def command(self, *args: str | bytes | float) -> Any:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_connections)
+        async with self._slots:
+            conn = self._idle.pop() if self._idle else None
+            try:
+                if conn is None:
+                    conn = await asyncio.wait_for(self._open(), self.connect_timeout)
+                reply = await asyncio.wait_for(
+                    self._send(conn, *args), self.command_timeout
+                )
+            except RedisError:
+                # The error reply was read in full, the connection is still in step
+                self._idle.append(conn)
+                raise
+            except BaseException:
+                # Broken, timed out or cancelled between writing a command and
+                # reading its reply: the reply could still arrive and answer the
+                # next command, so drop the connection and open a new one instead
+                if conn is not None:
+                    conn.writer.close()
+                raise
+            self._idle.append(conn)
+            return reply
+
+    async def get(self, key: str) -> bytes | None:
+        return self._record(await self.command("GET", key))
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        await self.command("SET", key, value, "PX", max(1, int(ttl * 1000)))
+        self.stats.sets += 1
+
+    async def delete(self, key: str) -> None:
+        await self.command("DEL", key)
+
+    async def clear(self, prefix: str = "") -> None:
+        cursor = "0"
+        while True:
+            cursor, keys = await self.command(
+                "SCAN", cursor, "MATCH", f"{prefix}*", "COUNT", 500
+            )
+            if keys:
+                await self.command("DEL", *keys)
+            cursor = cursor.decode() if isinstance(cursor, bytes) else cursor
+            if cursor == "0":
+                return
+
+    async def close(self) -> None:
+        idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.writer.close()
+            try:
+                await conn.writer.wait_closed()
+            except ConnectionError:
+                pass
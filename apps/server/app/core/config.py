@@ -1,3 +1,4 @@
+import tempfile
 from pathlib import Path
 from typing import Annotated, Any, Literal
 
@@ -33,6 +34,18 @@ class Settings(BaseSettings):
     GITHUB_TOKEN: str
     GOOGLE_API_KEY: str
 
+    # Upstream API endpoints, overridden to point at the benchmark stubs
+    GITHUB_API_BASE_URL: str | None = None
+    GEMINI_BASE_URL: str | None = None
+    # One connection pool per upstream, shared by all its clients and opened at startup;
+    # HTTP/2 needs the `http2` extra, idle connections are kept this long
+    UPSTREAM_HTTP2: bool = True
+    UPSTREAM_MAX_CONNECTIONS: int = 100
+    UPSTREAM_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    UPSTREAM_KEEPALIVE_EXPIRY_SECONDS: float = 120
+    UPSTREAM_WARMUP: bool = True
+    UPSTREAM_WARMUP_TIMEOUT_SECONDS: float = 5
+
     # OAuth App settings
     GITHUB_CLIENT_ID: str
     GITHUB_CLIENT_SECRET: str
@@ -45,6 +58,126 @@ class Settings(BaseSettings):
         list[AnyUrl] | str, BeforeValidator(parse_cors)
     ] = []
 
+    # Cache backend shared by the search, query plan, GitHub and repo existence caches:
+    # "memory" is per worker, "sqlite" is shared by the workers of one host and
+    # "redis" (any Redis-protocol server) by every host
+    CACHE_BACKEND: Literal["memory", "sqlite", "redis"] = "memory"
+    # Size limit of the memory and sqlite backends, Redis evicts on its own
+    CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    CACHE_SQLITE_PATH: str = str(Path(tempfile.gettempdir()) / "pinpoint" / "cache.db")
+    # redis:// or rediss:// (TLS), with an optional username and password
+    CACHE_REDIS_URL: str = "redis://localhost:6379/0"
+    # A command slower than this fails and is treated as a cache miss
+    CACHE_REDIS_TIMEOUT_SECONDS: float = 1.0
+    # Connections per worker, each runs one command at a time
+    CACHE_REDIS_MAX_CONNECTIONS: int = 4
+    CACHE_KEY_PREFIX: str = "pinpoint:"
+
+    # Admission control for /search: searches running at once, then a queue that is
+    # fair between clients; a full queue sheds new searches with a 503
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_MAX_ACTIVE_SEARCHES: int = 32
+    ADMISSION_MAX_QUEUE: int = 64
+    # Per-client (bearer token or IP) token bucket, over it searches get a 429; off
+    # at 0. Behind a proxy every client shares the proxy's IP unless X-Forwarded-For
+    # is trusted, see the README
+    ADMISSION_CLIENT_RATE_PER_MINUTE: float = 0
+    ADMISSION_CLIENT_BURST: int = 10
+    # Identify clients by the first X-Forwarded-For hop, only behind a trusted proxy
+    ADMISSION_TRUST_FORWARDED_FOR: bool = False
+    # Process-wide limits on Gemini calls and on the GitHub issue and comment stage
+    ADMISSION_LLM_CONCURRENCY: int = 16
+    ADMISSION_GITHUB_CONCURRENCY: int = 16
+
+    # POST /search/batch: searches per request and running at once per batch (a batch
+    # takes one admission slot); user queries planned together per Gemini call
+    BATCH_MAX_SEARCHES: int = 500
+    BATCH_CONCURRENCY: int = 8
+    BATCH_QUERY_PLAN_GROUP_SIZE: int = 20
+
+    # Prometheus metrics at /metrics, off by default: they show anyone who can reach
+    # them the traffic and upstream state, so only enable where /metrics is private
+    METRICS_ENABLED: bool = False
+    # Per-stage durations in the final search event, as a Server-Timing value
+    SEARCH_SERVER_TIMING: bool = False
+
+    # gzip/brotli for SSE responses when the client accepts it, flushed at every event.
+    # Off by default: compressed, the padding that gets buffering proxies to start
+    # streaming shrinks to a few bytes
+    SSE_COMPRESSION: bool = False
+    # Resumable /search streams: a search keeps running this long after its client
+    # disconnects, and its events are kept this long after it ends, so a reconnect
+    # with Last-Event-ID picks up where it left off; at most this many ended streams
+    SSE_RESUME_GRACE_SECONDS: float = 10
+    SSE_RESUME_TTL_SECONDS: float = 60
+    SSE_RESUME_MAX_STREAMS: int = 1000
+
+    # OpenTelemetry spans for search stages and upstream calls (needs the `tracing`
+    # extra): "console" prints them, "file" appends them to TRACING_FILE_PATH as JSON lines
+    TRACING_EXPORTER: Literal["none", "console", "file"] = "none"
+    TRACING_FILE_PATH: str | None = None
+
+    # Full-pipeline result cache for /search, keyed on the normalized (query, repo)
+    SEARCH_CACHE_TTL_SECONDS: float = 600
+    SEARCH_CACHE_STALE_TTL_SECONDS: float = 3600
+
+    # Memoized Gemini query plans, keyed on the canonicalized user query
+    QUERY_PLAN_CACHE_TTL_SECONDS: float = 86400
+
+    # Issue search and comment results, shared so workers don't repeat each other's calls
+    GITHUB_RESULT_CACHE_TTL_SECONDS: float = 300
+
+    # Conditional (ETag/Last-Modified) cache under the GitHub client
+    GITHUB_HTTP_CACHE: bool = True
+    GITHUB_HTTP_CACHE_PATH: str | None = None  # SQLite file, kept in memory when unset
+    GITHUB_HTTP_CACHE_TTL_SECONDS: float = 86400
+
+    # Parallel comment fetches per search while issue searches are still running
+    GITHUB_COMMENT_CONCURRENCY: int = 8
+    # "graphql" fetches the comments of many issues per request, REST stays the fallback
+    GITHUB_COMMENTS_BACKEND: Literal["rest", "graphql"] = "rest"
+
+    # Process-wide scheduler for GitHub calls: in-flight calls adapt between 1 and the max
+    GITHUB_INITIAL_CONCURRENCY: int = 8
+    GITHUB_MAX_CONCURRENCY: int = 32
+    # Calls slower than this shrink the concurrency limit
+    GITHUB_LATENCY_TARGET_SECONDS: float = 2.0
+    # Calls that would wait longer than this for rate-limit budget fail with a 429
+    GITHUB_MAX_QUEUE_WAIT_SECONDS: float = 30
+
+    # Local FTS index of hot repositories' issues, disabled when unset
+    ISSUE_INDEX_PATH: str | None = None
+    # Indexed repositories are served locally while their last sync is this recent
+    ISSUE_INDEX_MAX_AGE_SECONDS: float = 21600
+    ISSUE_INDEX_MAX_COMMENTS: int = 20
+
+    # Background refresh of the most searched repositories and query plans
+    WARMER_ENABLED: bool = True
+    WARMER_INTERVAL_SECONDS: float = 300
+    WARMER_MAX_REPOS: int = 5
+    WARMER_MAX_PLANS: int = 20
+    WARMER_TRACKED_ENTRIES: int = 1000
+    # The warmer only runs while more than this share of each rate limit is unused
+    WARMER_RATE_LIMIT_SHARE: float = 0.2
+
+    # Issues that go on to comment fetching after local reranking
+    RERANK_TOP_ISSUES: int = 12
+
+    # Prompt budget for the issues and comments the answer is generated from
+    ANSWER_CONTEXT_TOKEN_BUDGET: int = 24000
+    # Longer issue bodies and comments are truncated to this many tokens
+    ANSWER_CONTEXT_MAX_ITEM_TOKENS: int = 800
+
+    # Technology -> repository map learned from the search API, on top of the shipped seed
+    REPO_INDEX_PATH: str | None = str(
+        Path(tempfile.gettempdir()) / "pinpoint" / "repositories.json"
+    )
+    REPO_INDEX_TTL_SECONDS: float = 604800
+
+    # check_repo_exists results: confirmed repos are kept long, 404s only briefly
+    REPO_EXISTS_TTL_SECONDS: float = 86400
+    REPO_MISSING_TTL_SECONDS: float = 300
+
     @computed_field  # type: ignore[prop-decorator]
     @property
     def all_cors_origins(self) -> list[str]:
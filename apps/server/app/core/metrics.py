@@ -0,0 +1,255 @@
+import bisect
+import math
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+
+from . import tracing
+
+# Latency buckets in seconds, from cache hits up to slow LLM completions
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+LabelValues = tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    """A named metric with a fixed set of label names, rendered as Prometheus text."""
+
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = labels
+
+    def _label_values(self, labels: dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.label_names):
+            raise ValueError(
+                f"{self.name} expects labels {self.label_names}, got {tuple(labels)}"
+            )
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def _series(
+        self, suffix: str, values: LabelValues, value: float, **extra: str
+    ) -> str:
+        pairs = [*zip(self.label_names, values), *extra.items()]
+        labels = ",".join(f'{name}="{_escape(value)}"' for name, value in pairs)
+        if labels:
+            labels = "{" + labels + "}"
+        return f"{self.name}{suffix}{labels} {_format_value(value)}"
+
+    def samples(self) -> Iterator[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type}",
+            *self.samples(),
+        ]
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()):
+        super().__init__(name, documentation, labels)
+        self.values: dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._label_values(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def get(self, **labels: str) -> float:
+        return self.values.get(self._label_values(labels), 0)
+
+    def samples(self) -> Iterator[str]:
+        for values, value in sorted(self.values.items()):
+            yield self._series("", values, value)
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> (per-bucket counts with a final +Inf bucket, sum)
+        self.values: dict[LabelValues, tuple[list[int], float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._label_values(labels)
+        counts, total = self.values.get(key) or ([0] * (len(self.buckets) + 1), 0.0)
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.values[key] = (counts, total + value)
+
+    def count(self, **labels: str) -> int:
+        counts, _ = self.values.get(self._label_values(labels), ([0], 0.0))
+        return sum(counts)
+
+    def samples(self) -> Iterator[str]:
+        for values, (counts, total) in sorted(self.values.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, math.inf), counts):
+                cumulative += count
+                yield self._series(
+                    "_bucket", values, cumulative, le=_format_value(bound)
+                )
+            yield self._series("_sum", values, total)
+            yield self._series("_count", values, cumulative)
+
+
+class Collected(Metric):
+    """
+    A gauge or counter whose values are read from `collect` whenever the metrics
+    are rendered, for state other modules already keep.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        collect: Callable[[], float | None | dict[LabelValues, float]],
+        labels: tuple[str, ...] = (),
+        type: str = "gauge",
+    ):
+        super().__init__(name, documentation, labels)
+        self.collect = collect
+        self.type = type
+
+    def samples(self) -> Iterator[str]:
+        collected = self.collect()
+        if not isinstance(collected, dict):
+            collected = {(): collected}
+        for values, value in sorted(collected.items()):
+            if value is not None:
+                yield self._series("", values, value)
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labels=()) -> Counter:
+        return self.register(Counter(name, documentation, labels))
+
+    def histogram(
+        self, name: str, documentation: str, labels=(), **kwargs
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labels, **kwargs))
+
+    def collected(
+        self, name: str, documentation: str, collect, labels=(), type="gauge"
+    ) -> Collected:
+        return self.register(Collected(name, documentation, collect, labels, type))
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        return "\n".join(metric.render() for metric in self.metrics.values()) + "\n"
+
+
+registry = Registry()
+
+stage_duration = registry.histogram(
+    "pinpoint_search_stage_duration_seconds",
+    "Duration of each stage of a search.",
+    ("stage",),
+)
+searches = registry.counter(
+    "pinpoint_searches_total",
+    "Searches by how they ended.",
+    ("outcome",),
+)
+search_cancellations = registry.counter(
+    "pinpoint_search_cancellations_total",
+    "Searches abandoned after all their clients disconnected, by stage reached.",
+    ("stage",),
+)
+search_resumes = registry.counter(
+    "pinpoint_search_resumes_total",
+    "Reconnections with Last-Event-ID, by whether their stream was still there.",
+    ("outcome",),
+)
+admission_rejections = registry.counter(
+    "pinpoint_admission_rejections_total",
+    "Searches turned away before they started, by reason.",
+    ("reason",),
+)
+upstream_duration = registry.histogram(
+    "pinpoint_upstream_request_duration_seconds",
+    "Latency of calls to GitHub and Gemini, to the response headers or first chunk.",
+    ("upstream", "operation"),
+)
+upstream_requests = registry.counter(
+    "pinpoint_upstream_requests_total",
+    "Calls to GitHub and Gemini by outcome.",
+    ("upstream", "operation", "outcome"),
+)
+
+
+class StageTimer:
+    """
+    Wall-clock durations of the stages of one search. Every stage is also
+    observed in `stage_duration` and traced as a `search.<stage>` span under
+    the span that was current when the timer was created; stages may overlap,
+    e.g. comment fetches start while issue searches are still running.
+    """
+
+    def __init__(self):
+        self.durations: dict[str, float] = {}
+        self.trace_context = tracing.current_context()
+
+    def _observe(self, stage: str, seconds: float) -> None:
+        self.durations[stage] = self.durations.get(stage, 0.0) + seconds
+        stage_duration.observe(seconds, stage=stage)
+
+    def record(self, stage: str, seconds: float) -> None:
+        """Record a stage that ended just now after `seconds`."""
+        self._observe(stage, seconds)
+        tracing.record_span(f"search.{stage}", seconds, self.trace_context)
+
+    @contextmanager
+    def stage(self, stage: str) -> Iterator[None]:
+        """Time the block, with the calls made inside it traced under its span."""
+        start = time.perf_counter()
+        try:
+            with tracing.span(f"search.{stage}", self.trace_context):
+                yield
+        finally:
+            self._observe(stage, time.perf_counter() - start)
+
+
+def server_timing(durations: dict[str, float]) -> str:
+    """Stage durations in `Server-Timing` header syntax, in milliseconds."""
+    return ", ".join(
+        f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in durations.items()
+    )
+
+
+def record_upstream_call(
+    upstream: str, operation: str, outcome: str, seconds: float | None = None
+) -> None:
+    upstream_requests.inc(upstream=upstream, operation=operation, outcome=outcome)
+    if seconds is not None:
+        upstream_duration.observe(seconds, upstream=upstream, operation=operation)
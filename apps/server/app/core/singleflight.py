@@ -0,0 +1,178 @@
+import asyncio
+from collections.abc import AsyncIterator, Awaitable, Callable, Hashable
+
+
+def _consume_result(task: asyncio.Future) -> None:
+    # Nobody may be left to await the call, don't log its error as unretrieved
+    if not task.cancelled():
+        task.exception()
+
+
+class SingleFlight[K: Hashable, V]:
+    """
+    Coalesce concurrent calls with the same key into one in-flight awaitable.
+
+    Every caller gets the shared result or exception. A caller that is cancelled
+    does not cancel the call for the others, but the call is cancelled once no
+    caller is left waiting for it.
+    """
+
+    def __init__(self):
+        self._calls: dict[K, asyncio.Future[V]] = {}
+        self._waiters: dict[asyncio.Future[V], int] = {}
+
+    async def do(self, key: K, fn: Callable[[], Awaitable[V]]) -> V:
+        call = self._calls.get(key)
+        if call is None:
+            call = asyncio.ensure_future(fn())
+            self._calls[key] = call
+            call.add_done_callback(lambda _: self._forget(key, call))
+            call.add_done_callback(_consume_result)
+        self._waiters[call] = self._waiters.get(call, 0) + 1
+        try:
+            return await asyncio.shield(call)
+        finally:
+            self._waiters[call] -= 1
+            if not self._waiters[call]:
+                del self._waiters[call]
+                if not call.done():
+                    # Every caller was cancelled, nobody needs the result anymore
+                    call.cancel()
+                    self._forget(key, call)
+
+    def _forget(self, key: K, call: asyncio.Future[V]) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+
+class _Broadcast[T]:
+    """One running stream, recorded so subscribers can join at any point."""
+
+    def __init__(self, source: AsyncIterator[T]):
+        self.items: list[T] = []
+        self.done = False
+        self.error: BaseException | None = None
+        self.subscribers = 0
+        # Pending cancellation without subscribers, or expiry once finished
+        self.timer: asyncio.TimerHandle | None = None
+        self._changed = asyncio.Event()
+        self.task = asyncio.create_task(self._pump(source))
+
+    async def _pump(self, source: AsyncIterator[T]) -> None:
+        try:
+            async for item in source:
+                self.items.append(item)
+                self._notify()
+        except Exception as e:  # noqa: BLE001 - raised again in every subscriber
+            self.error = e
+        finally:
+            self.done = True
+            self._notify()
+
+    def _notify(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def stop_timer(self) -> None:
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+
+    async def subscribe(self, start: int = 0) -> AsyncIterator[T]:
+        index = start
+        while True:
+            while index < len(self.items):
+                yield self.items[index]
+                index += 1
+            if self.done:
+                break
+            await self._changed.wait()
+        if self.error is not None:
+            raise self.error
+
+
+class StreamFlight[K: Hashable, T]:
+    """
+    Share one running async stream between concurrent subscribers with the same key.
+
+    Each subscriber receives the full sequence from the first item, however late
+    it joins, or from a later position to resume where it left off. The stream
+    is cancelled once its last subscriber has been gone for `linger` seconds. A
+    stream that ran to its end stays available to new subscribers for `retain`
+    seconds, keeping at most `max_retained` of them, the oldest dropped first.
+    """
+
+    def __init__(
+        self, *, linger: float = 0, retain: float = 0, max_retained: int = 1000
+    ):
+        self.linger = linger
+        self.retain = retain
+        self.max_retained = max_retained
+        self._streams: dict[K, _Broadcast[T]] = {}
+
+    async def subscribe(
+        self,
+        key: K,
+        factory: Callable[[], AsyncIterator[T]] | None,
+        start: int = 0,
+    ) -> AsyncIterator[T]:
+        """
+        Items of the stream for `key` from position `start`, starting the stream
+        with `factory` when there is none. Without a factory, a missing stream
+        yields nothing.
+        """
+        stream = self._streams.get(key)
+        if stream is None:
+            if factory is None:
+                return
+            stream = _Broadcast(factory())
+            self._streams[key] = stream
+            stream.task.add_done_callback(lambda _: self._finished(key, stream))
+
+        stream.subscribers += 1
+        if not stream.done:
+            stream.stop_timer()
+        try:
+            async for item in stream.subscribe(start):
+                yield item
+        finally:
+            stream.subscribers -= 1
+            if stream.subscribers == 0 and not stream.done:
+                if self.linger > 0:
+                    # Give a reconnecting subscriber the chance to pick it up again
+                    stream.timer = asyncio.get_running_loop().call_later(
+                        self.linger, self._abandon, key, stream
+                    )
+                else:
+                    self._abandon(key, stream)
+
+    def _abandon(self, key: K, stream: _Broadcast[T]) -> None:
+        if stream.subscribers == 0 and not stream.done:
+            stream.task.cancel()
+            self._forget(key, stream)
+
+    def _finished(self, key: K, stream: _Broadcast[T]) -> None:
+        stream.stop_timer()
+        if self.retain <= 0 or stream.task.cancelled():
+            self._forget(key, stream)
+            return
+        stream.timer = asyncio.get_running_loop().call_later(
+            self.retain, self._forget, key, stream
+        )
+        finished = [k for k, s in self._streams.items() if s.done]
+        for oldest in finished[: max(0, len(finished) - self.max_retained)]:
+            self._forget(oldest, self._streams[oldest])
+
+    def _forget(self, key: K, stream: _Broadcast[T]) -> None:
+        if self._streams.get(key) is stream:
+            stream.stop_timer()
+            del self._streams[key]
+
+    def __len__(self) -> int:
+        return len(self._streams)
+
+    def __contains__(self, key: K) -> bool:
+        return key in self._streams
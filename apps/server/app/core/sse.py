@@ -0,0 +1,258 @@
+"""
+Server-sent events encoded straight to bytes, optionally compressed per event.
+
+With orjson installed, event data is serialized with it, otherwise with the
+stdlib in the same compact form. A compressed stream is flushed at the end of
+every event, so the client can decode each event as soon as it arrives and
+compression never holds an event back.
+
+The stream is cancelled as soon as the client disconnects, rather than at the
+next event it fails to send, so the work behind it stops with it. Events can
+carry ids, for a reconnecting client to say where it left off.
+"""
+
+import asyncio
+import json
+import zlib
+from collections.abc import AsyncGenerator, AsyncIterator, Callable
+from contextlib import aclosing
+from typing import Any
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+from .config import settings
+
+try:
+    import orjson
+except ImportError:  # the optional `speedups` extra is not installed
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Compression levels that keep per-event CPU time well below the network time saved
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+STREAM_HEADERS = {
+    "Cache-Control": "no-cache, no-transform",
+    "Connection": "keep-alive",
+    "X-Accel-Buffering": "no",
+}
+
+
+def dumps(data: Any) -> bytes:
+    """Compact UTF-8 JSON."""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def encode_event(event_type: str, data: Any) -> bytes:
+    return b"event: " + event_type.encode() + b"\ndata: " + dumps(data) + b"\n\n"
+
+
+def encode_comment(text: str) -> bytes:
+    return b":" + text.encode() + b"\n\n"
+
+
+async def with_event_ids(
+    events: AsyncGenerator[bytes, None], stream_id: str
+) -> AsyncGenerator[bytes, None]:
+    """
+    Give every event an `id` of the form `<stream_id>:<position>`, the position
+    counting comments too, which the browser sends back as `Last-Event-ID` when
+    it reconnects.
+    """
+    async with aclosing(events):
+        position = 0
+        async for event in events:
+            if not event.startswith(b":"):
+                event = b"id: %s:%d\n" % (stream_id.encode(), position) + event
+            position += 1
+            yield event
+
+
+def parse_event_id(event_id: str | None) -> tuple[str, int] | None:
+    """The stream id and position of an id from `with_event_ids`, if it is one."""
+    stream_id, _, position = (event_id or "").rpartition(":")
+    if not stream_id or not position.isdigit():
+        return None
+    return stream_id, int(position)
+
+
+class GzipEncoder:
+    def __init__(self, level: int = GZIP_LEVEL):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+
+    def encode(self, chunk: bytes) -> bytes:
+        """Compress a chunk and flush it to a byte boundary the client can decode."""
+        return self._compressor.compress(chunk) + self._compressor.flush(
+            zlib.Z_SYNC_FLUSH
+        )
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class BrotliEncoder:
+    def __init__(self, quality: int = BROTLI_QUALITY):
+        self._compressor = brotli.Compressor(mode=brotli.MODE_TEXT, quality=quality)
+
+    def encode(self, chunk: bytes) -> bytes:
+        """Compress a chunk and flush it to a byte boundary the client can decode."""
+        return self._compressor.process(chunk) + self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+def supported_encodings() -> list[str]:
+    """Content codings this server can produce, most preferred first."""
+    return ["br", "gzip"] if brotli is not None else ["gzip"]
+
+
+def negotiate_encoding(accept_encoding: str | None) -> str | None:
+    """
+    The content coding to use for an `Accept-Encoding` header, or None to send
+    the stream as is. Among the acceptable codings the server's preference wins.
+    """
+    if not accept_encoding:
+        return None
+    weights: dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        weight = 1.0
+        name, _, value = params.strip().partition("=")
+        if name.strip() == "q":
+            try:
+                weight = float(value)
+            except ValueError:
+                weight = 0.0
+        weights[coding.strip().lower()] = weight
+    for coding in supported_encodings():
+        if weights.get(coding, weights.get("*", 0.0)) > 0:
+            return coding
+    return None
+
+
+def create_encoder(encoding: str) -> GzipEncoder | BrotliEncoder:
+    if encoding == "gzip":
+        return GzipEncoder()
+    if encoding == "br" and brotli is not None:
+        return BrotliEncoder()
+    raise ValueError(f"Unsupported content encoding {encoding!r}")
+
+
+async def compress_events(
+    events: AsyncGenerator[bytes | str, None], encoding: str
+) -> AsyncIterator[bytes]:
+    """Compress a stream of events, flushing after each one."""
+    encoder = create_encoder(encoding)
+    # Close the event stream with this one when the client goes away
+    async with aclosing(events):
+        async for event in events:
+            if isinstance(event, str):
+                event = event.encode()
+            yield encoder.encode(event)
+    yield encoder.finish()
+
+
+async def _wait_for_disconnect(request: Request) -> None:
+    while (await request.receive())["type"] != "http.disconnect":
+        pass
+
+
+async def cancel_on_disconnect(
+    events: AsyncGenerator[bytes | str, None], request: Request
+) -> AsyncGenerator[bytes | str, None]:
+    """
+    Relay a stream of events until the client disconnects. A disconnect cancels
+    whatever the stream is waiting on and closes it, then ends the relay.
+    """
+    task = asyncio.current_task()
+    disconnected = False
+    # Only cancel while waiting on the events, never while an event is being sent
+    waiting = False
+
+    def on_disconnect(watcher: asyncio.Task) -> None:
+        nonlocal disconnected
+        if watcher.cancelled() or watcher.exception() is not None:
+            return
+        disconnected = True
+        if waiting:
+            task.cancel()
+
+    watcher = asyncio.create_task(_wait_for_disconnect(request))
+    watcher.add_done_callback(on_disconnect)
+    async with aclosing(events):
+        try:
+            while not disconnected:
+                waiting = True
+                try:
+                    event = await anext(events)
+                except StopAsyncIteration:
+                    break
+                finally:
+                    waiting = False
+                yield event
+        except asyncio.CancelledError:
+            if not disconnected:
+                raise
+            task.uncancel()
+        finally:
+            watcher.cancel()
+
+
+class EventStreamResponse(StreamingResponse):
+    """
+    A streaming response that closes its stream however the response ends, then
+    calls `on_close`, even when sending failed before the stream ever started.
+    """
+
+    def __init__(
+        self,
+        content: AsyncGenerator[bytes | str, None],
+        *,
+        on_close: Callable[[], None] | None = None,
+        **kwargs: Any,
+    ):
+        super().__init__(content, **kwargs)
+        self.on_close = on_close
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.body_iterator.aclose()
+            if self.on_close is not None:
+                self.on_close()
+
+
+def event_stream_response(
+    events: AsyncGenerator[bytes | str, None],
+    request: Request,
+    media_type: str = "text/event-stream",
+    on_close: Callable[[], None] | None = None,
+) -> StreamingResponse:
+    """
+    Stream server-sent events, or other incremental records of `media_type`,
+    compressed with the best coding the client accepts when SSE_COMPRESSION is
+    on, and cancelled when the client leaves. `on_close` is called once the
+    response is over.
+    """
+    headers = dict(STREAM_HEADERS)
+    events = cancel_on_disconnect(events, request)
+    if settings.SSE_COMPRESSION:
+        headers["Vary"] = "Accept-Encoding"
+        encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+        if encoding is not None:
+            events = compress_events(events, encoding)
+            headers["Content-Encoding"] = encoding
+    return EventStreamResponse(
+        events, media_type=media_type, headers=headers, on_close=on_close
+    )
@@ -0,0 +1,20 @@
+import re
+
+# Words that never change which issues a query should find
+_STOP_WORDS = """
+    a an the and or but if so of to in on at by for with from into about as
+    i im me my we our you your it its this that these those there
+    is are was were be been being am do does did doing have has had
+    can could should would will shall may might must
+    how why what when where which who whom please help anyone someone
+    get getting got just still also really very any some
+"""
+STOP_WORDS = frozenset(_STOP_WORDS.split())
+
+# Keeps tokens like "next.js", "c++" and "c#" intact while dropping other punctuation
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[.\-_/][a-z0-9]+)*[+#]*")
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercase `text` and split it into search tokens."""
+    return _TOKEN_RE.findall(text.lower())
@@ -0,0 +1,184 @@
+"""
+OpenTelemetry spans for the stages of a search and the upstream calls it makes.
+
+Tracing needs the `tracing` extra (opentelemetry-sdk) and an exporter; until
+`configure_tracing` is given one, every span here is a no-op and nothing from
+OpenTelemetry is touched on the request path. Spans are current while open, so
+calls made inside them, including from tasks started in a TaskGroup, nest under
+them and carry their context to GitHub and Gemini in a W3C `traceparent` header.
+"""
+
+import time
+from collections.abc import Iterator, Mapping, MutableMapping
+from contextlib import contextmanager
+from typing import Any
+
+import httpx
+
+try:
+    from opentelemetry import propagate, trace
+    from opentelemetry.context import Context, get_current
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import (
+        BatchSpanProcessor,
+        ConsoleSpanExporter,
+        SimpleSpanProcessor,
+        SpanExporter,
+    )
+    from opentelemetry.trace import Status, StatusCode
+except ImportError:  # the optional `tracing` extra is not installed
+    trace = None
+
+SERVICE_NAME = "pinpoint"
+
+_provider: "TracerProvider | None" = None
+_tracer: "trace.Tracer | None" = None
+
+
+class _NoSpan:
+    """Stands in for a span while tracing is off."""
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def set_attributes(self, attributes: Mapping[str, Any]) -> None:
+        pass
+
+
+_NO_SPAN = _NoSpan()
+
+
+if trace is not None:
+
+    class _FileSpanExporter(ConsoleSpanExporter):
+        """Appends finished spans to a file, one JSON object per line."""
+
+        def __init__(self, path: str):
+            # Open for the exporter's lifetime, closed in shutdown()
+            self.file = open(path, "a", encoding="utf-8")  # noqa: SIM115
+            super().__init__(
+                service_name=SERVICE_NAME,
+                out=self.file,
+                formatter=lambda span: span.to_json(indent=None) + "\n",
+            )
+
+        def shutdown(self) -> None:
+            self.file.close()
+
+
+def create_exporter(kind: str, path: str | None = None) -> "SpanExporter | None":
+    """The span exporter for a TRACING_EXPORTER setting, None for "none"."""
+    if kind == "none":
+        return None
+    if trace is None:
+        raise RuntimeError(
+            f"TRACING_EXPORTER={kind} needs OpenTelemetry, install the `tracing` extra"
+        )
+    if kind == "console":
+        return ConsoleSpanExporter(service_name=SERVICE_NAME)
+    if kind == "file":
+        if not path:
+            raise ValueError("TRACING_EXPORTER=file needs TRACING_FILE_PATH")
+        return _FileSpanExporter(path)
+    raise ValueError(f"Unknown trace exporter {kind!r}")
+
+
+def configure_tracing(exporter: "SpanExporter | None", *, batch: bool = True) -> None:
+    """
+    Export spans to `exporter` from now on, or turn tracing off with None.
+
+    Spans are exported in batches from a background thread; `batch=False`
+    exports each span as it ends.
+    """
+    global _provider, _tracer
+    shutdown_tracing()
+    if exporter is None:
+        return
+    _provider = TracerProvider(resource=Resource.create({"service.name": SERVICE_NAME}))
+    processor = BatchSpanProcessor if batch else SimpleSpanProcessor
+    _provider.add_span_processor(processor(exporter))
+    _tracer = _provider.get_tracer(__name__)
+
+
+def shutdown_tracing() -> None:
+    """Export the spans still buffered and turn tracing off."""
+    global _provider, _tracer
+    if _provider is not None:
+        _provider.shutdown()
+    _provider = _tracer = None
+
+
+def _attributes(attributes: Mapping[str, Any]) -> dict[str, Any]:
+    # OpenTelemetry rejects None values, skip attributes that are not known
+    return {key: value for key, value in attributes.items() if value is not None}
+
+
+@contextmanager
+def span(
+    name: str, parent: "Context | None" = None, **attributes: Any
+) -> Iterator[Any]:
+    """
+    A span around the block, current while it runs. Its parent is the current
+    span unless a `parent` context is given. An exception escaping the block is
+    recorded on the span and marks it as failed.
+    """
+    if _tracer is None:
+        yield _NO_SPAN
+        return
+    with _tracer.start_as_current_span(
+        name, context=parent, attributes=_attributes(attributes)
+    ) as current:
+        yield current
+
+
+def record_span(
+    name: str, seconds: float, parent: "Context | None" = None, **attributes: Any
+) -> None:
+    """A span for work that ended just now after `seconds`, timed elsewhere."""
+    if _tracer is None:
+        return
+    end = time.time_ns()
+    finished = _tracer.start_span(
+        name,
+        context=parent,
+        attributes=_attributes(attributes),
+        start_time=end - int(seconds * 1e9),
+    )
+    finished.end(end_time=end)
+
+
+def set_attributes(**attributes: Any) -> None:
+    """Add attributes to the current span."""
+    if _tracer is not None:
+        trace.get_current_span().set_attributes(_attributes(attributes))
+
+
+def record_failure(current: Any, error: BaseException) -> None:
+    """Mark a span as failed by an exception that was handled inside it."""
+    if _tracer is not None:
+        current.record_exception(error)
+        current.set_status(Status(StatusCode.ERROR, type(error).__name__))
+
+
+def current_context() -> "Context | None":
+    """The context of the current span, to parent spans recorded later on."""
+    return get_current() if _tracer is not None else None
+
+
+def extract_trace_context(headers: Mapping[str, str]) -> "Context | None":
+    """The caller's trace context from incoming `traceparent`/`tracestate` headers."""
+    if _tracer is None:
+        return None
+    return propagate.extract(headers)
+
+
+def inject_trace_context(headers: MutableMapping[str, str]) -> None:
+    """Add the current trace context to outgoing request headers."""
+    if _tracer is not None:
+        propagate.inject(headers)
+
+
+async def propagate_trace_context(request: httpx.Request) -> None:
+    """httpx request hook that sends the current trace context upstream."""
+    inject_trace_context(request.headers)
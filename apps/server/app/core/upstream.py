@@ -0,0 +1,134 @@
+"""
+Connection pools to the upstream APIs, one per upstream, shared by every client
+that talks to it.
+
+githubkit opens and closes an httpx client around every GitHub call, and a
+client left to itself sets up its own pool and TLS context, so every call would
+pay for a new connection and handshake. The pools here outlive those clients:
+closing a client leaves the connections open for the next call. With the `http2`
+extra installed, concurrent calls to an upstream are multiplexed over one
+connection. The pools are opened at startup, so the first searches don't pay
+for DNS and TLS, and idle connections are kept long enough to survive quiet
+periods.
+"""
+
+import asyncio
+from collections.abc import AsyncIterator, Callable
+
+import httpx
+
+from .config import settings
+
+try:
+    import h2
+except ImportError:  # the optional `http2` extra is not installed
+    h2 = None
+
+GITHUB_API_URL = "https://api.github.com"
+GEMINI_API_URL = "https://generativelanguage.googleapis.com"
+
+
+class _TrackedStream(httpx.AsyncByteStream):
+    """A response body that reports back once it is closed."""
+
+    def __init__(self, stream: httpx.AsyncByteStream, on_close: Callable[[], None]):
+        self._stream = stream
+        self._on_close: Callable[[], None] | None = on_close
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            if self._on_close is not None:
+                self._on_close()
+                self._on_close = None
+
+
+class UpstreamPool(httpx.AsyncBaseTransport):
+    """A connection pool to one upstream that the clients using it cannot close."""
+
+    def __init__(
+        self,
+        name: str,
+        base_url: str,
+        *,
+        warmup_path: str = "/",
+        http2: bool = False,
+        limits: httpx.Limits | None = None,
+    ):
+        self.name = name
+        self.base_url = base_url.rstrip("/")
+        self.warmup_path = warmup_path
+        self.limits = limits or httpx.Limits()
+        # HTTP/2 is only negotiated over TLS, plain http:// stays on HTTP/1.1
+        self.http2 = http2 and h2 is not None
+        self._transport = httpx.AsyncHTTPTransport(http2=self.http2, limits=self.limits)
+        # Requests sent and not yet read to the end, waiting ones included
+        self.in_flight = 0
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.in_flight += 1
+        try:
+            response = await self._transport.handle_async_request(request)
+        except BaseException:
+            self.in_flight -= 1
+            raise
+        response.stream = _TrackedStream(response.stream, self._finished)
+        return response
+
+    def _finished(self) -> None:
+        self.in_flight -= 1
+
+    async def aclose(self) -> None:
+        # Every client closes its transport, keep the pool for the next one
+        return
+
+    async def force_close(self) -> None:
+        await self._transport.aclose()
+
+    async def warm_up(self, timeout: float) -> bool:
+        """Connect ahead of the first call, any response will do."""
+        try:
+            async with httpx.AsyncClient(transport=self, timeout=timeout) as client:
+                await client.get(self.base_url + self.warmup_path)
+        except httpx.HTTPError:
+            return False
+        return True
+
+
+def create_pool(name: str, base_url: str, warmup_path: str = "/") -> UpstreamPool:
+    return UpstreamPool(
+        name,
+        base_url,
+        warmup_path=warmup_path,
+        http2=settings.UPSTREAM_HTTP2,
+        limits=httpx.Limits(
+            max_connections=settings.UPSTREAM_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.UPSTREAM_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.UPSTREAM_KEEPALIVE_EXPIRY_SECONDS,
+        ),
+    )
+
+
+# /rate_limit does not count against the rate limit
+github_pool = create_pool(
+    "github", settings.GITHUB_API_BASE_URL or GITHUB_API_URL, "/rate_limit"
+)
+gemini_pool = create_pool("gemini", settings.GEMINI_BASE_URL or GEMINI_API_URL)
+
+pools = {pool.name: pool for pool in (github_pool, gemini_pool)}
+
+
+async def warm_up_pools(timeout: float) -> dict[str, bool]:
+    """Connect to every upstream at once; returns which ones answered."""
+    results = await asyncio.gather(*(pool.warm_up(timeout) for pool in pools.values()))
+    return dict(zip(pools, results))
+
+
+async def close_pools() -> None:
+    for pool in pools.values():
+        await pool.force_close()
@@ -0,0 +1,8 @@
+class AdmissionRejected(Exception):
+    """Raised when a search is turned away before it starts, to retry later."""
+
+    def __init__(self, reason: str, *, status_code: int, retry_after: float):
+        super().__init__(f"Search rejected ({reason}), retry in {retry_after:.0f}s")
+        self.reason = reason
+        self.status_code = status_code
+        self.retry_after = retry_after
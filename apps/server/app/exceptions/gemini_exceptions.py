@@ -56,7 +56,7 @@ def _handle_exception(e: Exception) -> None:
         and isinstance(e, genai_errors.UnknownFunctionCallArgumentError)
     ):
         raise HTTPException(
-            status_code=422, detail=f"Function call argument error: {str(e)}"
+            status_code=422, detail=f"Function call argument error: {e!s}"
         )
 
     if (
@@ -64,7 +64,7 @@ def _handle_exception(e: Exception) -> None:
         and hasattr(genai_errors, "UnsupportedFunctionError")
         and isinstance(e, genai_errors.UnsupportedFunctionError)
     ):
-        raise HTTPException(status_code=400, detail=f"Unsupported function: {str(e)}")
+        raise HTTPException(status_code=400, detail=f"Unsupported function: {e!s}")
 
     if (
         genai_errors
@@ -72,7 +72,7 @@ def _handle_exception(e: Exception) -> None:
         and isinstance(e, genai_errors.FunctionInvocationError)
     ):
         raise HTTPException(
-            status_code=422, detail=f"Function invocation failed: {str(e)}"
+            status_code=422, detail=f"Function invocation failed: {e!s}"
         )
 
     if (
@@ -87,16 +87,16 @@ def _handle_exception(e: Exception) -> None:
         error_msg = str(e).lower()
         if "validation" in error_msg or "pydantic" in error_msg:
             raise HTTPException(
-                status_code=422, detail=f"Response validation failed: {str(e)}"
+                status_code=422, detail=f"Response validation failed: {e!s}"
             )
         elif "model" in error_msg and (
             "not found" in error_msg or "invalid" in error_msg
         ):
             raise HTTPException(
-                status_code=404, detail=f"Invalid model configuration: {str(e)}"
+                status_code=404, detail=f"Invalid model configuration: {e!s}"
             )
         else:
-            raise HTTPException(status_code=400, detail=f"Invalid input: {str(e)}")
+            raise HTTPException(status_code=400, detail=f"Invalid input: {e!s}")
 
     # Handle network connectivity issues
     if isinstance(e, ConnectionError):
@@ -148,7 +148,7 @@ def _handle_exception(e: Exception) -> None:
         )
     else:
         raise HTTPException(
-            status_code=500, detail=f"Unexpected error in Gemini service: {str(e)}"
+            status_code=500, detail=f"Unexpected error in Gemini service: {e!s}"
         )
 
 
@@ -1,5 +1,7 @@
+import inspect
+import math
 from functools import wraps
-from typing import Awaitable, Callable, TypeVar
+from typing import TypeVar
 
 from fastapi import HTTPException
 from githubkit.exception import RateLimitExceeded, RequestFailed, RequestTimeout
@@ -7,45 +9,82 @@ from githubkit.exception import RateLimitExceeded, RequestFailed, RequestTimeout
 R = TypeVar("R")
 
 
-def handle_github_exceptions(
-    func: Callable[..., Awaitable[R]],
-) -> Callable[..., Awaitable[R]]:
+class RateLimitBudgetExhausted(Exception):
+    """Raised before a GitHub call that would wait too long for rate-limit budget."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(
+            f"GitHub rate limit budget exhausted, retry in {retry_after:.0f}s"
+        )
+        self.retry_after = retry_after
+
+
+def handle_github_exceptions(func):
     """
     Decorator to handle GitHub exceptions.
     """
 
     @wraps(func)
-    async def wrapper(*args, **kwargs) -> R:
+    async def async_wrapper(*args, **kwargs):
         try:
             return await func(*args, **kwargs)
-        except RequestFailed as e:
-            if e.response.status_code == 404:
-                raise HTTPException(status_code=404, detail="Resource not found")
-            elif e.response.status_code == 403:
-                raise HTTPException(
-                    status_code=403, detail="Access denied or API rate limit exceeded"
-                )
-            elif e.response.status_code == 401:
-                raise HTTPException(
-                    status_code=401, detail="Invalid or expired GitHub token"
-                )
-            else:
-                raise HTTPException(
-                    status_code=500, detail=f"GitHub API error: {str(e)}"
-                )
-        except RateLimitExceeded as e:
+        except Exception as e:
+            _handle_exception(e)
+
+    @wraps(func)
+    async def async_generator_wrapper(*args, **kwargs):
+        try:
+            async for item in func(*args, **kwargs):
+                yield item
+        except Exception as e:
+            _handle_exception(e)
+
+    # Check if the function is an async generator
+    if inspect.isasyncgenfunction(func):
+        return async_generator_wrapper
+    else:
+        return async_wrapper
+
+
+def _handle_exception(e: Exception) -> None:
+    """Convert GitHub exceptions to appropriate HTTPExceptions."""
+
+    if isinstance(e, ExceptionGroup):
+        # A call failed inside a TaskGroup, report it as if it had failed alone
+        _handle_exception(e.exceptions[0])
+    elif isinstance(e, HTTPException):
+        # Already mapped by the wrapped function
+        raise e
+    elif isinstance(e, RequestFailed):
+        if e.response.status_code == 404:
+            raise HTTPException(status_code=404, detail="Resource not found")
+        elif e.response.status_code == 403:
             raise HTTPException(
-                status_code=429,
-                detail="GitHub API rate limit exceeded",
-                headers={"Retry-After": str(int(e.retry_after.total_seconds()))},
+                status_code=403, detail="Access denied or API rate limit exceeded"
             )
-        except RequestTimeout:
+        elif e.response.status_code == 401:
             raise HTTPException(
-                status_code=504,
-                detail="GitHub API request timed out",
-                headers={"Retry-After": "60"},
+                status_code=401, detail="Invalid or expired GitHub token"
             )
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
-
-    return wrapper
+        else:
+            raise HTTPException(status_code=500, detail=f"GitHub API error: {e!s}")
+    elif isinstance(e, RateLimitExceeded):
+        raise HTTPException(
+            status_code=429,
+            detail="GitHub API rate limit exceeded",
+            headers={"Retry-After": str(int(e.retry_after.total_seconds()))},
+        )
+    elif isinstance(e, RateLimitBudgetExhausted):
+        raise HTTPException(
+            status_code=429,
+            detail="GitHub API rate limit exceeded",
+            headers={"Retry-After": str(math.ceil(e.retry_after))},
+        )
+    elif isinstance(e, RequestTimeout):
+        raise HTTPException(
+            status_code=504,
+            detail="GitHub API request timed out",
+            headers={"Retry-After": "60"},
+        )
+    else:
+        raise HTTPException(status_code=500, detail=f"Unexpected error: {e!s}")
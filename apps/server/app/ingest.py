@@ -0,0 +1,45 @@
+"""
+Sync repositories into the local issue index.
+
+    python -m app.ingest vitejs/vite vercel/next.js
+
+Run it on a schedule more often than ISSUE_INDEX_MAX_AGE_SECONDS to keep hot
+repositories served from the index; each run only fetches issues updated since
+the previous one.
+"""
+
+import argparse
+import asyncio
+import sys
+
+from .core.config import settings
+from .services.github import sync_issue_index
+from .services.issue_index import issue_index
+
+
+async def ingest(repos: list[str]) -> int:
+    failed = 0
+    for repo in repos:
+        try:
+            synced = await sync_issue_index(repo=repo)
+        except Exception as e:
+            failed += 1
+            print(f"{repo}: sync failed: {e}", file=sys.stderr)
+        else:
+            print(f"{repo}: {synced} issues synced")
+    await issue_index.close()
+    return 1 if failed else 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("repos", nargs="+", metavar="owner/repo")
+    args = parser.parse_args()
+
+    if not settings.ISSUE_INDEX_PATH:
+        parser.error("ISSUE_INDEX_PATH is not set")
+    sys.exit(asyncio.run(ingest(args.repos)))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,47 @@
-from contextlib import asynccontextmanager
+import asyncio
+from contextlib import asynccontextmanager, suppress
 
-import instructor
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from .api import api_router
+from .api.routes import metrics
+from .core.cache import cache_backend
 from .core.config import settings
+from .core.tracing import configure_tracing, create_exporter, shutdown_tracing
+from .core.upstream import close_pools, warm_up_pools
+from .services.gemini import shared_llm
+from .services.issue_index import issue_index
+from .services.warmer import run_warmer
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    llm = instructor.from_provider(
-        "google/gemini-2.5-flash-lite",
-        api_key=settings.GOOGLE_API_KEY,
-        async_client=True,
+    configure_tracing(
+        create_exporter(settings.TRACING_EXPORTER, settings.TRACING_FILE_PATH)
     )
+    shared_llm()
+    # Pay for DNS and the TLS handshakes before the first search does
+    if settings.UPSTREAM_WARMUP:
+        await warm_up_pools(settings.UPSTREAM_WARMUP_TIMEOUT_SECONDS)
 
-    app.state.llm = llm
+    # Refresh popular repositories in the background with otherwise idle quota
+    warmer = asyncio.create_task(run_warmer()) if settings.WARMER_ENABLED else None
 
     yield
 
+    if warmer is not None:
+        warmer.cancel()
+        with suppress(asyncio.CancelledError):
+            await warmer
+
+    await close_pools()
+    await cache_backend.close()
+    await issue_index.close()
+
+    # Export the spans still buffered
+    shutdown_tracing()
+
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
@@ -45,3 +67,4 @@ async def root():
 
 
 app.include_router(api_router, prefix=settings.API_V1_STR)
+app.include_router(metrics.router)
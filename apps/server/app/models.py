@@ -1,20 +1,32 @@
-from typing import Annotated, List, Optional, TypedDict
+from typing import Annotated, TypedDict
 
 from fastapi import Query
 from pydantic import BaseModel, Field, HttpUrl
 
+from .core.config import settings
+
 
 class IssueQueryResult(BaseModel):
     technology: str
-    queries: List[str]
+    queries: list[str]
     confidence: float
 
 
+class IssueQueryBatch(BaseModel):
+    results: list[IssueQueryResult]
+
+
 class SearchRequest(BaseModel):
-    repo: Optional[Annotated[str, Query(pattern=r"^[^/\s]+/[^/\s]+$")]] = None
+    repo: Annotated[str, Query(pattern=r"^[^/\s]+/[^/\s]+$")] | None = None
     query: Annotated[str, Query(min_length=15)]
 
 
+class BatchSearchRequest(BaseModel):
+    searches: list[SearchRequest] = Field(
+        min_length=1, max_length=settings.BATCH_MAX_SEARCHES
+    )
+
+
 class CommentData(TypedDict):
     body: str
     username: str
@@ -26,7 +38,7 @@ class IssueWithComments(BaseModel):
     title: str
     issue_url: HttpUrl = Field(alias="html_url")
     body: str
-    comments: List[CommentData]
+    comments: list[CommentData]
 
 
 class CitationSource(BaseModel):
@@ -35,10 +47,10 @@ class CitationSource(BaseModel):
     title: str
     url: str
     issue_number: int
-    author: Optional[str] = None
-    preview: Optional[str] = None
+    author: str | None = None
+    preview: str | None = None
 
 
 class SearchResponse(BaseModel):
     answer: str
-    sources: List[CitationSource]
+    sources: list[CitationSource]
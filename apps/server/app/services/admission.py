@@ -0,0 +1,250 @@
+"""
+Admission control for searches.
+
+Every search takes a ticket before it runs. A bounded number of searches run at
+once; the rest wait in a queue that is fair between clients: each client has its
+own FIFO and the next free slot goes to the clients in turn, so one client
+sending many searches does not push everyone else back. Each client can also
+have a token bucket limiting how fast it starts searches. Requests are turned away
+up front, with a `Retry-After`, once the queue is full or the client is over its
+rate, instead of joining a backlog that would time out for everyone.
+
+Inside a running search, the LLM and GitHub-heavy stages have their own
+process-wide concurrency limits, see `stage_limits`.
+"""
+
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from collections.abc import AsyncGenerator, AsyncIterator, Callable
+from contextlib import asynccontextmanager
+from typing import Self
+
+from fastapi import Request
+
+from ..core.config import settings
+from ..core.metrics import admission_rejections
+from ..exceptions.admission_exceptions import AdmissionRejected
+from .rate_limit import TokenBucket
+
+
+class Ticket:
+    """A search's place in the admission queue, then its running slot."""
+
+    def __init__(self, controller: "AdmissionController", client: str):
+        self.controller = controller
+        self.client = client
+        self.admitted = False
+        self.released = False
+        self.admitted_at: float | None = None
+
+    async def wait(self) -> AsyncIterator[int]:
+        """
+        Wait to be admitted, yielding the queue position (1 is next) whenever it
+        changes. Yields nothing when the ticket was admitted right away.
+        """
+        last = None
+        while True:
+            changed = self.controller._changed
+            if self.admitted or self.released:
+                return
+            position = self.controller.position(self)
+            if position != last:
+                last = position
+                yield position
+            await changed.wait()
+
+    def release(self) -> None:
+        """Give back the slot, or the place in the queue. Safe to call twice."""
+        if not self.released:
+            self.released = True
+            self.controller._release(self)
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.release()
+
+
+class AdmissionController:
+    """Bounded concurrency and a bounded, per-client fair queue for searches."""
+
+    def __init__(
+        self,
+        *,
+        max_active: int,
+        max_queue: int,
+        client_rate: float,
+        client_burst: int,
+        max_clients: int = 10_000,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_active = max_active
+        self.max_queue = max_queue
+        self.client_rate = client_rate
+        self.client_burst = client_burst
+        self.max_clients = max_clients
+        self.active = 0
+        # Moving average of how long a search holds its slot, for Retry-After
+        self.average_duration = 10.0
+        self._clock = clock
+        self._queues: dict[str, deque[Ticket]] = {}
+        self._buckets: OrderedDict[str, TokenBucket] = OrderedDict()
+        self._changed = asyncio.Event()
+
+    @property
+    def queued(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    def _bucket(self, client: str) -> TokenBucket:
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            bucket = TokenBucket(
+                capacity=self.client_burst,
+                period=self.client_burst / self.client_rate,
+                clock=self._clock,
+            )
+            self._buckets[client] = bucket
+            # Forget the least recently seen clients, their buckets refilled long ago
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(client)
+        return bucket
+
+    def retry_after(self) -> float:
+        """Rough time until a new search would get a slot."""
+        return self.average_duration * (self.queued + 1) / self.max_active
+
+    def enter(self, client: str) -> Ticket:
+        """
+        Take a ticket for `client`: admitted at once when a slot is free and
+        nobody is waiting, queued otherwise. Raises `AdmissionRejected` when the
+        client is over its rate or the queue is full.
+        """
+        # A rate of 0 turns per-client limiting off
+        bucket = self._bucket(client) if self.client_rate > 0 else None
+        if bucket is not None and (wait := bucket.delay()) > 0:
+            admission_rejections.inc(reason="client_rate")
+            raise AdmissionRejected("client_rate", status_code=429, retry_after=wait)
+        admit_now = self.active < self.max_active and not self.queued
+        if not admit_now and self.queued >= self.max_queue:
+            admission_rejections.inc(reason="queue_full")
+            raise AdmissionRejected(
+                "queue_full", status_code=503, retry_after=self.retry_after()
+            )
+        if bucket is not None:
+            bucket.reserve()
+
+        ticket = Ticket(self, client)
+        if admit_now:
+            self._admit(ticket)
+        else:
+            self._queues.setdefault(client, deque()).append(ticket)
+            self._notify()
+        return ticket
+
+    def _admit(self, ticket: Ticket) -> None:
+        self.active += 1
+        ticket.admitted = True
+        ticket.admitted_at = self._clock()
+
+    def _next(self) -> Ticket:
+        # Clients take turns: the served client moves behind the others
+        client = next(iter(self._queues))
+        queue = self._queues.pop(client)
+        ticket = queue.popleft()
+        if queue:
+            self._queues[client] = queue
+        return ticket
+
+    def position(self, ticket: Ticket) -> int:
+        """1-based position of a queued ticket in the order slots will be given out."""
+        queue = self._queues.get(ticket.client)
+        if queue is None or ticket not in queue:
+            return 0
+        index = queue.index(ticket)
+        clients = list(self._queues)
+        turn = clients.index(ticket.client)
+        # Full rounds before the ticket's turn, plus the clients served before it
+        # in its own round
+        ahead = sum(min(len(self._queues[c]), index) for c in clients)
+        ahead += sum(1 for c in clients[:turn] if len(self._queues[c]) > index)
+        return ahead + 1
+
+    def _release(self, ticket: Ticket) -> None:
+        if ticket.admitted:
+            self.active -= 1
+            held = self._clock() - ticket.admitted_at
+            self.average_duration += 0.1 * (held - self.average_duration)
+        else:
+            queue = self._queues.get(ticket.client)
+            if queue is not None and ticket in queue:
+                queue.remove(ticket)
+                if not queue:
+                    del self._queues[ticket.client]
+        while self.active < self.max_active and self._queues:
+            self._admit(self._next())
+        self._notify()
+
+    def _notify(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+
+class StageLimiter:
+    """Process-wide concurrency limit for one kind of search stage."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.in_flight = 0
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(limit)
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncGenerator[None, None]:
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+
+def client_id(request: Request) -> str:
+    """
+    The client a request is accounted to: its IP address, the first
+    `X-Forwarded-For` hop when that header is trusted.
+
+    Bearer tokens are not used: the app does not authenticate them, so a client
+    could send a new one with every request to get a fresh bucket and queue.
+    """
+    forwarded = request.headers.get("x-forwarded-for")
+    if settings.ADMISSION_TRUST_FORWARDED_FOR and forwarded:
+        return "ip:" + forwarded.split(",")[0].strip()
+    return "ip:" + (request.client.host if request.client else "unknown")
+
+
+def retry_after_header(seconds: float) -> str:
+    return str(max(1, math.ceil(seconds)))
+
+
+search_admission = AdmissionController(
+    max_active=settings.ADMISSION_MAX_ACTIVE_SEARCHES,
+    max_queue=settings.ADMISSION_MAX_QUEUE,
+    client_rate=settings.ADMISSION_CLIENT_RATE_PER_MINUTE / 60,
+    client_burst=settings.ADMISSION_CLIENT_BURST,
+)
+
+# Stages of a running search that call Gemini or GitHub heavily
+stage_limits = {
+    "llm": StageLimiter(settings.ADMISSION_LLM_CONCURRENCY),
+    "github": StageLimiter(settings.ADMISSION_GITHUB_CONCURRENCY),
+}
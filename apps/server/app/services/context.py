@@ -0,0 +1,103 @@
+import math
+import re
+from itertools import zip_longest
+
+from ..models import IssueWithComments
+
+# Gemini averages roughly four characters of English text per token
+CHARS_PER_TOKEN = 4
+
+_BLANK_LINES_RE = re.compile(r"\n\s*\n+")
+
+TRUNCATION_MARKER = " …[truncated]"
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate, close enough to budget a prompt without a tokenizer."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _truncate(text: str, max_tokens: int) -> str:
+    text = _BLANK_LINES_RE.sub("\n\n", text.strip())
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    cut = text[: max_tokens * CHARS_PER_TOKEN - len(TRUNCATION_MARKER)]
+    # Prefer ending on a word boundary
+    cut = cut.rsplit(None, 1)[0] if " " in cut else cut
+    return cut + TRUNCATION_MARKER
+
+
+def _issue_block(index: int, issue: IssueWithComments, max_item_tokens: int) -> str:
+    number = issue.get("issue_number") or issue.get("number")
+    header = f"## {index}. #{number} {issue.get('title', '')}"
+    # The model cites sources by these URLs, the UI links to what it cites
+    if url := issue.get("issue_url"):
+        header += f" <{url}>"
+    body = _truncate(issue.get("body") or "", max_item_tokens)
+    return f"{header}\n{body}" if body else header
+
+
+def _comment_block(
+    index: int, position: int, comment: dict, max_item_tokens: int
+) -> str:
+    author = comment.get("username") or comment.get("author") or "unknown"
+    header = f"### {index}.{position} @{author}"
+    if url := comment.get("comment_url"):
+        header += f" <{url}>"
+    return f"{header}\n{_truncate(comment.get('body') or '', max_item_tokens)}"
+
+
+def pack_context(
+    issues_with_comments: list[IssueWithComments],
+    *,
+    token_budget: int,
+    max_item_tokens: int,
+) -> str:
+    """
+    Serialize issues and comments into a compact numbered outline within a token budget.
+
+    Issues arrive ranked by relevance and their comments by reactions. Blocks are
+    packed greedily in value order: every issue first, then each issue's top
+    comment, then each second comment, and so on. A block that does not fit is
+    skipped so smaller ones can still use the remaining budget. The packed blocks
+    are written back in issue order, each comment under its issue.
+    """
+
+    issues = [
+        _issue_block(index, issue, max_item_tokens)
+        for index, issue in enumerate(issues_with_comments, start=1)
+    ]
+    comments = [
+        [
+            _comment_block(index, position, comment, max_item_tokens)
+            for position, comment in enumerate(issue.get("comments") or [], start=1)
+        ]
+        for index, issue in enumerate(issues_with_comments, start=1)
+    ]
+
+    # (issue index, comment position or None for the issue itself), best first
+    candidates: list[tuple[int, int | None]] = [(i, None) for i in range(len(issues))]
+    for rank in zip_longest(*(range(len(blocks)) for blocks in comments)):
+        candidates.extend((i, j) for i, j in enumerate(rank) if j is not None)
+
+    packed: set[tuple[int, int | None]] = set()
+    used = 0
+    for i, j in candidates:
+        if j is not None and (i, None) not in packed:
+            # A comment is meaningless without the issue it belongs to
+            continue
+        cost = estimate_tokens(issues[i] if j is None else comments[i][j])
+        if used + cost > token_budget:
+            continue
+        packed.add((i, j))
+        used += cost
+
+    sections = []
+    for i, block in enumerate(issues):
+        if (i, None) not in packed:
+            continue
+        sections.append(block)
+        sections.extend(
+            comment for j, comment in enumerate(comments[i]) if (i, j) in packed
+        )
+    return "\n\n".join(sections)
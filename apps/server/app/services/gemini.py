@@ -1,11 +1,31 @@
-from typing import AsyncGenerator
-
+import asyncio
+import logging
+import time
+from collections.abc import AsyncGenerator
+from contextlib import nullcontext
+from functools import cache
+
+import httpx
 import instructor
 from fastapi import Request
-from ..core.config import settings
 
+from ..core import tracing
+from ..core.cache import ModelCodec, SharedCache
+from ..core.config import settings
+from ..core.metrics import StageTimer, record_upstream_call
+from ..core.text import STOP_WORDS, tokenize
+from ..core.upstream import gemini_pool
 from ..exceptions.gemini_exceptions import handle_gemini_exceptions
-from ..models import IssueQueryResult, IssueWithComments, SearchResponse
+from ..models import (
+    IssueQueryBatch,
+    IssueQueryResult,
+    IssueWithComments,
+    SearchResponse,
+)
+from .admission import stage_limits
+from .context import pack_context
+
+logger = logging.getLogger(__name__)
 
 SYS_PROMPT = """
     You are an expert technical analyst specializing in identifying software technologies and generating effective GitHub issue search queries.
@@ -73,36 +93,186 @@ SYS_PROMPT = """
 """
 
 
-def _create_llm() -> instructor.AsyncInstructor:
+# Query plans keyed on the canonical user query, including "irrelevant" verdicts
+query_plan_cache: SharedCache[IssueQueryResult] = SharedCache(
+    "query_plan",
+    ttl=settings.QUERY_PLAN_CACHE_TTL_SECONDS,
+    codec=ModelCodec(IssueQueryResult),
+)
+
+
+def canonicalize_query(user_query: str) -> str:
+    """Normalize case, whitespace, punctuation and stop words of a user query."""
+    tokens = tokenize(user_query)
+    meaningful = [token for token in tokens if token not in STOP_WORDS]
+    # A query made only of stop words still deserves its own entry
+    return " ".join(meaningful or tokens)
+
+
+MODEL = "gemini-2.5-flash-lite"
+
+
+def create_llm() -> instructor.AsyncInstructor:
+    http_options = {
+        # Reuse the shared Gemini connections, carrying the current trace context
+        "httpx_async_client": httpx.AsyncClient(
+            transport=gemini_pool,
+            event_hooks={"request": [tracing.propagate_trace_context]},
+        ),
+    }
+    if settings.GEMINI_BASE_URL:
+        http_options["base_url"] = settings.GEMINI_BASE_URL
     return instructor.from_provider(
-        "google/gemini-2.5-flash-lite",
+        f"google/{MODEL}",
         api_key=settings.GOOGLE_API_KEY,
         async_client=True,
+        # Structured outputs stream the JSON text token by token, tool calls do not
+        mode=instructor.Mode.JSON,
+        http_options=http_options,
     )
 
 
+@cache
+def shared_llm() -> instructor.AsyncInstructor:
+    """The LLM client of the process, created at startup."""
+    return create_llm()
+
+
+def get_llm(request: Request) -> instructor.AsyncInstructor:
+    """The request's LLM client when it has one, the shared one otherwise."""
+    llm: instructor.AsyncInstructor | None = getattr(request.state, "llm", None)
+    return llm if llm is not None else shared_llm()
+
+
 @handle_gemini_exceptions
 async def generate_issue_queries(
-    *, request: Request, user_query: str
+    *, request: Request, user_query: str, timer: StageTimer | None = None
 ) -> IssueQueryResult:
-    """Analyzes a user query to identify tech stack, intent, and generate GitHub search queries."""
+    """
+    Analyzes a user query to identify tech stack, intent, and generate GitHub search queries.
 
-    llm: instructor.AsyncInstructor | None = getattr(request.state, "llm", None)
-    if llm is None:
-        llm = _create_llm()
-        request.state.llm = llm
+    With a `timer`, records the `query_generation` stage: the plan cache lookup
+    on a hit, otherwise the Gemini call once its stage slot is held.
+    """
 
-    response = await llm.messages.create(
-        messages=[
-            {"role": "system", "content": SYS_PROMPT},
-            {"role": "user", "content": f"User Query: {user_query}"},
-        ],
-        response_model=IssueQueryResult,
-    )
+    started = time.perf_counter()
+    key = canonicalize_query(user_query)
+    cached = await query_plan_cache.get(key)
+    if cached is not None:
+        tracing.set_attributes(query_plan_cache_hit=True)
+        if timer is not None:
+            timer.record("query_generation", time.perf_counter() - started)
+        return cached
+
+    llm = get_llm(request)
+
+    # Gemini calls are limited across all running searches
+    async with stage_limits["llm"].slot():
+        stage = timer.stage("query_generation") if timer is not None else nullcontext()
+        with stage:
+            started = time.perf_counter()
+            with tracing.span("gemini.query_plan", model=MODEL) as current:
+                try:
+                    response = await llm.messages.create(
+                        messages=[
+                            {"role": "system", "content": SYS_PROMPT},
+                            {"role": "user", "content": f"User Query: {user_query}"},
+                        ],
+                        response_model=IssueQueryResult,
+                    )
+                except Exception:
+                    record_upstream_call(
+                        "gemini", "query_plan", "error", time.perf_counter() - started
+                    )
+                    raise
+                current.set_attributes(
+                    {
+                        "technology": response.technology,
+                        "query_count": len(response.queries),
+                    }
+                )
+            record_upstream_call(
+                "gemini", "query_plan", "ok", time.perf_counter() - started
+            )
+
+    await query_plan_cache.set(key, response)
 
     return response
 
 
+BATCH_PLAN_PROMPT = """
+    ## Batch Mode
+    The user message holds several numbered user queries. Analyze each of them
+    independently, exactly as described above, and return one result per query in
+    `results`, in the same order as the queries.
+"""
+
+
+async def plan_issue_queries(*, request: Request, user_queries: list[str]) -> int:
+    """
+    Plan the GitHub searches of many user queries ahead of running them, several
+    queries per Gemini call. The plans land in `query_plan_cache`, where
+    `generate_issue_queries` finds them; queries whose group fails are left to
+    be planned one by one. Returns the number of Gemini calls made.
+    """
+
+    # Without the cache the plans would have nowhere to go
+    if query_plan_cache.ttl <= 0:
+        return 0
+
+    pending: dict[str, str] = {}
+    for user_query in user_queries:
+        key = canonicalize_query(user_query)
+        if key not in pending and await query_plan_cache.get(key) is None:
+            pending[key] = user_query
+    if not pending:
+        return 0
+
+    llm = get_llm(request)
+
+    size = max(1, settings.BATCH_QUERY_PLAN_GROUP_SIZE)
+    items = list(pending.items())
+    groups = [items[i : i + size] for i in range(0, len(items), size)]
+    await asyncio.gather(*(_plan_group(llm, group) for group in groups))
+    return len(groups)
+
+
+async def _plan_group(
+    llm: instructor.AsyncInstructor, group: list[tuple[str, str]]
+) -> None:
+    numbered = "\n".join(f"{i}. {query}" for i, (_, query) in enumerate(group, 1))
+    async with stage_limits["llm"].slot():
+        started = time.perf_counter()
+        with tracing.span(
+            "gemini.query_plan_batch", model=MODEL, query_count=len(group)
+        ) as current:
+            try:
+                response = await llm.messages.create(
+                    messages=[
+                        {"role": "system", "content": SYS_PROMPT + BATCH_PLAN_PROMPT},
+                        {"role": "user", "content": f"User Queries:\n{numbered}"},
+                    ],
+                    response_model=IssueQueryBatch,
+                )
+            except Exception as e:
+                logger.warning("Batch query planning failed", exc_info=True)
+                record_upstream_call(
+                    "gemini", "query_plan_batch", "error", time.perf_counter() - started
+                )
+                tracing.record_failure(current, e)
+                return
+            current.set_attribute("result_count", len(response.results))
+        record_upstream_call(
+            "gemini", "query_plan_batch", "ok", time.perf_counter() - started
+        )
+
+    # Results that can't be matched to their queries are dropped
+    if len(response.results) != len(group):
+        return
+    for (key, _), plan in zip(group, response.results):
+        await query_plan_cache.set(key, plan)
+
+
 ANSWER_PROMPT = """
     You are **Pinpoint**, a helpful search assistant. Your task is to write an accurate, detailed, and comprehensive answer to a given query using provided GitHub issues and comments, following the specific guidelines below.
 
@@ -181,7 +351,9 @@ ANSWER_PROMPT = """
     
     ## Context Data:
     - User Query: {user_query}
-    - Issues with Comments: {issues_with_comments}
+    - Issues with Comments (numbered issues, each followed by its comments ranked by reactions):
+
+{issues_with_comments}
 
     ## **FINAL CITATION REMINDER - ABSOLUTELY CRITICAL:**
     **YOU MUST USE SEQUENTIAL NUMBERING: [1], [2], [3], [4], etc.**
@@ -193,22 +365,32 @@ ANSWER_PROMPT = """
 
 @handle_gemini_exceptions
 async def generate_streaming_answer(
-    *, request: Request, user_query: str, issues_with_comments: list[IssueWithComments]
+    *,
+    request: Request,
+    user_query: str,
+    issues_with_comments: list[IssueWithComments],
+    timer: StageTimer | None = None,
 ) -> AsyncGenerator[dict, None]:
     """
     Generate a streaming AI response based on user query and collected GitHub data.
+
+    With a `timer`, records the `llm_first_token` stage (to the first answer
+    text) and the `llm_completion` stage (to the end of the stream), both timed
+    from when the stage slot is held.
     """
 
-    llm: instructor.AsyncInstructor | None = getattr(request.state, "llm", None)
-    if llm is None:
-        llm = _create_llm()
-        request.state.llm = llm
+    llm = get_llm(request)
 
-    prompt = ANSWER_PROMPT.format(
-        user_query=user_query, issues_with_comments=issues_with_comments
+    # Pack the most valuable issues and comments into a fixed token budget
+    context = pack_context(
+        issues_with_comments,
+        token_budget=settings.ANSWER_CONTEXT_TOKEN_BUDGET,
+        max_item_tokens=settings.ANSWER_CONTEXT_MAX_ITEM_TOKENS,
     )
+    prompt = ANSWER_PROMPT.format(user_query=user_query, issues_with_comments=context)
 
-    response = await llm.messages.create(
+    # Stream partial responses and forward only the newly generated answer text
+    stream = llm.messages.create_partial(
         messages=[
             {
                 "role": "user",
@@ -218,14 +400,54 @@ async def generate_streaming_answer(
         response_model=SearchResponse,
     )
 
-    try:
-        data = response.model_dump()
-
-        answer = data.get("answer")
-        if answer:
-            yield {"type": "answer", "data": answer}
+    answer = ""
+    response = None
+    # Latency to the first partial response, the part of the stream Gemini controls
+    first_chunk: float | None = None
+
+    async with stage_limits["llm"].slot():
+        # Timed from the slot, so waiting for one doesn't count as model latency
+        started = time.perf_counter()
+        with tracing.span(
+            "gemini.answer",
+            model=MODEL,
+            issue_count=len(issues_with_comments),
+            prompt_chars=len(prompt),
+        ) as current:
+            try:
+                async for response in stream:
+                    if first_chunk is None:
+                        first_chunk = time.perf_counter() - started
+                    text = response.answer or ""
+                    # A partial answer only ever grows; skip the rare re-parse that doesn't extend it
+                    if len(text) > len(answer) and text.startswith(answer):
+                        if timer is not None and not answer:
+                            timer.record(
+                                "llm_first_token", time.perf_counter() - started
+                            )
+                        yield {"type": "answer", "data": text[len(answer) :]}
+                        answer = text
+            except (asyncio.CancelledError, GeneratorExit):
+                record_upstream_call("gemini", "answer", "cancelled", first_chunk)
+                raise
+            except Exception:
+                record_upstream_call(
+                    "gemini",
+                    "answer",
+                    "error",
+                    first_chunk or time.perf_counter() - started,
+                )
+                raise
+            current.set_attributes(
+                {"answer_chars": len(answer), "first_chunk_seconds": first_chunk}
+            )
+        record_upstream_call("gemini", "answer", "ok", first_chunk)
+        if timer is not None:
+            timer.record("llm_completion", time.perf_counter() - started)
 
-        sources = data.get("sources")
+    try:
+        # Sources are generated after the answer and are only complete at the end
+        sources = response.model_dump().get("sources") if response else None
         if sources:
             yield {"type": "sources", "data": sources}
     except Exception as e:
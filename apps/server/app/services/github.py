@@ -1,147 +1,618 @@
 import asyncio
+import logging
+import math
+import re
+import time
+from collections import Counter
+from collections.abc import AsyncGenerator
+from typing import Any
 
+import httpx
 from githubkit import GitHub
+from githubkit.cache import MemCacheStrategy
+from githubkit.exception import RateLimitExceeded
+from githubkit.hishel import AsyncMemoryStorage
 from githubkit.versions.latest.models import IssueSearchResultItem
+from hishel import AsyncBaseStorage, AsyncSqliteStorage
 
+from ..core import tracing
+from ..core.cache import SharedCache
 from ..core.config import settings
-from ..exceptions.github_exceptions import handle_github_exceptions
+from ..core.metrics import StageTimer, record_upstream_call
+from ..core.singleflight import SingleFlight
+from ..core.upstream import github_pool
+from ..exceptions.github_exceptions import (
+    RateLimitBudgetExhausted,
+    handle_github_exceptions,
+)
 from ..models import CommentData, IssueWithComments
+from .issue_index import IndexedIssue, issue_index
+from .ranking import rank_issues
+from .rate_limit import github_scheduler
+from .repositories import repository_index
 
-gh = GitHub(settings.GITHUB_TOKEN)
+logger = logging.getLogger(__name__)
 
 
-@handle_github_exceptions
-async def search_issues(
-    *, repo: str, queries: list[str]
-) -> list[IssueSearchResultItem]:
+class _PersistentSqliteStorage(AsyncSqliteStorage):
+    """On-disk hishel storage that outlives the short-lived httpx clients githubkit creates."""
+
+    async def close(self) -> None:
+        # githubkit closes the storage with every client; keep the connection for the next one
+        return
+
+    async def force_close(self) -> None:
+        await super().close()
+
+
+class ConditionalCacheStrategy(MemCacheStrategy):
     """
-    Search for issues in a repository and return them.
+    ETag/Last-Modified response cache for the GitHub client.
+
+    githubkit sends `Cache-Control: no-cache`, so every cached response is
+    revalidated with `If-None-Match`/`If-Modified-Since`. GitHub answers an
+    unchanged resource with a 304, which does not count against the rate limit.
     """
 
-    issue_tasks = []
+    def __init__(self, *, path: str | None = None, ttl: float | None = None) -> None:
+        super().__init__()
+        self.path = path
+        self.ttl = ttl
+
+    async def get_async_hishel_storage(self) -> AsyncBaseStorage:
+        if self._hishel_async_storage is None:
+            if self.path:
+                self._hishel_async_storage = _PersistentSqliteStorage(
+                    database_path=self.path, default_ttl=self.ttl
+                )
+            else:
+                self._hishel_async_storage = AsyncMemoryStorage(
+                    default_ttl=self.ttl, keep_unclosed=True
+                )
+        return self._hishel_async_storage
+
+
+# Outcome of every GitHub response against the conditional cache
+http_cache_stats: Counter[str] = Counter()
+
+
+async def _record_cache_outcome(response: httpx.Response) -> None:
+    if not response.extensions.get("hishel_from_cache"):
+        http_cache_stats["miss"] += 1
+    elif response.extensions.get("hishel_revalidated"):
+        http_cache_stats["revalidated"] += 1
+    else:
+        http_cache_stats["hit"] += 1
+
+
+# Path pattern -> operation name, for the upstream call metrics
+_OPERATIONS = [
+    (re.compile(r"/search/issues$"), "search_issues"),
+    (re.compile(r"/search/repositories$"), "search_repositories"),
+    (re.compile(r"/graphql$"), "graphql"),
+    (re.compile(r"/issues/\d+/comments$"), "list_comments"),
+    (re.compile(r"/repos/[^/]+/[^/]+/issues$"), "list_issues"),
+    (re.compile(r"/repos/[^/]+/[^/]+$"), "get_repository"),
+]
+
+
+def _operation(request: httpx.Request) -> str:
+    for pattern, operation in _OPERATIONS:
+        if pattern.search(request.url.path):
+            return operation
+    return "other"
+
+
+async def _stamp_request_start(request: httpx.Request) -> None:
+    request.extensions["pinpoint_started_at"] = time.perf_counter()
+
+
+async def _record_upstream_call(response: httpx.Response) -> None:
+    started_at = response.request.extensions.get("pinpoint_started_at")
+    elapsed = time.perf_counter() - started_at if started_at is not None else None
+    headers = response.headers
+    if response.extensions.get("hishel_from_cache"):
+        if not response.extensions.get("hishel_revalidated"):
+            # Served without a round-trip, its latency says nothing about GitHub
+            elapsed = None
+            outcome = "cache_hit"
+        else:
+            outcome = "not_modified"
+    elif response.status_code < 400:
+        outcome = "ok"
+    elif response.status_code in (403, 429) and (
+        headers.get("x-ratelimit-remaining") == "0" or "retry-after" in headers
+    ):
+        outcome = "rate_limited"
+    elif response.status_code < 500:
+        outcome = "client_error"
+    else:
+        outcome = "server_error"
+    record_upstream_call("github", _operation(response.request), outcome, elapsed)
+    tracing.set_attributes(status_code=response.status_code, http_cache=outcome)
+
+
+def create_github_client(**config: Any) -> GitHub:
+    """Create a GitHub client with the conditional response cache configured from settings."""
+    config.setdefault("http_cache", settings.GITHUB_HTTP_CACHE)
+    config.setdefault(
+        "cache_strategy",
+        ConditionalCacheStrategy(
+            path=settings.GITHUB_HTTP_CACHE_PATH,
+            ttl=settings.GITHUB_HTTP_CACHE_TTL_SECONDS,
+        ),
+    )
+    if settings.GITHUB_API_BASE_URL:
+        config.setdefault("base_url", settings.GITHUB_API_BASE_URL)
+    # Every short-lived client githubkit creates reuses the shared connections
+    config.setdefault("async_transport", github_pool)
+    config.setdefault("throttler", github_scheduler)
+    config.setdefault(
+        "async_event_hooks",
+        {
+            "request": [_stamp_request_start, tracing.propagate_trace_context],
+            "response": [
+                _record_cache_outcome,
+                _record_upstream_call,
+                github_scheduler.observe,
+            ],
+        },
+    )
+    return GitHub(settings.GITHUB_TOKEN, **config)
+
+
+gh = create_github_client()
+
+# Search and comment results, shared with the other workers through the cache backend
+github_cache: SharedCache[list] = SharedCache(
+    "github", ttl=settings.GITHUB_RESULT_CACHE_TTL_SECONDS
+)
+
+# Identical calls made concurrently by different searches share one request
+_inflight_calls: SingleFlight[tuple, Any] = SingleFlight()
+
+
+# Running out of rate limit fails the whole search with a 429, other failures of a
+# single call only leave its results out
+_RATE_LIMITED = (RateLimitExceeded, RateLimitBudgetExhausted)
+
 
-    # Wrap individual API calls so failures don't bubble up and break the TaskGroup
-    async def _search_single(query: str):
+# Wrap individual API calls so failures don't bubble up and break the TaskGroup
+async def _search_single(repo: str, query: str) -> list[IssueSearchResultItem] | None:
+    if await issue_index.is_fresh(repo):
+        # Hot repositories are served locally without spending search quota
+        tracing.set_attributes(local_index=True)
+        return await issue_index.search(repo, query)
+    return await _inflight_calls.do(
+        ("search", repo.lower(), query), lambda: _request_search(repo, query)
+    )
+
+
+async def _request_search(
+    repo: str, query: str
+) -> list[IssueSearchResultItem | IndexedIssue] | None:
+    key = ("search", repo.lower(), query)
+    with tracing.span("github.search_issues", repo=repo, query=query) as current:
+        if (cached := await github_cache.get(key)) is not None:
+            current.set_attributes({"cache_hit": True, "issue_count": len(cached)})
+            return [IndexedIssue.from_record(record) for record in cached]
+        current.set_attribute("cache_hit", False)
         try:
-            return await gh.rest.search.async_issues_and_pull_requests(
+            response = await gh.rest.search.async_issues_and_pull_requests(
                 q=f"repo:{repo} is:issue {query}", order="desc", sort="reactions"
             )
-        except Exception:
+        except _RATE_LIMITED:
+            raise
+        except Exception as e:
+            tracing.record_failure(current, e)
             return None
+        items = response.parsed_data.items
+        current.set_attributes(
+            {"issue_count": len(items), "response_size": len(response.content)}
+        )
+    await github_cache.set(key, [_indexed_issue(item).to_record() for item in items])
+    return items
 
-    async with asyncio.TaskGroup() as tg:
-        for query in queries:
-            task = tg.create_task(_search_single(query))
-            issue_tasks.append(task)
 
-    issues = []
-    unique_issues = {}
+def _get_reaction_count(comment) -> int:
+    if not (hasattr(comment, "reactions") and comment.reactions):
+        return 0
+    return getattr(comment.reactions, "total_count", 0) or 0
 
-    for task in issue_tasks:
-        response = task.result()
-        if response is None:
-            continue
-        issues.extend(response.parsed_data.items)
 
-    for issue in issues:
-        if issue.id not in unique_issues:
-            unique_issues[issue.id] = issue
+# Comments paired with their reaction count, so both backends rank them the same way
+RankedComment = tuple[int, CommentData]
 
-    unique_issues = list(unique_issues.values())
 
-    return unique_issues
+def _rest_comment(comment) -> RankedComment:
+    return _get_reaction_count(comment), {
+        "body": comment.body or "",
+        "username": comment.user.login if comment.user else "unknown",
+        "comment_url": comment.html_url,
+    }
 
 
-@handle_github_exceptions
-async def get_issues_with_comments(
-    *,
-    repo: str,
-    issues: list[IssueSearchResultItem],
-    max_comments_per_issue: int = 5,
-    max_total_comments: int = 100,
-) -> list[IssueWithComments]:
-    """
-    Get comments for each issue and return the ones with the most reactions.
-    """
+def _graphql_comment(node: dict[str, Any]) -> RankedComment:
+    return (node.get("reactions") or {}).get("totalCount", 0), {
+        "body": node.get("body") or "",
+        "username": (node.get("author") or {}).get("login", "unknown"),
+        "comment_url": node["url"],
+    }
 
-    if not issues:
-        return []
 
-    username, repo_name = repo.split("/")
-
-    issue_map = {issue.number: issue for issue in issues}
-    issue_numbers = [issue.number for issue in issues]
+async def _fetch_comments(repo: str, issue_num: int) -> list[RankedComment] | None:
+    return await _inflight_calls.do(
+        ("comments", repo.lower(), issue_num),
+        lambda: _request_comments(repo, issue_num),
+    )
 
-    # To calculate how many issues to process to stay within total limit so we don't exceed Gemini's 250K TPM Limit
-    max_issues = min(len(issue_numbers), max_total_comments // max_comments_per_issue)
 
-    # Wrap comment fetch so failures don't bubble up and break the TaskGroup
-    async def _fetch_comments(issue_num: int):
+async def _request_comments(repo: str, issue_num: int) -> list[RankedComment] | None:
+    key = ("comments", repo.lower(), issue_num)
+    with tracing.span(
+        "github.list_comments", repo=repo, issue_number=issue_num
+    ) as current:
+        if (cached := await github_cache.get(key)) is not None:
+            current.set_attributes({"cache_hit": True, "comment_count": len(cached)})
+            return [(reactions, comment) for reactions, comment in cached]
+        current.set_attribute("cache_hit", False)
+        username, repo_name = repo.split("/")
         try:
-            return await gh.rest.issues.async_list_comments(
+            response = await gh.rest.issues.async_list_comments(
                 owner=username,
                 repo=repo_name,
                 issue_number=issue_num,
                 page=1,
                 per_page=100,
             )
-        except Exception:
+        except _RATE_LIMITED:
+            raise
+        except Exception as e:
+            tracing.record_failure(current, e)
             return None
+        comments = [_rest_comment(comment) for comment in response.parsed_data]
+        current.set_attributes(
+            {"comment_count": len(comments), "response_size": len(response.content)}
+        )
+    await github_cache.set(key, comments)
+    return comments
 
-    comment_tasks = []
 
-    async with asyncio.TaskGroup() as tg:
-        for issue_num in issue_numbers[:max_issues]:
-            task = tg.create_task(_fetch_comments(issue_num))
-            comment_tasks.append((issue_num, task))
-
-    def get_reaction_count(comment) -> int:
-        if not (hasattr(comment, "reactions") and comment.reactions):
-            return 0
-        return getattr(comment.reactions, "total_count", 0) or 0
-
-    issues_with_comments: list[IssueWithComments] = []
-
-    for issue_num, task in comment_tasks:
-        issue = issue_map[issue_num]
-        response = task.result()
-        if response is None:
-            # Skip issues whose comments couldn't be fetched
-            continue
-        issue_comments = response.parsed_data
-
-        # Sort by reaction count and take top comments for this issue
-        sorted_comments = sorted(issue_comments, key=get_reaction_count, reverse=True)
-        top_comments = sorted_comments[:max_comments_per_issue]
-
-        batched_comments: list[CommentData] = [
-            {
-                "body": c.body or "",
-                "username": c.user.login if c.user else "unknown",
-                "comment_url": c.html_url,
-            }
-            for c in top_comments
-        ]
+async def _fetch_comments_graphql(
+    repo: str, issue_numbers: list[int]
+) -> dict[int, list[RankedComment]] | None:
+    """Fetch the comments of many issues in a single aliased GraphQL query."""
+    username, repo_name = repo.split("/")
+    issue_fields = "\n".join(
+        f"i{number}: issue(number: {number}) {{ "
+        "comments(first: 100) { nodes { body url author { login } "
+        "reactions { totalCount } } } }"
+        for number in issue_numbers
+    )
+    query = (
+        "query($owner: String!, $name: String!) { "
+        f"repository(owner: $owner, name: $name) {{ {issue_fields} }} }}"
+    )
+    with tracing.span(
+        "github.graphql_comments", repo=repo, issue_count=len(issue_numbers)
+    ) as current:
+        try:
+            data = await gh.async_graphql(
+                query, variables={"owner": username, "name": repo_name}
+            )
+        except Exception as e:
+            # The caller falls back to fetching comments over REST
+            logger.warning("GraphQL comments query failed", exc_info=True)
+            tracing.record_failure(current, e)
+            return None
+
+    repository = data.get("repository") or {}
+    comments: dict[int, list[RankedComment]] = {}
+    for number in issue_numbers:
+        issue = repository.get(f"i{number}")
+        if issue:
+            nodes = (issue.get("comments") or {}).get("nodes") or []
+            comments[number] = [_graphql_comment(node) for node in nodes if node]
+    return comments
+
+
+async def _fetch_comments_batch(
+    repo: str, issue_numbers: list[int]
+) -> dict[int, list[RankedComment]]:
+    """
+    Fetch comments for a batch of issues with the configured backend.
 
-        issues_with_comments.append(
-            {
-                "issue_number": issue.number,
-                "title": issue.title,
-                "issue_url": issue.html_url,
-                "body": issue.body or "No description provided.",
-                "comments": batched_comments,
+    GraphQL fetches the whole batch in one round-trip; REST makes one call per
+    issue and is also the fallback for anything GraphQL could not return.
+    Issues in a fresh local index are served from it instead. Issues whose
+    comments could not be fetched are left out.
+    """
+    comments: dict[int, list[RankedComment]] = {}
+    if await issue_index.is_fresh(repo):
+        comments = await issue_index.comments(repo, issue_numbers)
+    elif settings.GITHUB_COMMENTS_BACKEND == "graphql" and issue_numbers:
+        comments = await _fetch_comments_graphql(repo, issue_numbers) or {}
+
+    missing = [number for number in issue_numbers if number not in comments]
+    if missing:
+        async with asyncio.TaskGroup() as tg:
+            tasks = {
+                number: tg.create_task(_fetch_comments(repo, number))
+                for number in missing
             }
-        )
+        for number, task in tasks.items():
+            if (result := task.result()) is not None:
+                comments[number] = result
+
+    return comments
+
+
+def _with_top_comments(
+    issue: IssueSearchResultItem,
+    comments: list[RankedComment],
+    max_comments_per_issue: int,
+) -> IssueWithComments:
+    # Sort by reaction count and take top comments for this issue
+    sorted_comments = sorted(comments, key=lambda c: c[0], reverse=True)
+    top_comments = sorted_comments[:max_comments_per_issue]
+
+    return {
+        "issue_number": issue.number,
+        "title": issue.title,
+        "issue_url": issue.html_url,
+        "body": issue.body or "No description provided.",
+        "comments": [comment for _, comment in top_comments],
+    }
+
+
+@handle_github_exceptions
+async def stream_issues_with_comments(
+    *,
+    repo: str,
+    queries: list[str],
+    user_query: str = "",
+    max_comments_per_issue: int = 5,
+    max_total_comments: int = 100,
+    max_issues: int = settings.RERANK_TOP_ISSUES,
+    max_concurrency: int = settings.GITHUB_COMMENT_CONCURRENCY,
+    timer: StageTimer | None = None,
+) -> AsyncGenerator[dict, None]:
+    """
+    Search issues and fetch their comments as one streaming stage.
+
+    New issues from each search query are reranked locally against the user
+    query and the generated queries, and the best of them go straight to a
+    bounded pool of comment workers, so one slow query no longer holds up every
+    comment fetch. Each query gets an equal share of the `max_issues` slots;
+    slots a query leaves unused go to the best remaining issues once all
+    searches are done. With the GraphQL backend each query's admitted issues are
+    fetched as one batch. Yields progress payloads as work completes, then the
+    result:
+    - `{"type": "issues", "data": <unique issues found so far>}`
+    - `{"type": "comments", "data": <comments collected so far>}`
+    - `{"type": "result", "data": <list[IssueWithComments], best match first>,
+      "complete": <False if a search or comment fetch failed>}`
+
+    Running out of GitHub rate limit is not a failed fetch: it ends the stage
+    with a 429 rather than a result that is silently missing issues.
+
+    With a `timer`, records the `issue_search` stage (until every search is
+    done) and the `comment_fetch` stage (from the first comment fetch to the
+    last), which overlap.
+    """
+
+    # Only as many issues as the comment budget allows, to stay within Gemini's 250K
+    # TPM limit
+    max_issues = min(max_issues, max_total_comments // max_comments_per_issue)
+    per_query = math.ceil(max_issues / max(1, len(queries)))
+    rank_queries = [user_query, *queries]
+
+    # GraphQL fetches each query's new issues in one round-trip, REST one issue at a time
+    batch_per_query = settings.GITHUB_COMMENTS_BACKEND == "graphql"
+
+    events: asyncio.Queue[dict | None] = asyncio.Queue()
+    work: asyncio.Queue[list[IssueSearchResultItem] | None] = asyncio.Queue()
+    seen_ids: set[int] = set()
+    admitted: list[IssueSearchResultItem] = []
+    # Issues past their query's share, considered for any slots left at the end
+    reserve: list[IssueSearchResultItem] = []
+    results: dict[int, IssueWithComments] = {}
+    total_comments = 0
+    # Searches and comment fetches that failed, their issues are missing from the result
+    failures = 0
+    first_comment_fetch: float | None = None
+
+    def admit(issues: list[IssueSearchResultItem]) -> None:
+        batch = issues[: max_issues - len(admitted)]
+        admitted.extend(batch)
+        if batch_per_query and batch:
+            work.put_nowait(batch)
+        else:
+            for issue in batch:
+                work.put_nowait([issue])
+
+    async def search_worker(index: int, query: str) -> None:
+        nonlocal failures
+        with tracing.span(
+            "github.issue_query", repo=repo, query=query, query_index=index
+        ) as current:
+            items = await _search_single(repo, query)
+            if items is None:
+                failures += 1
+            new_issues = []
+            for issue in items or []:
+                if issue.id in seen_ids:
+                    continue
+                seen_ids.add(issue.id)
+                new_issues.append(issue)
+            current.set_attributes(
+                {"issue_count": len(items or []), "new_issue_count": len(new_issues)}
+            )
+        events.put_nowait({"type": "issues", "data": len(seen_ids)})
+
+        ranked = rank_issues(new_issues, rank_queries)
+        admit(ranked[:per_query])
+        reserve.extend(ranked[per_query:])
+
+    async def comment_worker() -> None:
+        nonlocal total_comments, first_comment_fetch, failures
+        while (batch := await work.get()) is not None:
+            if first_comment_fetch is None:
+                first_comment_fetch = time.perf_counter()
+            comments = await _fetch_comments_batch(
+                repo, [issue.number for issue in batch]
+            )
+            for issue in batch:
+                if issue.number not in comments:
+                    # Skip issues whose comments couldn't be fetched
+                    failures += 1
+                    continue
+                results[issue.number] = _with_top_comments(
+                    issue, comments[issue.number], max_comments_per_issue
+                )
+                total_comments += len(results[issue.number]["comments"])
+            events.put_nowait({"type": "comments", "data": total_comments})
+
+    async def run() -> None:
+        started = time.perf_counter()
+        try:
+            async with asyncio.TaskGroup() as tg:
+                workers = [
+                    tg.create_task(comment_worker())
+                    for _ in range(max(1, min(max_concurrency, max_issues)))
+                ]
+                async with asyncio.TaskGroup() as search_tg:
+                    for index, query in enumerate(queries):
+                        search_tg.create_task(search_worker(index, query))
+                if timer is not None:
+                    timer.record("issue_search", time.perf_counter() - started)
+                if len(admitted) < max_issues and reserve:
+                    admit(rank_issues(reserve, rank_queries))
+                for _ in workers:
+                    work.put_nowait(None)
 
-    return issues_with_comments
+            if timer is not None and first_comment_fetch is not None:
+                timer.record("comment_fetch", time.perf_counter() - first_comment_fetch)
+
+            # Always report both stages, even when nothing was found
+            if not queries:
+                events.put_nowait({"type": "issues", "data": 0})
+            if not results:
+                events.put_nowait({"type": "comments", "data": 0})
+        finally:
+            events.put_nowait(None)
+
+    runner = asyncio.create_task(run())
+    try:
+        while (event := await events.get()) is not None:
+            yield event
+        await runner
+    finally:
+        runner.cancel()
+
+    fetched = [issue for issue in admitted if issue.number in results]
+    yield {
+        "type": "result",
+        "data": [results[issue.number] for issue in rank_issues(fetched, rank_queries)],
+        "complete": not failures,
+    }
 
 
 async def get_repository(*, technology: str) -> str | None:
-    """ """
-    repo = await gh.rest.search.async_repos(
-        q=f"{technology}", sort="stars", order="desc"
-    )
+    """
+    Resolve a technology name to the `owner/name` of its main repository.
+
+    The local index answers most lookups; the search API is only used on a miss
+    or to refresh a stale entry, and its answer is written back to the index.
+    """
+    full_name = repository_index.lookup(technology)
+    if full_name:
+        return full_name
+
+    with tracing.span("github.search_repositories", technology=technology):
+        repo = await gh.rest.search.async_repos(
+            q=f"{technology}", sort="stars", order="desc"
+        )
     items = getattr(repo.parsed_data, "items", None) or []
     if not items:
-        return None
-    return items[0].full_name
+        return repository_index.lookup(technology, allow_stale=True)
+
+    full_name = items[0].full_name
+    repository_index.remember(technology, full_name)
+    return full_name
+
+
+def _indexed_issue(issue) -> IndexedIssue:
+    return IndexedIssue(
+        id=issue.id,
+        number=issue.number,
+        title=issue.title,
+        body=issue.body,
+        html_url=issue.html_url,
+        state=issue.state,
+        reaction_count=_get_reaction_count(issue),
+        updated_at=issue.updated_at,
+    )
+
+
+async def sync_issue_index(
+    *, repo: str, max_comments: int = settings.ISSUE_INDEX_MAX_COMMENTS
+) -> int:
+    """
+    Bring the local index of `repo` up to date, returning how many issues changed.
+
+    Only issues updated since the previous sync are fetched, oldest first, and
+    the resume point is saved after every page, so an interrupted sync picks up
+    where it stopped. Each issue is stored with its `max_comments` most reacted
+    comments. The repository only becomes fresh once the sync completes.
+    """
+    username, repo_name = repo.split("/")
+    since = await issue_index.sync_cursor(repo)
+    synced = 0
+
+    pages = gh.rest.paginate(
+        gh.rest.issues.async_list_for_repo,
+        owner=username,
+        repo=repo_name,
+        state="all",
+        sort="updated",
+        direction="asc",
+        per_page=100,
+        **({"since": since} if since else {}),
+    )
+    page: list = []
+    async for issue in pages:
+        # The issues endpoint also lists pull requests
+        if not issue.pull_request:
+            page.append(issue)
+        if len(page) == 100:
+            synced += await _store_issues(repo, page, max_comments)
+            page = []
+    if page:
+        synced += await _store_issues(repo, page, max_comments)
+
+    await issue_index.mark_synced(repo)
+    return synced
+
+
+async def _store_issues(repo: str, issues: list, max_comments: int) -> int:
+    async with asyncio.TaskGroup() as tg:
+        tasks = [
+            tg.create_task(_request_comments(repo, issue.number))
+            if issue.comments
+            else None
+            for issue in issues
+        ]
+
+    for issue, task in zip(issues, tasks):
+        comments = task.result() if task else []
+        if comments is None:
+            # Stop before the resume point moves past an incompletely stored issue
+            raise RuntimeError(f"Failed to fetch comments for {repo}#{issue.number}")
+        top_comments = sorted(comments, key=lambda c: c[0], reverse=True)
+        await issue_index.store(
+            repo, _indexed_issue(issue), top_comments[:max_comments]
+        )
+
+    await issue_index.save_cursor(repo, issues[-1].updated_at)
+    return len(issues)
@@ -0,0 +1,334 @@
+import asyncio
+import sqlite3
+import time
+from collections import namedtuple
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, TypeVar
+
+from ..core.config import settings
+from ..core.text import STOP_WORDS, tokenize
+from ..models import CommentData
+
+T = TypeVar("T")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS repositories (
+    repo TEXT PRIMARY KEY,
+    synced_at REAL NOT NULL,
+    cursor TEXT
+);
+CREATE TABLE IF NOT EXISTS issues (
+    id INTEGER PRIMARY KEY,
+    repo TEXT NOT NULL,
+    number INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    body TEXT,
+    url TEXT NOT NULL,
+    state TEXT NOT NULL,
+    reactions INTEGER NOT NULL,
+    updated_at TEXT NOT NULL,
+    UNIQUE (repo, number)
+);
+CREATE TABLE IF NOT EXISTS comments (
+    issue_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    reactions INTEGER NOT NULL,
+    body TEXT NOT NULL,
+    username TEXT NOT NULL,
+    url TEXT NOT NULL,
+    PRIMARY KEY (issue_id, position)
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS issues_fts USING fts5(repo UNINDEXED, title, body);
+"""
+
+# Same shape as the `reactions` of GitHub's issue models, for the ranker
+_Reactions = namedtuple("_Reactions", "total_count")
+
+
+@dataclass(frozen=True)
+class IndexedIssue:
+    """An issue served from the local index, shaped like a search result item."""
+
+    id: int
+    number: int
+    title: str
+    body: str | None
+    html_url: str
+    state: str
+    reaction_count: int
+    updated_at: datetime
+
+    @property
+    def reactions(self) -> _Reactions:
+        return _Reactions(self.reaction_count)
+
+    def to_record(self) -> dict:
+        return {**asdict(self), "updated_at": self.updated_at.isoformat()}
+
+    @classmethod
+    def from_record(cls, record: dict) -> "IndexedIssue":
+        return cls(
+            **{**record, "updated_at": datetime.fromisoformat(record["updated_at"])}
+        )
+
+
+def _match_expression(query: str) -> str | None:
+    tokens = tokenize(query)
+    terms = [token for token in tokens if token not in STOP_WORDS] or tokens
+    # Quoted so FTS5 treats "next.js" or "c++" as phrases rather than syntax
+    return " OR ".join(f'"{term}"' for term in dict.fromkeys(terms)) or None
+
+
+class IssueIndex:
+    """
+    Local SQLite FTS5 store of a repository's issues and their top comments.
+
+    Repositories are added and kept up to date by `sync_issue_index`; lookups
+    for a repository are only served from here while its last sync is younger
+    than `max_age` seconds. Without a `path` the index is disabled.
+
+    The blocking sqlite3 calls run one at a time on the index's own thread
+    instead of the event loop.
+    """
+
+    def __init__(
+        self,
+        *,
+        path: str | None,
+        max_age: float,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.path = path
+        self.max_age = max_age
+        self._clock = clock
+        self._conn: sqlite3.Connection | None = None
+        self._executor: ThreadPoolExecutor | None = None
+
+    async def _run(self, fn: Callable[..., T], *args: Any) -> T:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="issue-index"
+            )
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, fn, *args)
+
+    def _connect(self) -> sqlite3.Connection | None:
+        if not self.path:
+            return None
+        if self._conn is None:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            # Ingests write while searches read, WAL keeps them from blocking each other
+            conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.row_factory = sqlite3.Row
+            conn.executescript(SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def _close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    async def close(self) -> None:
+        if self._executor is not None:
+            await self._run(self._close)
+            self._executor.shutdown()
+            self._executor = None
+
+    def _is_fresh(self, repo: str) -> bool:
+        conn = self._connect()
+        if conn is None:
+            return False
+        row = conn.execute(
+            "SELECT synced_at FROM repositories WHERE repo = ?", (repo.lower(),)
+        ).fetchone()
+        return row is not None and self._clock() - row["synced_at"] < self.max_age
+
+    def _sync_cursor(self, repo: str) -> datetime | None:
+        conn = self._connect()
+        if conn is None:
+            return None
+        row = conn.execute(
+            "SELECT cursor FROM repositories WHERE repo = ?", (repo.lower(),)
+        ).fetchone()
+        return datetime.fromisoformat(row["cursor"]) if row and row["cursor"] else None
+
+    def _search(self, repo: str, query: str, limit: int = 30) -> list[IndexedIssue]:
+        conn = self._connect()
+        expression = _match_expression(query)
+        if conn is None or expression is None:
+            return []
+        rows = conn.execute(
+            """
+            SELECT issues.* FROM issues_fts
+            JOIN issues ON issues.id = issues_fts.rowid
+            WHERE issues_fts MATCH ? AND issues_fts.repo = ?
+            ORDER BY bm25(issues_fts, 0, 3.0, 1.0)
+            LIMIT ?
+            """,
+            (expression, repo.lower(), limit),
+        ).fetchall()
+        return [
+            IndexedIssue(
+                id=row["id"],
+                number=row["number"],
+                title=row["title"],
+                body=row["body"],
+                html_url=row["url"],
+                state=row["state"],
+                reaction_count=row["reactions"],
+                updated_at=datetime.fromisoformat(row["updated_at"]),
+            )
+            for row in rows
+        ]
+
+    def _comments(
+        self, repo: str, issue_numbers: list[int]
+    ) -> dict[int, list[tuple[int, CommentData]]]:
+        conn = self._connect()
+        if conn is None or not issue_numbers:
+            return {}
+        placeholders = ", ".join("?" for _ in issue_numbers)
+        rows = conn.execute(
+            f"""
+            SELECT issues.number, comments.* FROM issues
+            LEFT JOIN comments ON comments.issue_id = issues.id
+            WHERE issues.repo = ? AND issues.number IN ({placeholders})
+            ORDER BY issues.number, comments.position
+            """,
+            (repo.lower(), *issue_numbers),
+        ).fetchall()
+
+        comments: dict[int, list[tuple[int, CommentData]]] = {}
+        for row in rows:
+            issue_comments = comments.setdefault(row["number"], [])
+            if row["url"] is not None:
+                issue_comments.append(
+                    (
+                        row["reactions"],
+                        {
+                            "body": row["body"],
+                            "username": row["username"],
+                            "comment_url": row["url"],
+                        },
+                    )
+                )
+        return comments
+
+    def _store(
+        self,
+        repo: str,
+        issue: IndexedIssue,
+        comments: list[tuple[int, CommentData]],
+    ) -> None:
+        conn = self._connect()
+        if conn is None:
+            return
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO issues VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    issue.id,
+                    repo.lower(),
+                    issue.number,
+                    issue.title,
+                    issue.body,
+                    issue.html_url,
+                    issue.state,
+                    issue.reaction_count,
+                    issue.updated_at.isoformat(),
+                ),
+            )
+            conn.execute("DELETE FROM issues_fts WHERE rowid = ?", (issue.id,))
+            conn.execute(
+                "INSERT INTO issues_fts (rowid, repo, title, body) VALUES (?, ?, ?, ?)",
+                (issue.id, repo.lower(), issue.title, issue.body or ""),
+            )
+            conn.execute("DELETE FROM comments WHERE issue_id = ?", (issue.id,))
+            conn.executemany(
+                "INSERT INTO comments VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        issue.id,
+                        position,
+                        reactions,
+                        comment["body"],
+                        comment["username"],
+                        comment["comment_url"],
+                    )
+                    for position, (reactions, comment) in enumerate(comments)
+                ],
+            )
+
+    def _save_cursor(self, repo: str, cursor: datetime) -> None:
+        conn = self._connect()
+        if conn is None:
+            return
+        with conn:
+            conn.execute(
+                """
+                INSERT INTO repositories VALUES (?, 0, ?)
+                ON CONFLICT (repo) DO UPDATE SET cursor = excluded.cursor
+                """,
+                (repo.lower(), cursor.isoformat()),
+            )
+
+    def _mark_synced(self, repo: str) -> None:
+        conn = self._connect()
+        if conn is None:
+            return
+        with conn:
+            conn.execute(
+                """
+                INSERT INTO repositories VALUES (?, ?, NULL)
+                ON CONFLICT (repo) DO UPDATE SET synced_at = excluded.synced_at
+                """,
+                (repo.lower(), self._clock()),
+            )
+
+    async def is_fresh(self, repo: str) -> bool:
+        """Whether lookups for `repo` can be served from the index."""
+        return await self._run(self._is_fresh, repo)
+
+    async def sync_cursor(self, repo: str) -> datetime | None:
+        """The `updated_at` of the latest synced issue, to resume the next sync from."""
+        return await self._run(self._sync_cursor, repo)
+
+    async def search(
+        self, repo: str, query: str, limit: int = 30
+    ) -> list[IndexedIssue]:
+        """Full-text search over titles and bodies, best match first."""
+        return await self._run(self._search, repo, query, limit)
+
+    async def comments(
+        self, repo: str, issue_numbers: list[int]
+    ) -> dict[int, list[tuple[int, CommentData]]]:
+        """Stored comments with their reaction counts, for each indexed issue."""
+        return await self._run(self._comments, repo, issue_numbers)
+
+    async def store(
+        self,
+        repo: str,
+        issue: IndexedIssue,
+        comments: list[tuple[int, CommentData]],
+    ) -> None:
+        """Insert or replace an issue and its comments."""
+        await self._run(self._store, repo, issue, comments)
+
+    async def save_cursor(self, repo: str, cursor: datetime) -> None:
+        """Record how far a sync got, without making the repository fresh."""
+        await self._run(self._save_cursor, repo, cursor)
+
+    async def mark_synced(self, repo: str) -> None:
+        """Record a completed sync, making the repository fresh again."""
+        await self._run(self._mark_synced, repo)
+
+
+issue_index = IssueIndex(
+    path=settings.ISSUE_INDEX_PATH, max_age=settings.ISSUE_INDEX_MAX_AGE_SECONDS
+)
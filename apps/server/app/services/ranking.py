@@ -0,0 +1,126 @@
+import math
+from collections import Counter
+from datetime import UTC, datetime
+
+from githubkit.versions.latest.models import IssueSearchResultItem
+
+from ..core.text import STOP_WORDS, tokenize
+
+# Standard BM25 term saturation and length normalization
+K1 = 1.2
+B = 0.75
+
+# Titles state the problem in a few words, weigh their terms above the body's
+TITLE_BOOST = 3
+
+# Blend of the signals in the final score, each normalized to [0, 1]
+RELEVANCE_WEIGHT = 0.6
+REACTIONS_WEIGHT = 0.2
+RECENCY_WEIGHT = 0.1
+STATE_WEIGHT = 0.1
+
+# An issue last updated this many days ago gets half the recency score
+RECENCY_HALF_LIFE_DAYS = 365
+
+
+def _terms(text: str) -> list[str]:
+    return [token for token in tokenize(text) if token not in STOP_WORDS]
+
+
+def _text(value) -> str:
+    return value if isinstance(value, str) else ""
+
+
+def bm25_scores(queries: list[str], documents: list[str]) -> list[float]:
+    """Score each document against the combined terms of all queries."""
+    docs = [_terms(document) for document in documents]
+    # Terms shared by several queries matter more, with diminishing returns
+    query = {
+        term: 1 + math.log(count)
+        for term, count in Counter(
+            term for text in queries for term in set(_terms(text))
+        ).items()
+    }
+    if not docs or not query:
+        return [0.0] * len(docs)
+
+    # Term frequencies of the query terms only, one row per document: other terms
+    # never contribute to a score, so they are not counted
+    column = {term: j for j, term in enumerate(query)}
+    tf = [[0] * len(column) for _ in docs]
+    for row, doc in zip(tf, docs):
+        for token in doc:
+            if (j := column.get(token)) is not None:
+                row[j] += 1
+
+    # Everything that depends on the term alone, computed once per column
+    df = [sum(1 for row in tf if row[j]) for j in range(len(column))]
+    weights = [
+        query[term] * math.log(1 + (len(docs) - df[j] + 0.5) / (df[j] + 0.5)) * (K1 + 1)
+        for term, j in column.items()
+    ]
+    avg_len = sum(map(len, docs)) / len(docs) or 1
+    norms = [K1 * (1 - B + B * len(doc) / avg_len) for doc in docs]
+
+    return [
+        sum(weight * f / (f + norm) for weight, f in zip(weights, row) if f)
+        for row, norm in zip(tf, norms)
+    ]
+
+
+def _reactions(issue: IssueSearchResultItem) -> int:
+    count = getattr(getattr(issue, "reactions", None), "total_count", 0)
+    return count if isinstance(count, int) else 0
+
+
+def _recency(issue: IssueSearchResultItem, now: datetime) -> float:
+    updated_at = getattr(issue, "updated_at", None)
+    if not isinstance(updated_at, datetime):
+        return 0.5
+    if updated_at.tzinfo is None:
+        updated_at = updated_at.replace(tzinfo=UTC)
+    age_days = max(0.0, (now - updated_at).total_seconds() / 86400)
+    return 0.5 ** (age_days / RECENCY_HALF_LIFE_DAYS)
+
+
+def _state(issue: IssueSearchResultItem) -> float:
+    # Closed issues usually carry the fix or the maintainers' verdict
+    state = getattr(issue, "state", None)
+    return {"closed": 1.0, "open": 0.5}.get(state, 0.5)
+
+
+def rank_issues(
+    issues: list[IssueSearchResultItem],
+    queries: list[str],
+    *,
+    now: datetime | None = None,
+) -> list[IssueSearchResultItem]:
+    """
+    Order issues by how well they match the queries, best first.
+
+    BM25 relevance over titles and bodies is blended with reactions, recency of
+    the last update and open/closed state. Ties keep GitHub's order.
+    """
+    if len(issues) < 2:
+        return list(issues)
+    now = now or datetime.now(UTC)
+
+    relevance = bm25_scores(
+        queries,
+        [
+            " ".join([_text(issue.title)] * TITLE_BOOST + [_text(issue.body)])
+            for issue in issues
+        ],
+    )
+    max_relevance = max(relevance) or 1
+    max_reactions = math.log1p(max(_reactions(issue) for issue in issues)) or 1
+
+    scores = [
+        RELEVANCE_WEIGHT * relevance[i] / max_relevance
+        + REACTIONS_WEIGHT * math.log1p(_reactions(issue)) / max_reactions
+        + RECENCY_WEIGHT * _recency(issue, now)
+        + STATE_WEIGHT * _state(issue)
+        for i, issue in enumerate(issues)
+    ]
+    order = sorted(range(len(issues)), key=lambda i: scores[i], reverse=True)
+    return [issues[i] for i in order]
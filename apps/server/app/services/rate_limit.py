@@ -0,0 +1,259 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from collections.abc import AsyncGenerator, Callable, Generator
+from contextlib import asynccontextmanager, contextmanager
+
+import httpx
+from githubkit.throttling import BaseThrottler
+
+from ..core.config import settings
+from ..exceptions.github_exceptions import RateLimitBudgetExhausted
+
+
+class TokenBucket:
+    """
+    Token bucket for one GitHub rate-limit resource.
+
+    Tokens may go negative: each reservation queues behind the previous ones, so
+    callers are paced in arrival order. The level is set from the
+    `X-RateLimit-*` headers GitHub returns with every response, less the calls
+    still on their way to GitHub, and calls GitHub does not count are refunded.
+    """
+
+    def __init__(
+        self,
+        *,
+        capacity: float,
+        period: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.capacity = capacity
+        self.period = period
+        self.tokens = capacity
+        # Reserved calls that have not finished yet
+        self.pending = 0
+        self._clock = clock
+        self._updated = clock()
+        self._blocked_until = 0.0
+
+    @property
+    def rate(self) -> float:
+        return self.capacity / self.period
+
+    def _refill(self) -> float:
+        now = self._clock()
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+        return now
+
+    def delay(self) -> float:
+        """Seconds a new caller would wait for a token."""
+        now = self._refill()
+        wait = max(0.0, self._blocked_until - now)
+        if self.tokens < 1:
+            wait = max(wait, (1 - self.tokens) / self.rate)
+        return wait
+
+    def reserve(self) -> float:
+        """Take a token, returning how long to wait before using it."""
+        wait = self.delay()
+        self.tokens -= 1
+        self.pending += 1
+        return wait
+
+    def settle(self) -> None:
+        """A reserved call finished, whether or not it reached GitHub."""
+        self.pending -= 1
+
+    def refund(self) -> None:
+        """Give back the token of a call GitHub did not count."""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + 1)
+
+    def sync(self, *, limit: int, remaining: int, reset_in: float) -> None:
+        """Set the bucket to the budget GitHub reports for the call being answered."""
+        self._refill()
+        self.capacity = limit
+        # That call is already counted in `remaining`, the other pending ones are not
+        self.tokens = min(limit, remaining - max(0, self.pending - 1))
+        if remaining == 0:
+            self._blocked_until = self._clock() + reset_in
+
+
+def _resource(request: httpx.Request) -> str:
+    path = request.url.path
+    if path.startswith("/search/"):
+        return "search"
+    if path.startswith("/graphql"):
+        return "graphql"
+    return "core"
+
+
+class RateLimitScheduler(BaseThrottler):
+    """
+    Process-wide scheduler for every call made by the GitHub client.
+
+    Calls wait for a token of their rate-limit resource (search or core) and for
+    one of the in-flight slots. The number of slots adapts AIMD-style: it grows
+    slowly while calls are fast, and halves on secondary rate limits or when
+    latency rises above the target.
+    """
+
+    def __init__(
+        self,
+        *,
+        initial_concurrency: int,
+        max_concurrency: int,
+        latency_target: float,
+        max_wait: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_concurrency = max_concurrency
+        self.concurrency_limit = float(initial_concurrency)
+        self.latency_target = latency_target
+        self.max_wait = max_wait
+        self._clock = clock
+        self.buckets = {
+            # https://docs.github.com/en/rest/search/search#rate-limit
+            "search": TokenBucket(capacity=30, period=60, clock=clock),
+            # https://docs.github.com/en/rest/using-the-rest-api/rate-limits-for-the-rest-api
+            "core": TokenBucket(capacity=5000, period=3600, clock=clock),
+            "graphql": TokenBucket(capacity=5000, period=3600, clock=clock),
+        }
+        self.in_flight = 0
+        self.queue_depth = 0
+        self._waiters: deque[asyncio.Future] = deque()
+        self._paused_until = 0.0
+        self._last_decrease = float("-inf")
+        self._sync_semaphore = threading.Semaphore(max_concurrency)
+
+    def available_share(self, resource: str) -> float:
+        """Fraction of a resource's budget that is currently unused."""
+        bucket = self.buckets[resource]
+        if bucket.delay() > 0 or self._paused_until > self._clock():
+            return 0.0
+        return max(0.0, bucket.tokens) / bucket.capacity
+
+    def _increase(self) -> None:
+        self.concurrency_limit = min(
+            self.max_concurrency, self.concurrency_limit + 1 / self.concurrency_limit
+        )
+        self._wake_waiters()
+
+    def _decrease(self) -> None:
+        # Calls already in flight saw the same congestion, back off once per event
+        now = self._clock()
+        if now - self._last_decrease < self.latency_target:
+            return
+        self._last_decrease = now
+        self.concurrency_limit = max(1.0, self.concurrency_limit / 2)
+
+    def _wake_waiters(self) -> None:
+        while self._waiters and self.in_flight < int(self.concurrency_limit):
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    async def _acquire_slot(self) -> None:
+        if not self._waiters and self.in_flight < int(self.concurrency_limit):
+            self.in_flight += 1
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we were cancelled
+                self._release_slot()
+            raise
+
+    def _release_slot(self) -> None:
+        self.in_flight -= 1
+        self._wake_waiters()
+
+    async def observe(self, response: httpx.Response) -> None:
+        """Response hook: track the reported budgets and back off on rate limits."""
+        if response.extensions.get("hishel_from_cache"):
+            # Served by the HTTP cache, or revalidated with a 304 that GitHub does not
+            # count, and carrying the rate-limit headers of an earlier response
+            self.buckets[_resource(response.request)].refund()
+            return
+
+        headers = response.headers
+        resource = headers.get("x-ratelimit-resource")
+        if resource in self.buckets and "x-ratelimit-remaining" in headers:
+            try:
+                remaining = int(headers["x-ratelimit-remaining"])
+                limit = int(headers.get("x-ratelimit-limit", remaining))
+                reset_at = int(headers.get("x-ratelimit-reset", 0))
+            except ValueError:
+                return
+            self.buckets[resource].sync(
+                limit=limit,
+                remaining=remaining,
+                reset_in=max(0, reset_at - time.time()),
+            )
+
+        # Secondary rate limits come with a Retry-After, pause everything until then
+        if response.status_code in (403, 429) and "retry-after" in headers:
+            try:
+                retry_after = float(headers["retry-after"])
+            except ValueError:
+                retry_after = 60
+            self._paused_until = max(self._paused_until, self._clock() + retry_after)
+            self._decrease()
+
+    @contextmanager
+    def acquire(self, request: httpx.Request) -> Generator[None, None, None]:
+        # The app only uses the async client; sync calls just share the concurrency cap
+        with self._sync_semaphore:
+            yield
+
+    @asynccontextmanager
+    async def async_acquire(self, request: httpx.Request) -> AsyncGenerator[None, None]:
+        bucket = self.buckets[_resource(request)]
+
+        self.queue_depth += 1
+        try:
+            wait = max(bucket.delay(), self._paused_until - self._clock())
+            if wait > self.max_wait:
+                # Fail now instead of holding the request longer than it is worth
+                raise RateLimitBudgetExhausted(retry_after=wait)
+            wait = max(bucket.reserve(), self._paused_until - self._clock())
+            try:
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                await self._acquire_slot()
+            except BaseException:
+                # Cancelled before it was sent
+                bucket.settle()
+                bucket.refund()
+                raise
+        finally:
+            self.queue_depth -= 1
+
+        start = self._clock()
+        try:
+            yield
+            if self._clock() - start > self.latency_target:
+                self._decrease()
+            else:
+                self._increase()
+        finally:
+            self._release_slot()
+            bucket.settle()
+
+
+github_scheduler = RateLimitScheduler(
+    initial_concurrency=settings.GITHUB_INITIAL_CONCURRENCY,
+    max_concurrency=settings.GITHUB_MAX_CONCURRENCY,
+    latency_target=settings.GITHUB_LATENCY_TARGET_SECONDS,
+    max_wait=settings.GITHUB_MAX_QUEUE_WAIT_SECONDS,
+)
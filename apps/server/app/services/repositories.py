@@ -0,0 +1,143 @@
+import difflib
+import json
+import logging
+import os
+import re
+import tempfile
+import time
+from collections.abc import Callable
+from contextlib import suppress
+from pathlib import Path
+
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+SEED_PATH = Path(__file__).parent.parent / "data" / "repositories.json"
+
+_NON_ALNUM_RE = re.compile(r"[^a-z0-9+#]")
+
+
+def normalize_technology(technology: str) -> str:
+    """Collapse case and punctuation, so "Next.js", "next js" and "nextjs" match."""
+    return _NON_ALNUM_RE.sub("", technology.lower())
+
+
+class RepositoryIndex:
+    """
+    Technology name to repository `full_name` map.
+
+    Curated entries come from a shipped seed file and never expire. Entries
+    learned from the search API are persisted to `path` and go stale after `ttl`
+    seconds, so they are refreshed from the API on their next use.
+    """
+
+    def __init__(
+        self,
+        *,
+        seed_path: Path = SEED_PATH,
+        path: str | None = None,
+        ttl: float,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.seed_path = seed_path
+        self.path = Path(path) if path else None
+        self.ttl = ttl
+        self._clock = clock
+        self._seeded: dict[str, str] = {}
+        # normalized technology -> (full_name, learned_at)
+        self._learned: dict[str, tuple[str, float]] = {}
+        self._loaded = False
+
+    def _load(self) -> None:
+        if self._loaded:
+            return
+        self._loaded = True
+
+        seed: dict[str, list[str]] = json.loads(self.seed_path.read_text())
+        for full_name, aliases in seed.items():
+            for alias in [full_name.split("/")[1], *aliases]:
+                self._seeded.setdefault(normalize_technology(alias), full_name)
+
+        if self.path and self.path.exists():
+            try:
+                learned = json.loads(self.path.read_text())
+            except (OSError, ValueError):
+                # A corrupt index only costs a few extra search calls
+                learned = {}
+            for key, entry in learned.items():
+                self._learned[key] = (entry["full_name"], entry["learned_at"])
+
+    def _save(self) -> None:
+        if not self.path:
+            return
+        data = {
+            key: {"full_name": full_name, "learned_at": learned_at}
+            for key, (full_name, learned_at) in self._learned.items()
+        }
+        tmp_name = None
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # Each writer gets its own temp file, so workers saving at the same
+            # time never replace the index with each other's half-written file
+            with tempfile.NamedTemporaryFile(
+                "w",
+                dir=self.path.parent,
+                prefix=f".{self.path.name}.",
+                suffix=".tmp",
+                delete=False,
+            ) as tmp:
+                tmp_name = tmp.name
+                json.dump(data, tmp)
+            os.replace(tmp_name, self.path)
+        except OSError:
+            # Only costs a few extra search calls after a restart
+            logger.warning(
+                "Failed to save the repository index to %s", self.path, exc_info=True
+            )
+            if tmp_name is not None:
+                with suppress(OSError):
+                    os.unlink(tmp_name)
+
+    def _candidates(self, key: str) -> list[str]:
+        # "next" <-> "nextjs" style suffix variants before falling back to fuzzy matching
+        variants = [key, key.removesuffix("js") if key.endswith("js") else key + "js"]
+        return [variant for variant in variants if variant]
+
+    def lookup(self, technology: str, *, allow_stale: bool = False) -> str | None:
+        """Resolve a technology to a repository, or None if it needs a search."""
+        self._load()
+        key = normalize_technology(technology)
+        if not key:
+            return None
+
+        for candidate in self._candidates(key):
+            if candidate in self._seeded:
+                return self._seeded[candidate]
+            if candidate in self._learned:
+                full_name, learned_at = self._learned[candidate]
+                if allow_stale or self._clock() - learned_at < self.ttl:
+                    return full_name
+                # Stale learned entries are refreshed rather than fuzzy matched
+                return None
+
+        # Short names like "go" or "ts" are too ambiguous to fuzzy match
+        if len(key) < 4:
+            return None
+
+        matches = difflib.get_close_matches(key, self._seeded, n=1, cutoff=0.85)
+        return self._seeded[matches[0]] if matches else None
+
+    def remember(self, technology: str, full_name: str) -> None:
+        """Record a search result so the next lookup skips the search API."""
+        self._load()
+        key = normalize_technology(technology)
+        if not key or self._seeded.get(key) == full_name:
+            return
+        self._learned[key] = (full_name, self._clock())
+        self._save()
+
+
+repository_index = RepositoryIndex(
+    path=settings.REPO_INDEX_PATH, ttl=settings.REPO_INDEX_TTL_SECONDS
+)
@@ -0,0 +1,118 @@
+import asyncio
+import logging
+from collections import Counter
+
+from ..core.config import settings
+from .github import stream_issues_with_comments, sync_issue_index
+from .issue_index import issue_index
+from .rate_limit import github_scheduler
+
+logger = logging.getLogger(__name__)
+
+QueryPlan = tuple[str, tuple[str, ...]]
+
+
+class PopularityTracker:
+    """
+    Decaying counts of the repositories and query plans users search.
+
+    Counts are halved after every warm cycle, so the top entries follow what is
+    popular now rather than what was popular since startup.
+    """
+
+    def __init__(self, *, max_entries: int):
+        self.max_entries = max_entries
+        self.repos: Counter[str] = Counter()
+        self.plans: Counter[QueryPlan] = Counter()
+
+    def record(self, repo: str, queries: list[str]) -> None:
+        repo = repo.lower()
+        self.repos[repo] += 1
+        self.plans[(repo, tuple(queries))] += 1
+        if len(self.plans) > self.max_entries:
+            self.plans = Counter(dict(self.plans.most_common(self.max_entries)))
+        if len(self.repos) > self.max_entries:
+            self.repos = Counter(dict(self.repos.most_common(self.max_entries)))
+
+    def top_repos(self, n: int) -> list[str]:
+        return [repo for repo, _ in self.repos.most_common(n)]
+
+    def top_plans(self, n: int) -> list[QueryPlan]:
+        return [plan for plan, _ in self.plans.most_common(n)]
+
+    def decay(self, factor: float = 0.5) -> None:
+        for counter in (self.repos, self.plans):
+            for key in list(counter):
+                counter[key] *= factor
+                if counter[key] < 0.1:
+                    del counter[key]
+
+
+popularity = PopularityTracker(max_entries=settings.WARMER_TRACKED_ENTRIES)
+
+
+def _is_idle(resource: str, share: float) -> bool:
+    # Only spend budget users are not using, and never while their calls are queued
+    return (
+        github_scheduler.queue_depth == 0
+        and github_scheduler.available_share(resource) > 1 - share
+    )
+
+
+async def warm_once(
+    *,
+    max_repos: int = settings.WARMER_MAX_REPOS,
+    max_plans: int = settings.WARMER_MAX_PLANS,
+    share: float = settings.WARMER_RATE_LIMIT_SHARE,
+) -> int:
+    """
+    Refresh the data behind the most popular repositories and query plans.
+
+    Indexed repositories get an incremental index sync; other popular query plans
+    are re-run so their issue and comment responses are revalidated in the HTTP
+    cache. Stops as soon as the idle share of the rate limit is used up. Returns
+    how many repositories and plans were refreshed.
+    """
+    warmed = 0
+
+    for repo in popularity.top_repos(max_repos):
+        # Initial ingests are too expensive to start here, only keep indexed repos fresh
+        if await issue_index.sync_cursor(repo) is None:
+            continue
+        if await issue_index.is_fresh(repo):
+            continue
+        if not _is_idle("core", share):
+            return warmed
+        try:
+            await sync_issue_index(repo=repo)
+            warmed += 1
+        except Exception:
+            logger.exception("Warming %s failed", repo)
+
+    for repo, queries in popularity.top_plans(max_plans):
+        if await issue_index.is_fresh(repo):
+            continue
+        if not (_is_idle("search", share) and _is_idle("core", share)):
+            return warmed
+        try:
+            async for _ in stream_issues_with_comments(
+                repo=repo, queries=list(queries)
+            ):
+                pass
+            warmed += 1
+        except Exception:
+            logger.exception("Warming %s %s failed", repo, list(queries))
+
+    return warmed
+
+
+async def run_warmer(interval: float = settings.WARMER_INTERVAL_SECONDS) -> None:
+    """Warm popular data every `interval` seconds until cancelled."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await warm_once()
+        except Exception:
+            # A failed cycle must not stop the warmer, the next one may succeed
+            logger.exception("Warm cycle failed")
+        popularity.decay()
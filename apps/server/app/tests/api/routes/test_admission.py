@@ -0,0 +1,265 @@
+import asyncio
+from unittest.mock import patch
+
+import pytest
+from asgi_lifespan import LifespanManager
+from starlette.requests import ClientDisconnect, Request
+
+from app.api.routes.search import search_streams
+from app.exceptions.admission_exceptions import AdmissionRejected
+from app.main import app
+from app.services.admission import AdmissionController, client_id
+from app.tests.api.routes.test_search import _mock_pipeline, mock_issue_stage
+
+"""Tests for admission control in front of /search."""
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _controller(**overrides) -> AdmissionController:
+    config = {
+        "max_active": 1,
+        "max_queue": 10,
+        "client_rate": 1.0,
+        "client_burst": 10,
+        "clock": FakeClock(),
+    }
+    return AdmissionController(**{**config, **overrides})
+
+
+def test_queued_searches_are_admitted_as_slots_free_up():
+    """Searches beyond the concurrency limit queue, and run once a slot frees up."""
+    controller = _controller()
+    running = controller.enter("a")
+    waiting = controller.enter("b")
+
+    assert running.admitted
+    assert not waiting.admitted
+    assert (controller.active, controller.queued) == (1, 1)
+
+    running.release()
+    assert waiting.admitted
+    assert (controller.active, controller.queued) == (1, 0)
+
+
+def test_queue_is_fair_between_clients():
+    """A client with many queued searches takes turns with the others."""
+    controller = _controller()
+    running = controller.enter("busy")
+    busy = [controller.enter("busy") for _ in range(3)]
+    other = controller.enter("other")
+
+    assert [controller.position(t) for t in [*busy, other]] == [1, 3, 4, 2]
+
+    admitted = []
+    for _ in range(4):
+        running.release()
+        (running,) = [t for t in [*busy, other] if t.admitted and not t.released]
+        admitted.append(running)
+    assert admitted == [busy[0], other, busy[1], busy[2]]
+
+
+def test_full_queue_sheds_searches_with_retry_after():
+    """Once the queue is full, new searches are rejected with a 503."""
+    controller = _controller(max_queue=1)
+    tickets = [controller.enter("a"), controller.enter("b")]
+
+    with pytest.raises(AdmissionRejected) as exc_info:
+        controller.enter("c")
+    assert exc_info.value.status_code == 503
+    assert exc_info.value.retry_after > 0
+    assert [ticket.admitted for ticket in tickets] == [True, False]
+
+
+def test_client_over_its_rate_is_rejected_until_its_bucket_refills():
+    """A client that spends its burst gets a 429 until tokens come back."""
+    clock = FakeClock()
+    controller = _controller(max_active=10, client_burst=2, clock=clock)
+    controller.enter("a").release()
+    controller.enter("a").release()
+
+    with pytest.raises(AdmissionRejected) as exc_info:
+        controller.enter("a")
+    assert exc_info.value.status_code == 429
+    assert exc_info.value.retry_after == pytest.approx(1.0)
+    assert controller.enter("b").admitted
+
+    clock.now += 1
+    assert controller.enter("a").admitted
+
+
+def test_client_rate_of_zero_turns_per_client_limiting_off():
+    """With no per-client rate, one client can start any number of searches."""
+    controller = _controller(max_active=100, client_rate=0, client_burst=1)
+
+    assert all(controller.enter("a").admitted for _ in range(20))
+
+
+def test_clients_cannot_pick_their_identity_with_a_bearer_token():
+    """Requests from one address are one client, whatever token they send."""
+
+    def request(token: str) -> Request:
+        return Request(
+            {
+                "type": "http",
+                "headers": [(b"authorization", f"Bearer {token}".encode())],
+                "client": ("203.0.113.7", 50000),
+            }
+        )
+
+    assert client_id(request("one")) == client_id(request("two")) == "ip:203.0.113.7"
+
+
+@pytest.mark.anyio
+async def test_wait_reports_positions_and_abandoned_tickets_leave_the_queue():
+    """Waiting yields each new queue position; a released waiter frees its place."""
+    controller = _controller()
+    running = controller.enter("a")
+    first = controller.enter("b")
+    second = controller.enter("c")
+
+    positions = []
+
+    async def wait():
+        async for position in second.wait():
+            positions.append(position)
+
+    waiter = asyncio.create_task(wait())
+    await asyncio.sleep(0)
+    first.release()
+    await asyncio.sleep(0)
+    running.release()
+    await asyncio.wait_for(waiter, timeout=1)
+
+    assert positions == [2, 1]
+    assert second.admitted
+    assert controller.queued == 0
+
+
+@pytest.mark.anyio
+async def test_search_is_shed_with_503_when_the_queue_is_full(
+    async_client, isolated_admission
+):
+    """A search that cannot even queue gets a 503 with Retry-After before streaming."""
+    isolated_admission.max_active = 1
+    isolated_admission.max_queue = 0
+    running = isolated_admission.enter("someone-else")
+
+    response = await async_client.get(
+        "/api/v1/search", params={"query": "vite build failed"}
+    )
+
+    assert response.status_code == 503
+    assert int(response.headers["retry-after"]) >= 1
+    running.release()
+
+
+@pytest.mark.anyio
+async def test_queued_search_reports_its_position_then_runs(
+    async_client, isolated_admission
+):
+    """A search waiting for a slot streams its queue position, then completes."""
+    isolated_admission.max_active = 1
+    running = isolated_admission.enter("someone-else")
+
+    with (
+        patch("app.api.routes.search.generate_issue_queries") as mock_generate_queries,
+        patch("app.api.routes.search.get_repository") as mock_get_repo,
+        patch(
+            "app.api.routes.search.stream_issues_with_comments",
+            new=mock_issue_stage([]),
+        ),
+        patch(
+            "app.api.routes.search.generate_streaming_answer"
+        ) as mock_streaming_answer,
+    ):
+        _mock_pipeline(mock_generate_queries, mock_get_repo, mock_streaming_answer)
+
+        search = asyncio.create_task(
+            async_client.get("/api/v1/search", params={"query": "vite build failed"})
+        )
+        while not isolated_admission.queued:
+            await asyncio.sleep(0.01)
+        assert not mock_generate_queries.called
+        running.release()
+        response = await asyncio.wait_for(search, timeout=5)
+
+    assert response.status_code == 200
+    assert 'event: queued\ndata: {"position":1}' in response.text
+    assert "event: streaming_answer_end" in response.text
+    assert isolated_admission.active == 0
+
+
+def _search_scope() -> dict:
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0", "spec_version": "2.4"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/api/v1/search",
+        "raw_path": b"/api/v1/search",
+        "root_path": "",
+        "query_string": b"query=vite+build+failed",
+        "headers": [(b"host", b"test")],
+        "client": ("127.0.0.1", 50000),
+        "server": ("test", 80),
+    }
+
+
+@pytest.mark.anyio
+async def test_client_leaving_the_queue_gives_its_place_back(
+    isolated_admission, monkeypatch
+):
+    """A queued search whose client leaves gives its place up after the grace period."""
+    monkeypatch.setattr(search_streams, "linger", 0.05)
+    isolated_admission.max_active = 1
+    running = isolated_admission.enter("someone-else")
+    request_sent = False
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        while not isolated_admission.queued:
+            await asyncio.sleep(0.01)
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        pass
+
+    async with LifespanManager(app) as manager:
+        await asyncio.wait_for(manager.app(_search_scope(), receive, send), timeout=5)
+        await asyncio.sleep(0.2)
+
+    assert isolated_admission.queued == 0
+    assert isolated_admission.active == 1
+    running.release()
+    assert isolated_admission.active == 0
+
+
+@pytest.mark.anyio
+async def test_response_that_never_starts_streaming_gives_its_slot_back(
+    isolated_admission,
+):
+    """A client gone before the stream starts frees the slot at once."""
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        raise OSError("client went away")
+
+    async with LifespanManager(app) as manager:
+        with pytest.raises(ClientDisconnect):
+            await manager.app(_search_scope(), receive, send)
+
+    assert isolated_admission.active == 0
+    assert isolated_admission.queued == 0
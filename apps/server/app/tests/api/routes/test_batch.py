@@ -0,0 +1,93 @@
+import json
+from unittest.mock import patch
+
+import pytest
+
+from app.core.config import settings
+from app.tests.api.routes.test_search import _mock_pipeline, mock_issue_stage
+
+"""Tests for the batch search endpoint."""
+
+
+def _lines(text: str) -> list[dict]:
+    return [json.loads(line) for line in text.splitlines()]
+
+
+@pytest.mark.anyio
+async def test_batch_runs_each_distinct_search_once(async_client):
+    """Repeated searches in a batch share one run, and every search gets its line."""
+    searches = [
+        {"query": "vite build failed after upgrading"},
+        {"query": "Vite build failed  after upgrading"},
+        {"query": "vite dev server keeps reloading"},
+    ]
+
+    with (
+        patch("app.api.routes.search.plan_issue_queries") as mock_plan,
+        patch("app.api.routes.search.generate_issue_queries") as mock_generate_queries,
+        patch("app.api.routes.search.get_repository") as mock_get_repo,
+        patch(
+            "app.api.routes.search.stream_issues_with_comments",
+            new=mock_issue_stage([]),
+        ),
+        patch(
+            "app.api.routes.search.generate_streaming_answer"
+        ) as mock_streaming_answer,
+    ):
+        _mock_pipeline(mock_generate_queries, mock_get_repo, mock_streaming_answer)
+
+        response = await async_client.post(
+            "/api/v1/search/batch", json={"searches": searches}
+        )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = sorted(_lines(response.text), key=lambda line: line["index"])
+    assert [line["index"] for line in lines] == [0, 1, 2]
+    assert [line["query"] for line in lines] == [s["query"] for s in searches]
+    for line in lines:
+        assert line["outcome"] == "completed"
+        assert line["repo"] == "vitejs/vite"
+        assert line["answer"] == "Clear the cache."
+        assert line["error"] is None
+    assert mock_generate_queries.call_count == 2
+    # Both distinct queries were planned together before the searches ran
+    assert mock_plan.call_args.kwargs["user_queries"] == [
+        searches[0]["query"],
+        searches[2]["query"],
+    ]
+
+
+@pytest.mark.anyio
+async def test_batch_reports_failed_searches_in_their_line(async_client):
+    """A search that stops early has its error in its line, the rest still run."""
+
+    with (
+        patch("app.api.routes.search.plan_issue_queries"),
+        patch(
+            "app.api.routes.search.generate_issue_queries",
+            side_effect=RuntimeError("boom"),
+        ),
+    ):
+        response = await async_client.post(
+            "/api/v1/search/batch",
+            json={"searches": [{"query": "vite build failed after upgrading"}]},
+        )
+
+    (line,) = _lines(response.text)
+    assert line["outcome"] == "error"
+    assert line["error"] == "Failed to generate search queries."
+
+
+@pytest.mark.anyio
+async def test_batch_size_is_limited(async_client):
+    """Batches over BATCH_MAX_SEARCHES are rejected when the request is validated."""
+    search = {"query": "vite build failed after upgrading"}
+
+    response = await async_client.post(
+        "/api/v1/search/batch",
+        json={"searches": [search] * (settings.BATCH_MAX_SEARCHES + 1)},
+    )
+
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["type"] == "too_long"
@@ -0,0 +1,66 @@
+from unittest.mock import patch
+
+import pytest
+
+from app.core.config import settings
+from app.tests.api.routes.test_search import (
+    VITE_ISSUES,
+    _mock_pipeline,
+    mock_issue_stage,
+)
+
+"""Tests for the /metrics endpoint and the stage timings of searches."""
+
+
+@pytest.mark.anyio
+async def test_search_reports_stage_timings(async_client, monkeypatch):
+    """Searches feed the stage metrics and can report their stages to the client."""
+    monkeypatch.setattr(settings, "SEARCH_SERVER_TIMING", True)
+
+    with (
+        patch("app.api.routes.search.generate_issue_queries") as mock_generate_queries,
+        patch("app.api.routes.search.get_repository") as mock_get_repo,
+        patch(
+            "app.api.routes.search.stream_issues_with_comments",
+            new=mock_issue_stage(VITE_ISSUES),
+        ),
+        patch(
+            "app.api.routes.search.generate_streaming_answer"
+        ) as mock_streaming_answer,
+    ):
+        _mock_pipeline(mock_generate_queries, mock_get_repo, mock_streaming_answer)
+        params = {"query": "Vite build failed after upgrade"}
+
+        first = await async_client.get("/api/v1/search", params=params)
+        second = await async_client.get("/api/v1/search", params=params)
+
+    end = first.text.split("event: streaming_answer_end\ndata: ")[1]
+    for stage in ("query_generation", "repo_resolution", "llm_first_token", "total"):
+        assert f"{stage};dur=" in end
+    assert '"stages"' not in end
+    # The replay reports its own lookup, not the stages of the recorded run
+    replayed = second.text.split("event: streaming_answer_end\ndata: ")[1]
+    assert "cache_lookup;dur=" in replayed
+    assert "query_generation" not in replayed
+
+    monkeypatch.setattr(settings, "METRICS_ENABLED", True)
+    metrics = await async_client.get("/metrics")
+    assert metrics.status_code == 200
+    assert metrics.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert (
+        'pinpoint_search_stage_duration_seconds_count{stage="query_generation"}'
+        in metrics.text
+    )
+    assert 'pinpoint_searches_total{outcome="cache_hit"}' in metrics.text
+    assert 'pinpoint_cache_requests_total{namespace="search",result="hit"} 1' in (
+        metrics.text
+    )
+    assert "pinpoint_github_queue_depth 0" in metrics.text
+
+
+@pytest.mark.anyio
+async def test_metrics_are_off_by_default(async_client):
+    """/metrics is not served unless METRICS_ENABLED is set."""
+    response = await async_client.get("/metrics")
+
+    assert response.status_code == 404
@@ -1,6 +1,34 @@
+import asyncio
 from unittest.mock import MagicMock, patch
 
 import pytest
+from asgi_lifespan import LifespanManager
+
+from app.api.routes.search import (
+    _refresh_tasks,
+    search_cache,
+    search_cache_key,
+    search_flights,
+    search_streams,
+)
+from app.core.config import settings
+from app.core.metrics import search_cancellations
+from app.main import app
+from app.models import SearchRequest
+
+
+def mock_issue_stage(issues_with_comments: list[dict]):
+    """Stand-in for stream_issues_with_comments that reports the given result."""
+
+    async def stage(**kwargs):
+        yield {"type": "issues", "data": len(issues_with_comments)}
+        yield {
+            "type": "comments",
+            "data": sum(len(issue["comments"]) for issue in issues_with_comments),
+        }
+        yield {"type": "result", "data": issues_with_comments}
+
+    return stage
 
 
 @pytest.mark.anyio
@@ -11,8 +39,17 @@ async def test_search_endpoint_success(async_client):
     with (
         patch("app.api.routes.search.generate_issue_queries") as mock_generate_queries,
         patch("app.api.routes.search.get_repository") as mock_get_repo,
-        patch("app.api.routes.search.search_issues") as mock_search_issues,
-        patch("app.api.routes.search.get_issues_with_comments") as mock_get_comments,
+        patch(
+            "app.api.routes.search.stream_issues_with_comments",
+            new=mock_issue_stage(
+                [
+                    {
+                        "issue_number": 123,
+                        "comments": [{"body": "Test comment", "username": "testuser"}],
+                    }
+                ]
+            ),
+        ),
         patch(
             "app.api.routes.search.generate_streaming_answer"
         ) as mock_streaming_answer,
@@ -29,13 +66,6 @@ async def test_search_endpoint_success(async_client):
         mock_generate_queries.return_value = mock_queries_response
 
         mock_get_repo.return_value = "facebook/react"
-        mock_search_issues.return_value = [MagicMock(number=123, title="Test issue")]
-        mock_get_comments.return_value = [
-            {
-                "issue_number": 123,
-                "comments": [{"body": "Test comment", "username": "testuser"}],
-            }
-        ]
 
         async def mock_stream():
             # Mock the actual event stream format from the endpoint
@@ -51,7 +81,7 @@ async def test_search_endpoint_success(async_client):
         mock_streaming_answer.return_value = mock_stream()
 
         # Make the request
-        response = await async_client.post(
+        response = await async_client.get(
             "/api/v1/search",
             params={"query": "React hooks not working properly in my application"},
         )
@@ -84,8 +114,10 @@ async def test_search_endpoint_with_specific_repo(async_client):
     with (
         patch("app.api.routes.search.generate_issue_queries") as mock_generate_queries,
         patch("app.api.routes.search.check_repo_exists") as mock_check_repo,
-        patch("app.api.routes.search.search_issues") as mock_search_issues,
-        patch("app.api.routes.search.get_issues_with_comments") as mock_get_comments,
+        patch(
+            "app.api.routes.search.stream_issues_with_comments",
+            new=mock_issue_stage([]),
+        ),
         patch(
             "app.api.routes.search.generate_streaming_answer"
         ) as mock_streaming_answer,
@@ -102,8 +134,6 @@ async def test_search_endpoint_with_specific_repo(async_client):
         mock_generate_queries.return_value = mock_queries_response
 
         mock_check_repo.return_value = True  # Repo exists
-        mock_search_issues.return_value = []
-        mock_get_comments.return_value = []
 
         async def mock_stream():
             yield "No relevant issues found."
@@ -111,7 +141,7 @@ async def test_search_endpoint_with_specific_repo(async_client):
         mock_streaming_answer.return_value = mock_stream()
 
         # Make the request with specific repo
-        response = await async_client.post(
+        response = await async_client.get(
             "/api/v1/search",
             params={
                 "query": "Vue component not rendering properly in my application and showing blank screen",
@@ -129,7 +159,8 @@ async def test_search_endpoint_with_specific_repo(async_client):
 async def test_search_endpoint_invalid_json(async_client):
     """Test the /search endpoint with invalid JSON."""
 
-    response = await async_client.post(
+    response = await async_client.request(
+        "GET",
         "/api/v1/search",
         content="invalid json",
         headers={"content-type": "application/json"},
@@ -142,7 +173,7 @@ async def test_search_endpoint_invalid_json(async_client):
 async def test_search_endpoint_missing_query(async_client):
     """Test the /search endpoint with missing query field."""
 
-    response = await async_client.post(
+    response = await async_client.get(
         "/api/v1/search",
         params={"repo": "facebook/react"},  # Missing required 'query' field
     )
@@ -157,8 +188,10 @@ async def test_search_endpoint_empty_query(async_client):
     with (
         patch("app.api.routes.search.generate_issue_queries") as mock_generate_queries,
         patch("app.api.routes.search.get_repository") as mock_get_repo,
-        patch("app.api.routes.search.search_issues") as mock_search_issues,
-        patch("app.api.routes.search.get_issues_with_comments") as mock_get_comments,
+        patch(
+            "app.api.routes.search.stream_issues_with_comments",
+            new=mock_issue_stage([]),
+        ),
         patch(
             "app.api.routes.search.generate_streaming_answer"
         ) as mock_streaming_answer,
@@ -178,15 +211,13 @@ async def test_search_endpoint_empty_query(async_client):
         mock_generate_queries.return_value = mock_queries_response
 
         mock_get_repo.return_value = "microsoft/vscode"
-        mock_search_issues.return_value = []
-        mock_get_comments.return_value = []
 
         async def mock_stream():
             yield "Please provide a more specific query."
 
         mock_streaming_answer.return_value = mock_stream()
 
-        response = await async_client.post(
+        response = await async_client.get(
             "/api/v1/search",
             params={
                 "query": "I need help with programming issue that I cannot solve on my own"
@@ -194,3 +225,440 @@ async def test_search_endpoint_empty_query(async_client):
         )
 
         assert response.status_code == 200
+
+
+# An issue found for the mocked pipeline, runs that found nothing are not cached
+VITE_ISSUES = [
+    {
+        "issue_number": 1,
+        "title": "Build fails after upgrading",
+        "issue_url": "https://github.com/vitejs/vite/issues/1",
+        "body": "vite build fails",
+        "comments": [{"body": "Clear the cache.", "username": "user"}],
+    }
+]
+
+
+def _mock_pipeline(mock_generate_queries, mock_get_repo, mock_streaming_answer):
+    mock_queries_response = MagicMock()
+    mock_queries_response.model_dump.return_value = {
+        "technology": "vite",
+        "queries": ["vite build failed"],
+        "confidence": 0.9,
+    }
+    mock_queries_response.technology = "vite"
+    mock_queries_response.queries = ["vite build failed"]
+    mock_get_repo.return_value = "vitejs/vite"
+
+    # Like the real stages, report their timings to the search's timer
+    def generate_queries(*, timer=None, **kwargs):
+        if timer is not None:
+            timer.record("query_generation", 0.01)
+        return mock_queries_response
+
+    async def mock_stream(timer=None):
+        if timer is not None:
+            timer.record("llm_first_token", 0.01)
+        yield {"type": "answer", "data": "Clear the cache."}
+
+    mock_generate_queries.side_effect = generate_queries
+    mock_streaming_answer.side_effect = lambda *, timer=None, **kwargs: mock_stream(
+        timer
+    )
+
+
+@pytest.mark.anyio
+async def test_search_endpoint_replays_cached_result(async_client):
+    """A repeated search replays the recorded events without re-running the pipeline."""
+
+    with (
+        patch("app.api.routes.search.generate_issue_queries") as mock_generate_queries,
+        patch("app.api.routes.search.get_repository") as mock_get_repo,
+        patch(
+            "app.api.routes.search.stream_issues_with_comments",
+            new=mock_issue_stage(VITE_ISSUES),
+        ),
+        patch(
+            "app.api.routes.search.generate_streaming_answer"
+        ) as mock_streaming_answer,
+    ):
+        _mock_pipeline(mock_generate_queries, mock_get_repo, mock_streaming_answer)
+
+        first = await async_client.get(
+            "/api/v1/search", params={"query": "Vite build failed after upgrade"}
+        )
+        second = await async_client.get(
+            "/api/v1/search", params={"query": "  vite BUILD failed   after upgrade"}
+        )
+
+        assert mock_generate_queries.call_count == 1
+        assert "streaming_answer_end" in second.text
+
+        def body(text: str) -> list[str]:
+            lines = [line for line in text.split("\n") if line.startswith("data: ")]
+            return lines[:-1]  # The end event carries a fresh elapsed time
+
+        assert body(first.text) == body(second.text)
+
+
+@pytest.mark.anyio
+async def test_search_endpoint_does_not_cache_errors(async_client):
+    """Runs that end in a streaming error are not replayed."""
+
+    with (
+        patch("app.api.routes.search.generate_issue_queries") as mock_generate_queries,
+        patch("app.api.routes.search.get_repository", return_value=None),
+    ):
+        mock_queries_response = MagicMock(
+            technology="unknown", queries=["something broke"]
+        )
+        mock_queries_response.model_dump.return_value = {"queries": ["something broke"]}
+        mock_generate_queries.return_value = mock_queries_response
+
+        for _ in range(2):
+            response = await async_client.get(
+                "/api/v1/search", params={"query": "Something broke in my build"}
+            )
+            assert "streaming_error" in response.text
+
+        assert mock_generate_queries.call_count == 2
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize(
+    "result",
+    [
+        {"type": "result", "data": []},
+        {"type": "result", "data": VITE_ISSUES, "complete": False},
+    ],
+    ids=["no_issues", "failed_fetches"],
+)
+async def test_search_endpoint_does_not_cache_partial_answers(async_client, result):
+    """Answers written without any issues, or without some of them, are not replayed."""
+
+    async def stage(**kwargs):
+        yield result
+
+    with (
+        patch("app.api.routes.search.generate_issue_queries") as mock_generate_queries,
+        patch("app.api.routes.search.get_repository") as mock_get_repo,
+        patch("app.api.routes.search.stream_issues_with_comments", new=stage),
+        patch(
+            "app.api.routes.search.generate_streaming_answer"
+        ) as mock_streaming_answer,
+    ):
+        _mock_pipeline(mock_generate_queries, mock_get_repo, mock_streaming_answer)
+
+        for _ in range(2):
+            response = await async_client.get(
+                "/api/v1/search", params={"query": "Vite build failed after upgrade"}
+            )
+            assert "streaming_answer_end" in response.text
+
+        assert mock_generate_queries.call_count == 2
+
+
+@pytest.mark.anyio
+async def test_search_endpoint_refreshes_stale_result(async_client):
+    """A stale hit is served immediately and refreshed in the background."""
+
+    with (
+        patch("app.api.routes.search.generate_issue_queries") as mock_generate_queries,
+        patch("app.api.routes.search.get_repository") as mock_get_repo,
+        patch(
+            "app.api.routes.search.stream_issues_with_comments",
+            new=mock_issue_stage(VITE_ISSUES),
+        ),
+        patch(
+            "app.api.routes.search.generate_streaming_answer"
+        ) as mock_streaming_answer,
+    ):
+        _mock_pipeline(mock_generate_queries, mock_get_repo, mock_streaming_answer)
+        params = {"query": "Vite build failed after upgrade"}
+
+        await async_client.get("/api/v1/search", params=params)
+        key = search_cache_key(SearchRequest(**params))
+        events = await search_cache.get(key)
+        await search_cache.set(key, events, ttl=0)
+
+        response = await async_client.get("/api/v1/search", params=params)
+        assert "streaming_answer_end" in response.text
+
+        await asyncio.gather(*_refresh_tasks.values())
+        assert mock_generate_queries.call_count == 2
+        assert (await search_cache.lookup(key))[1] is False
+
+
+@pytest.mark.anyio
+async def test_search_endpoint_checks_repo_while_generating_queries(async_client):
+    """The repo check runs concurrently with Gemini query generation."""
+    repo_check_started = asyncio.Event()
+
+    async def check_repo(**kwargs):
+        repo_check_started.set()
+        return True
+
+    async def generate_queries(**kwargs):
+        # Would time out if the repo check only started after query generation
+        await asyncio.wait_for(repo_check_started.wait(), timeout=1)
+        response = MagicMock(technology="vue", queries=["vue render blank"])
+        response.model_dump.return_value = {"queries": ["vue render blank"]}
+        return response
+
+    with (
+        patch("app.api.routes.search.generate_issue_queries", new=generate_queries),
+        patch("app.api.routes.search.check_repo_exists", new=check_repo),
+        patch(
+            "app.api.routes.search.stream_issues_with_comments",
+            new=mock_issue_stage([]),
+        ),
+        patch(
+            "app.api.routes.search.generate_streaming_answer"
+        ) as mock_streaming_answer,
+    ):
+
+        async def mock_stream():
+            yield {"type": "answer", "data": "Answer"}
+
+        mock_streaming_answer.return_value = mock_stream()
+
+        response = await async_client.get(
+            "/api/v1/search",
+            params={"query": "Vue component renders blank", "repo": "vuejs/core"},
+        )
+
+    assert '"repo":"vuejs/core"' in response.text
+    assert "streaming_answer_end" in response.text
+
+
+@pytest.mark.anyio
+async def test_search_endpoint_coalesces_concurrent_identical_searches(async_client):
+    """Concurrent identical searches share one pipeline run and get the same events."""
+    both_started = asyncio.Event()
+    calls = 0
+
+    async def generate_queries(**kwargs):
+        nonlocal calls
+        calls += 1
+        # Hold the run open until the second request has joined it
+        await asyncio.wait_for(both_started.wait(), timeout=1)
+        response = MagicMock(technology="vite", queries=["vite build failed"])
+        response.model_dump.return_value = {"queries": ["vite build failed"]}
+        return response
+
+    with (
+        patch("app.api.routes.search.generate_issue_queries", new=generate_queries),
+        patch("app.api.routes.search.get_repository", return_value="vitejs/vite"),
+        patch(
+            "app.api.routes.search.stream_issues_with_comments",
+            new=mock_issue_stage([]),
+        ),
+        patch(
+            "app.api.routes.search.generate_streaming_answer"
+        ) as mock_streaming_answer,
+    ):
+
+        async def mock_stream():
+            yield {"type": "answer", "data": "Clear the cache."}
+
+        mock_streaming_answer.side_effect = lambda **kwargs: mock_stream()
+
+        async def search():
+            return await async_client.get(
+                "/api/v1/search", params={"query": "Vite build failed"}
+            )
+
+        first = asyncio.create_task(search())
+        second = asyncio.create_task(search())
+        while len(search_flights) == 0:
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.05)
+        both_started.set()
+        responses = await asyncio.gather(first, second)
+
+    assert calls == 1
+    assert mock_streaming_answer.call_count == 1
+
+    def body(text: str) -> list[str]:
+        lines = [line for line in text.split("\n") if line.startswith("data: ")]
+        return lines[:-1]  # The end event carries each request's own elapsed time
+
+    assert body(responses[0].text) == body(responses[1].text)
+    assert "Clear the cache." in responses[1].text
+
+
+@pytest.mark.anyio
+async def test_search_endpoint_compresses_the_stream(async_client, monkeypatch):
+    """Once enabled, clients that accept gzip get a gzip stream, others a plain one."""
+    with (
+        patch("app.api.routes.search.generate_issue_queries") as mock_generate_queries,
+        patch("app.api.routes.search.get_repository") as mock_get_repo,
+        patch(
+            "app.api.routes.search.stream_issues_with_comments",
+            new=mock_issue_stage([]),
+        ),
+        patch(
+            "app.api.routes.search.generate_streaming_answer"
+        ) as mock_streaming_answer,
+    ):
+        _mock_pipeline(mock_generate_queries, mock_get_repo, mock_streaming_answer)
+
+        default = await async_client.get(
+            "/api/v1/search",
+            params={"query": "vite build failed"},
+            headers={"Accept-Encoding": "gzip"},
+        )
+        monkeypatch.setattr(settings, "SSE_COMPRESSION", True)
+        compressed = await async_client.get(
+            "/api/v1/search",
+            params={"query": "vite build failed"},
+            headers={"Accept-Encoding": "gzip"},
+        )
+        plain = await async_client.get(
+            "/api/v1/search",
+            params={"query": "vite build failed"},
+            headers={"Accept-Encoding": "identity"},
+        )
+
+    assert "content-encoding" not in default.headers
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in compressed.headers["vary"]
+    assert "content-encoding" not in plain.headers
+    for response in (default, compressed, plain):
+        assert (
+            'event: streaming_answer_chunk\ndata: "Clear the cache."' in response.text
+        )
+
+
+def _event_ids(text: str) -> dict[str, str]:
+    """The id of each event type in an SSE response, the last one of each type."""
+    ids = {}
+    for message in text.split("\n\n"):
+        fields = dict(
+            line.split(": ", 1) for line in message.splitlines() if ": " in line
+        )
+        if "id" in fields:
+            ids[fields["event"]] = fields["id"]
+    return ids
+
+
+@pytest.mark.anyio
+async def test_reconnect_with_last_event_id_resumes_the_stream(async_client):
+    """A reconnect resumes after its last event, or learns its stream is gone."""
+
+    with (
+        patch("app.api.routes.search.generate_issue_queries") as mock_generate_queries,
+        patch("app.api.routes.search.get_repository") as mock_get_repo,
+        patch(
+            "app.api.routes.search.stream_issues_with_comments",
+            new=mock_issue_stage([]),
+        ),
+        patch(
+            "app.api.routes.search.generate_streaming_answer"
+        ) as mock_streaming_answer,
+    ):
+        _mock_pipeline(mock_generate_queries, mock_get_repo, mock_streaming_answer)
+
+        first = await async_client.get(
+            "/api/v1/search", params={"query": "vite build failed"}
+        )
+        ids = _event_ids(first.text)
+        resumed = await async_client.get(
+            "/api/v1/search",
+            params={"query": "vite build failed"},
+            headers={"Last-Event-ID": ids["get_repository"]},
+        )
+        expired = await async_client.get(
+            "/api/v1/search",
+            params={"query": "vite build failed"},
+            headers={"Last-Event-ID": "gone:3"},
+        )
+
+    assert mock_generate_queries.call_count == 1
+    assert list(_event_ids(resumed.text)) == [
+        "search_issues",
+        "get_issues_comments",
+        "generate_streaming_answer_start",
+        "streaming_answer_chunk",
+        "streaming_answer_end",
+    ]
+    assert (
+        _event_ids(resumed.text)["streaming_answer_end"]
+        == (ids["streaming_answer_end"])
+    )
+    # An unknown stream is reported as such, without running the search again
+    assert "event: stream_expired" in expired.text
+    assert "event: ready" not in expired.text
+
+
+@pytest.mark.anyio
+async def test_client_disconnect_cancels_the_running_search(monkeypatch):
+    """
+    Closing the stream mid-answer cancels the Gemini call, once the grace period
+    for a reconnect is over, and counts the cancellation.
+    """
+    monkeypatch.setattr(search_streams, "linger", 0.05)
+    answering = asyncio.Event()
+    answer_cancelled = asyncio.Event()
+    body_sent = False
+    cancellations = search_cancellations.get(stage="answer")
+
+    async def endless_answer(**kwargs):
+        yield {"type": "answer", "data": "Clear"}
+        answering.set()
+        try:
+            await asyncio.Event().wait()
+        except asyncio.CancelledError:
+            answer_cancelled.set()
+            raise
+
+    async def receive():
+        nonlocal body_sent
+        if not body_sent:
+            body_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await answering.wait()
+        return {"type": "http.disconnect"}
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http",
+        # Servers on ASGI 2.4 leave disconnect detection to the app
+        "asgi": {"version": "3.0", "spec_version": "2.4"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/api/v1/search",
+        "raw_path": b"/api/v1/search",
+        "root_path": "",
+        "query_string": b"query=vite+build+failed",
+        "headers": [(b"host", b"test")],
+        "client": ("127.0.0.1", 50000),
+        "server": ("test", 80),
+    }
+
+    with (
+        patch("app.api.routes.search.generate_issue_queries") as mock_generate_queries,
+        patch("app.api.routes.search.get_repository") as mock_get_repo,
+        patch(
+            "app.api.routes.search.stream_issues_with_comments",
+            new=mock_issue_stage([]),
+        ),
+        patch(
+            "app.api.routes.search.generate_streaming_answer"
+        ) as mock_streaming_answer,
+    ):
+        _mock_pipeline(mock_generate_queries, mock_get_repo, mock_streaming_answer)
+        mock_streaming_answer.side_effect = endless_answer
+
+        async with LifespanManager(app) as manager:
+            await asyncio.wait_for(manager.app(scope, receive, send), timeout=5)
+
+    await asyncio.wait_for(answer_cancelled.wait(), timeout=1)
+    assert search_cancellations.get(stage="answer") == cancellations + 1
+    assert len(search_flights) == 0
+    assert sent[-1] == {"type": "http.response.body", "body": b"", "more_body": False}
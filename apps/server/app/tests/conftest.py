@@ -1,16 +1,70 @@
-from typing import AsyncGenerator
+from collections.abc import AsyncGenerator
 
 import pytest
 from asgi_lifespan import LifespanManager
 from httpx import ASGITransport, AsyncClient
 
+from app.core import cache
+from app.core.cache_backends import MemoryBackend
+from app.core.config import settings
 from app.main import app
+from app.services import admission
+from app.services.repositories import repository_index
+
+
+@pytest.fixture
+def anyio_backend() -> str:
+    # The services fan out with asyncio.TaskGroup, so only run on asyncio
+    return "asyncio"
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache_backend(monkeypatch) -> MemoryBackend:
+    # Every test starts with empty caches
+    backend = MemoryBackend(max_bytes=settings.CACHE_MAX_BYTES)
+    monkeypatch.setattr(cache, "cache_backend", backend)
+    for namespace in cache.namespaces.values():
+        namespace.hits = 0
+        namespace.misses = 0
+    return backend
+
+
+@pytest.fixture(autouse=True)
+def isolated_repository_index(tmp_path, monkeypatch):
+    # Never read or write the learned index of the machine running the tests
+    monkeypatch.setattr(repository_index, "path", tmp_path / "repositories.json")
+    monkeypatch.setattr(repository_index, "_learned", {})
+
+
+@pytest.fixture(autouse=True)
+def no_upstream_warmup(monkeypatch):
+    # Starting the app never connects to the real upstreams
+    monkeypatch.setattr(settings, "UPSTREAM_WARMUP", False)
+
+
+@pytest.fixture(autouse=True)
+def isolated_admission(monkeypatch) -> admission.AdmissionController:
+    # Every test starts with idle limits and full client buckets
+    controller = admission.AdmissionController(
+        max_active=settings.ADMISSION_MAX_ACTIVE_SEARCHES,
+        max_queue=settings.ADMISSION_MAX_QUEUE,
+        client_rate=settings.ADMISSION_CLIENT_RATE_PER_MINUTE / 60,
+        client_burst=settings.ADMISSION_CLIENT_BURST,
+    )
+    monkeypatch.setattr(admission, "search_admission", controller)
+    for stage, limiter in admission.stage_limits.items():
+        monkeypatch.setitem(
+            admission.stage_limits, stage, admission.StageLimiter(limiter.limit)
+        )
+    return controller
 
 
 @pytest.fixture
 async def async_client() -> AsyncGenerator[AsyncClient, None]:
-    async with LifespanManager(app) as manager:
-        async with AsyncClient(
+    async with (
+        LifespanManager(app) as manager,
+        AsyncClient(
             transport=ASGITransport(app=manager.app), base_url="http://test"
-        ) as client:
-            yield client
+        ) as client,
+    ):
+        yield client
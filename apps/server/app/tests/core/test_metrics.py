@@ -0,0 +1,51 @@
+from app.core.metrics import Registry, StageTimer, server_timing, stage_duration
+
+"""Unit tests for the Prometheus metrics registry."""
+
+
+def test_registry_renders_prometheus_text():
+    """Counters, histograms and collected gauges render in the exposition format."""
+    registry = Registry()
+    requests = registry.counter("test_requests_total", "Requests.", ("outcome",))
+    latency = registry.histogram(
+        "test_latency_seconds", "Latency.", ("operation",), buckets=(0.1, 1)
+    )
+    registry.collected("test_queue_depth", "Queue depth.", lambda: 3)
+
+    requests.inc(outcome='say "hi"')
+    requests.inc(2, outcome='say "hi"')
+    latency.observe(0.1, operation="search")
+    latency.observe(0.5, operation="search")
+    latency.observe(5, operation="search")
+
+    assert registry.render() == (
+        "# HELP test_requests_total Requests.\n"
+        "# TYPE test_requests_total counter\n"
+        'test_requests_total{outcome="say \\"hi\\""} 3\n'
+        "# HELP test_latency_seconds Latency.\n"
+        "# TYPE test_latency_seconds histogram\n"
+        'test_latency_seconds_bucket{operation="search",le="0.1"} 1\n'
+        'test_latency_seconds_bucket{operation="search",le="1"} 2\n'
+        'test_latency_seconds_bucket{operation="search",le="+Inf"} 3\n'
+        'test_latency_seconds_sum{operation="search"} 5.6\n'
+        'test_latency_seconds_count{operation="search"} 3\n'
+        "# HELP test_queue_depth Queue depth.\n"
+        "# TYPE test_queue_depth gauge\n"
+        "test_queue_depth 3\n"
+    )
+
+
+def test_stage_timer_records_durations_and_observes_them():
+    """Stage durations add up per stage and feed the stage histogram."""
+    before = stage_duration.count(stage="unit_test")
+    timer = StageTimer()
+
+    with timer.stage("unit_test"):
+        pass
+    timer.record("unit_test", 0.25)
+
+    assert timer.durations["unit_test"] >= 0.25
+    assert stage_duration.count(stage="unit_test") == before + 2
+    assert server_timing({"query": 0.4123, "total": 1.5}) == (
+        "query;dur=412.3, total;dur=1500.0"
+    )
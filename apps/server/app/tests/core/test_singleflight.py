@@ -0,0 +1,212 @@
+import asyncio
+
+import pytest
+
+from app.core.singleflight import SingleFlight, StreamFlight
+
+"""Unit tests for single-flight call and stream coalescing."""
+
+
+@pytest.mark.anyio
+async def test_single_flight_shares_one_call():
+    """Concurrent callers with the same key share one call and its result."""
+    flight = SingleFlight()
+    release = asyncio.Event()
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return "result"
+
+    tasks = [asyncio.create_task(flight.do("key", fetch)) for _ in range(3)]
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await asyncio.gather(*tasks) == ["result"] * 3
+    assert calls == 1
+    assert len(flight) == 0
+
+
+@pytest.mark.anyio
+async def test_single_flight_shares_errors_and_forgets_the_call():
+    """Every caller sees the error, and the next call starts afresh."""
+    flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0)
+        raise ValueError("boom")
+
+    results = await asyncio.gather(
+        flight.do("key", fail), flight.do("key", fail), return_exceptions=True
+    )
+
+    assert all(isinstance(result, ValueError) for result in results)
+
+    async def succeed():
+        return "ok"
+
+    assert await flight.do("key", succeed) == "ok"
+
+
+@pytest.mark.anyio
+async def test_single_flight_survives_a_cancelled_caller():
+    """Cancelling one caller does not cancel the call for the others."""
+    flight = SingleFlight()
+    release = asyncio.Event()
+
+    async def fetch():
+        await release.wait()
+        return "result"
+
+    first = asyncio.create_task(flight.do("key", fetch))
+    second = asyncio.create_task(flight.do("key", fetch))
+    await asyncio.sleep(0)
+    first.cancel()
+    release.set()
+
+    assert await second == "result"
+
+
+@pytest.mark.anyio
+async def test_single_flight_cancels_the_call_once_every_caller_is_cancelled():
+    """A call nobody waits for anymore is cancelled, and the next one starts afresh."""
+    flight = SingleFlight()
+    cancelled = asyncio.Event()
+
+    async def fetch():
+        try:
+            await asyncio.Event().wait()
+        finally:
+            cancelled.set()
+
+    callers = [asyncio.create_task(flight.do("key", fetch)) for _ in range(2)]
+    await asyncio.sleep(0)
+    callers[0].cancel()
+    await asyncio.sleep(0)
+    assert not cancelled.is_set()
+    callers[1].cancel()
+
+    await asyncio.wait_for(cancelled.wait(), timeout=1)
+    assert len(flight) == 0
+
+    async def succeed():
+        return "ok"
+
+    assert await flight.do("key", succeed) == "ok"
+
+
+@pytest.mark.anyio
+async def test_stream_flight_replays_the_full_sequence_to_late_subscribers():
+    """A subscriber joining a running stream still receives it from the start."""
+    flight = StreamFlight()
+    release = asyncio.Event()
+    runs = 0
+
+    async def numbers():
+        nonlocal runs
+        runs += 1
+        yield 1
+        yield 2
+        await release.wait()
+        yield 3
+
+    async def collect():
+        return [item async for item in flight.subscribe("key", numbers)]
+
+    first = asyncio.create_task(collect())
+    await asyncio.sleep(0.01)
+    second = asyncio.create_task(collect())
+    await asyncio.sleep(0.01)
+    release.set()
+
+    assert await first == await second == [1, 2, 3]
+    assert runs == 1
+    assert len(flight) == 0
+
+
+@pytest.mark.anyio
+async def test_stream_flight_cancels_the_stream_without_subscribers():
+    """The shared stream stops once its last subscriber goes away."""
+    flight = StreamFlight()
+    cancelled = asyncio.Event()
+
+    async def forever():
+        try:
+            yield 1
+            await asyncio.Event().wait()
+        finally:
+            cancelled.set()
+
+    subscription = flight.subscribe("key", forever)
+    assert await anext(subscription) == 1
+    await subscription.aclose()
+
+    await asyncio.wait_for(cancelled.wait(), timeout=1)
+    assert len(flight) == 0
+
+
+@pytest.mark.anyio
+async def test_stream_flight_lingers_for_a_returning_subscriber():
+    """With `linger`, a subscriber that comes back in time resumes the same run."""
+    flight = StreamFlight(linger=1)
+    release = asyncio.Event()
+    runs = 0
+
+    async def numbers():
+        nonlocal runs
+        runs += 1
+        yield 1
+        yield 2
+        await release.wait()
+        yield 3
+
+    subscription = flight.subscribe("key", numbers)
+    assert await anext(subscription) == 1
+    await subscription.aclose()
+    assert "key" in flight
+
+    resumed = asyncio.create_task(
+        asyncio.wait_for(_collect(flight.subscribe("key", None, start=1)), timeout=1)
+    )
+    await asyncio.sleep(0.01)
+    release.set()
+
+    assert await resumed == [2, 3]
+    assert runs == 1
+
+
+@pytest.mark.anyio
+async def test_stream_flight_cancels_after_linger_and_retains_finished_streams():
+    """An abandoned stream is cancelled after `linger`, a finished one is kept for `retain`."""
+    flight = StreamFlight(linger=0.01, retain=1, max_retained=1)
+    cancelled = asyncio.Event()
+
+    async def forever():
+        try:
+            yield 1
+            await asyncio.Event().wait()
+        finally:
+            cancelled.set()
+
+    async def numbers():
+        yield 1
+        yield 2
+
+    subscription = flight.subscribe("abandoned", forever)
+    await anext(subscription)
+    await subscription.aclose()
+    await asyncio.wait_for(cancelled.wait(), timeout=1)
+    assert "abandoned" not in flight
+
+    assert await _collect(flight.subscribe("first", numbers)) == [1, 2]
+    assert await _collect(flight.subscribe("first", None, start=1)) == [2]
+    # Only the most recent finished stream is kept
+    assert await _collect(flight.subscribe("second", numbers)) == [1, 2]
+    await asyncio.sleep(0.01)
+    assert await _collect(flight.subscribe("first", None)) == []
+
+
+async def _collect(subscription) -> list:
+    return [item async for item in subscription]
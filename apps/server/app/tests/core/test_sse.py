@@ -0,0 +1,144 @@
+import asyncio
+import json
+import zlib
+
+import pytest
+from fastapi import Request
+
+from app.core import sse
+from app.core.sse import (
+    GzipEncoder,
+    cancel_on_disconnect,
+    compress_events,
+    encode_event,
+    negotiate_encoding,
+    parse_event_id,
+    with_event_ids,
+)
+
+"""Unit tests for the SSE encoder and per-event compression."""
+
+EVENTS = [
+    encode_event("search_queries", {"queries": ["vite build failed"] * 3}),
+    encode_event("streaming_answer_chunk", "Clear the cache. " * 20),
+    encode_event("sources_update", [{"issue_url": "https://github.com/a/b/1"}] * 5),
+]
+
+
+def test_encode_event_is_compact_json_with_or_without_orjson(monkeypatch):
+    """Both serializers produce the same compact, UTF-8 event bytes."""
+    data = {"message": "héllo", "stages": {"total": 1.5}, "items": [1, None]}
+    encoded = encode_event("ready", data)
+    monkeypatch.setattr(sse, "orjson", None)
+
+    assert encode_event("ready", data) == encoded
+    assert encoded.startswith(b'event: ready\ndata: {"message":"h\xc3\xa9llo"')
+    assert encoded.endswith(b"\n\n")
+    assert json.loads(encoded.split(b"data: ")[1]) == data
+
+
+@pytest.mark.anyio
+async def test_event_ids_count_every_item_of_the_stream():
+    """Events get `<stream id>:<position>` ids, comments count but get none."""
+
+    async def events():
+        yield sse.encode_comment(" ")
+        yield encode_event("ready", {})
+        yield encode_event("done", {})
+
+    encoded = [event async for event in with_event_ids(events(), "abc")]
+
+    assert encoded[0] == b": \n\n"
+    assert encoded[1].startswith(b"id: abc:1\nevent: ready\n")
+    assert encoded[2].startswith(b"id: abc:2\nevent: done\n")
+    assert parse_event_id("abc:2") == ("abc", 2)
+    for invalid in (None, "", "abc", ":2", "abc:x"):
+        assert parse_event_id(invalid) is None
+
+
+@pytest.mark.parametrize(
+    "accept_encoding, expected",
+    [
+        (None, None),
+        ("gzip, deflate", "gzip"),
+        ("identity", None),
+        ("gzip;q=0, deflate", None),
+        ("*", sse.supported_encodings()[0]),
+        ("GZIP;q=0.5", "gzip"),
+    ],
+)
+def test_negotiate_encoding(accept_encoding, expected):
+    """The server's preferred coding among those the client accepts."""
+    assert negotiate_encoding(accept_encoding) == expected
+
+
+def test_gzip_chunks_decode_at_every_event_boundary():
+    """Each compressed chunk decodes to exactly its event, without waiting for more."""
+    encoder = GzipEncoder()
+    decoder = zlib.decompressobj(zlib.MAX_WBITS | 16)
+    for event in EVENTS:
+        assert decoder.decompress(encoder.encode(event)) == event
+    decoder.decompress(encoder.finish())
+    assert decoder.eof
+
+
+def test_brotli_chunks_decode_at_every_event_boundary():
+    """Brotli is flushed at every event like gzip."""
+    brotli = pytest.importorskip("brotli")
+    encoder = sse.create_encoder("br")
+    decoder = brotli.Decompressor()
+    for event in EVENTS:
+        assert decoder.process(encoder.encode(event)) == event
+    decoder.process(encoder.finish())
+    assert decoder.is_finished()
+
+
+@pytest.mark.anyio
+async def test_compress_events_closes_the_event_stream():
+    """Closing the compressed stream closes the events it reads from."""
+    closed = False
+
+    async def events():
+        nonlocal closed
+        try:
+            for event in EVENTS:
+                yield event
+        finally:
+            closed = True
+
+    stream = compress_events(events(), "gzip")
+    first = await anext(stream)
+    await stream.aclose()
+
+    assert zlib.decompressobj(zlib.MAX_WBITS | 16).decompress(first) == EVENTS[0]
+    assert closed
+
+
+@pytest.mark.anyio
+async def test_disconnect_cancels_the_event_stream_while_it_waits():
+    """A client disconnect cancels a stream waiting for its next event, and ends the relay."""
+    disconnect = asyncio.Event()
+    cancelled = False
+
+    async def receive():
+        await disconnect.wait()
+        return {"type": "http.disconnect"}
+
+    async def events():
+        nonlocal cancelled
+        yield EVENTS[0]
+        try:
+            await asyncio.Event().wait()
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
+
+    relay = cancel_on_disconnect(events(), Request({"type": "http"}, receive))
+    assert await anext(relay) == EVENTS[0]
+    rest = asyncio.create_task(anext(relay, None))
+    await asyncio.sleep(0)
+    disconnect.set()
+
+    assert await asyncio.wait_for(rest, timeout=1) is None
+    assert cancelled
+    assert not rest.cancelled()
@@ -0,0 +1,145 @@
+import json
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import httpx
+import pytest
+
+from app.core import tracing
+from app.core.metrics import StageTimer
+from app.services.github import stream_issues_with_comments
+
+pytest.importorskip("opentelemetry.sdk")
+
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import (
+    InMemorySpanExporter,
+)
+
+"""Unit tests for the optional OpenTelemetry tracing."""
+
+
+@pytest.fixture
+def spans():
+    exporter = InMemorySpanExporter()
+    tracing.configure_tracing(exporter, batch=False)
+    yield exporter
+    tracing.configure_tracing(None)
+
+
+def _issue(number: int) -> MagicMock:
+    issue = MagicMock(id=number, number=number, title=f"Issue {number}", body="Body")
+    issue.html_url = f"https://github.com/owner/repo/issues/{number}"
+    return issue
+
+
+def test_spans_are_no_ops_until_configured():
+    """Without an exporter, spans accept attributes and nothing is propagated."""
+    headers = {}
+    with tracing.span("search", query="q") as current:
+        current.set_attribute("outcome", "completed")
+        tracing.set_attributes(cache_hit=True)
+        tracing.inject_trace_context(headers)
+
+    assert headers == {}
+    assert tracing.current_context() is None
+
+
+def test_stage_timer_traces_stages_under_the_current_span(spans):
+    """Timed and recorded stages become child spans of the span the timer started in."""
+    with tracing.span("search"):
+        timer = StageTimer()
+    with timer.stage("query_generation"):
+        pass
+    timer.record("issue_search", 0.25)
+
+    finished = {span.name: span for span in spans.get_finished_spans()}
+    root = finished["search"]
+    for name in ("search.query_generation", "search.issue_search"):
+        assert finished[name].parent.span_id == root.context.span_id
+    recorded = finished["search.issue_search"]
+    assert recorded.end_time - recorded.start_time == 250_000_000
+
+
+@pytest.mark.anyio
+async def test_github_calls_in_the_fan_out_are_traced(spans):
+    """Each search and comment call is a span in the search's trace with its attributes."""
+    with patch("app.services.github.gh") as mock_gh:
+        mock_gh.rest.search.async_issues_and_pull_requests = AsyncMock(
+            return_value=MagicMock(
+                parsed_data=MagicMock(items=[_issue(1), _issue(2)]), content=b"{}"
+            )
+        )
+        mock_gh.rest.issues.async_list_comments = AsyncMock(
+            return_value=MagicMock(parsed_data=[], content=b"[]")
+        )
+
+        with tracing.span("search") as root:
+            async for _ in stream_issues_with_comments(
+                repo="owner/repo", queries=["one", "two"]
+            ):
+                pass
+
+    finished = spans.get_finished_spans()
+    assert {span.context.trace_id for span in finished} == {root.context.trace_id}
+
+    queries = [span for span in finished if span.name == "github.issue_query"]
+    assert sorted(span.attributes["query_index"] for span in queries) == [0, 1]
+    searches = [span for span in finished if span.name == "github.search_issues"]
+    assert {span.parent.span_id for span in searches} <= {
+        span.context.span_id for span in queries
+    }
+    assert all(span.attributes["repo"] == "owner/repo" for span in searches)
+    assert all(span.attributes["response_size"] == 2 for span in searches)
+
+    comments = [span for span in finished if span.name == "github.list_comments"]
+    assert sorted(span.attributes["issue_number"] for span in comments) == [1, 2]
+    assert not any(span.attributes["cache_hit"] for span in comments)
+
+
+@pytest.mark.anyio
+async def test_trace_context_is_sent_upstream(spans):
+    """The request hook sends the current span as a W3C traceparent header."""
+    sent = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        sent.append(request.headers.get("traceparent"))
+        return httpx.Response(200)
+
+    async with httpx.AsyncClient(
+        transport=httpx.MockTransport(handler),
+        event_hooks={"request": [tracing.propagate_trace_context]},
+    ) as client:
+        with tracing.span("github.search_issues") as current:
+            await client.get("https://api.github.com/search/issues")
+        await client.get("https://api.github.com/search/issues")
+
+    trace_id = format(current.get_span_context().trace_id, "032x")
+    span_id = format(current.get_span_context().span_id, "016x")
+    assert sent[0].split("-")[1:3] == [trace_id, span_id]
+    assert sent[1] is None
+
+
+def test_failures_handled_inside_a_span_are_recorded(spans):
+    """A caught exception still marks its span as failed."""
+    with tracing.span("github.list_comments") as current:
+        tracing.record_failure(current, RuntimeError("boom"))
+
+    (finished,) = spans.get_finished_spans()
+    assert not finished.status.is_ok
+    assert finished.events[0].name == "exception"
+
+
+def test_file_exporter_appends_json_lines(tmp_path):
+    """The file exporter writes one JSON span per line."""
+    path = tmp_path / "traces.jsonl"
+    tracing.configure_tracing(tracing.create_exporter("file", str(path)))
+    try:
+        with tracing.span("search", query="react hydration"):
+            pass
+    finally:
+        tracing.shutdown_tracing()
+
+    (line,) = path.read_text().splitlines()
+    span = json.loads(line)
+    assert span["name"] == "search"
+    assert span["attributes"] == {"query": "react hydration"}
+    assert span["resource"]["attributes"]["service.name"] == "pinpoint"
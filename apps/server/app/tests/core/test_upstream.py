@@ -0,0 +1,93 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.core.upstream import UpstreamPool, gemini_pool, github_pool
+from app.services.gemini import create_llm
+from app.services.github import create_github_client
+
+"""Tests for the shared upstream connection pools."""
+
+
+@pytest.fixture
+async def upstream():
+    """A keep-alive HTTP/1.1 server counting the connections made to it."""
+    connections = []
+
+    async def serve(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        connections.append(writer)
+        while await reader.readuntil(b"\r\n\r\n"):
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\nok")
+            await writer.drain()
+
+    async def serve_until_closed(reader, writer):
+        try:
+            await serve(reader, writer)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+
+    server = await asyncio.start_server(serve_until_closed, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    yield f"http://127.0.0.1:{port}", connections
+    server.close()
+
+
+@pytest.mark.anyio
+async def test_clients_closing_leave_the_pool_open(upstream):
+    """Short-lived clients over a pool reuse one keep-alive connection."""
+    base_url, connections = upstream
+    pool = UpstreamPool("test", base_url, http2=True)
+
+    for _ in range(3):
+        async with httpx.AsyncClient(transport=pool, base_url=base_url) as client:
+            assert (await client.get("/")).text == "ok"
+
+    assert len(connections) == 1
+    await pool.force_close()
+
+
+@pytest.mark.anyio
+async def test_warm_up_opens_a_connection_ahead_of_the_first_call(upstream):
+    """Warming up leaves a connection for the next call; failing to is tolerated."""
+    base_url, connections = upstream
+    pool = UpstreamPool("test", base_url)
+
+    assert await pool.warm_up(timeout=1)
+    assert len(connections) == 1
+    async with httpx.AsyncClient(transport=pool) as client:
+        await client.get(base_url + "/repos/owner/repo")
+    assert len(connections) == 1
+    await pool.force_close()
+
+    unreachable = UpstreamPool("test", "http://127.0.0.1:1")
+    assert not await unreachable.warm_up(timeout=1)
+
+
+@pytest.mark.anyio
+async def test_pool_counts_requests_until_their_response_is_read(upstream):
+    """A request stays in flight until its body is read or the response closed."""
+    base_url, _ = upstream
+    pool = UpstreamPool("test", base_url)
+
+    async with httpx.AsyncClient(transport=pool, base_url=base_url) as client:
+        async with client.stream("GET", "/") as response:
+            assert pool.in_flight == 1
+            await response.aread()
+        assert pool.in_flight == 0
+        await client.get("/")
+        assert pool.in_flight == 0
+
+    unreachable = UpstreamPool("test", "http://127.0.0.1:1")
+    with pytest.raises(httpx.ConnectError):
+        async with httpx.AsyncClient(transport=unreachable) as client:
+            await client.get("http://127.0.0.1:1/")
+    assert unreachable.in_flight == 0
+    await pool.force_close()
+
+
+def test_upstream_clients_share_the_pools():
+    """The GitHub and Gemini clients send through the process-wide pools."""
+    assert create_github_client().config.async_transport is github_pool
+    llm = create_llm()
+    assert llm.client._api_client._async_httpx_client._transport is gemini_pool
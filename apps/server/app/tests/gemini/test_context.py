@@ -0,0 +1,78 @@
+from app.services.context import estimate_tokens, pack_context
+
+"""Unit tests for the answer prompt context packer."""
+
+
+def _issue(number: int, body: str = "Body", comments: int = 0) -> dict:
+    return {
+        "issue_number": number,
+        "title": f"Issue {number}",
+        "issue_url": f"https://github.com/owner/repo/issues/{number}",
+        "body": body,
+        "comments": [
+            {
+                "body": f"Comment {n} on {number}",
+                "username": "user",
+                "comment_url": f"https://github.com/owner/repo/issues/{number}#c{n}",
+            }
+            for n in range(1, comments + 1)
+        ],
+    }
+
+
+def test_pack_context_uses_compact_numbered_format():
+    """Issues and comments are numbered, with their URLs, and without Python reprs."""
+    context = pack_context(
+        [_issue(42, comments=1)], token_budget=1000, max_item_tokens=100
+    )
+
+    assert context == (
+        "## 1. #42 Issue 42 <https://github.com/owner/repo/issues/42>\n"
+        "Body\n\n"
+        "### 1.1 @user <https://github.com/owner/repo/issues/42#c1>\n"
+        "Comment 1 on 42"
+    )
+
+
+def test_pack_context_truncates_long_bodies():
+    """Issue bodies longer than the per-item cap are cut on a word boundary."""
+    context = pack_context(
+        [_issue(1, body="word " * 500)], token_budget=1000, max_item_tokens=50
+    )
+
+    assert context.endswith("…[truncated]")
+    assert estimate_tokens(context) < 70
+
+
+def test_pack_context_prefers_issues_then_top_comments():
+    """Within the budget, every issue is kept before any issue's second comment."""
+    issues = [_issue(1, comments=3), _issue(2, comments=3)]
+    # Room for both issues and one round of comments, but not a second round
+    budget = sum(
+        estimate_tokens(block)
+        for block in [
+            "## 1. #1 Issue 1 <https://github.com/owner/repo/issues/1>\nBody",
+            "## 2. #2 Issue 2 <https://github.com/owner/repo/issues/2>\nBody",
+            "### 1.1 @user <https://github.com/owner/repo/issues/1#c1>\nComment 1 on 1",
+            "### 2.1 @user <https://github.com/owner/repo/issues/2#c1>\nComment 1 on 2",
+        ]
+    )
+
+    context = pack_context(issues, token_budget=budget, max_item_tokens=100)
+
+    assert "Comment 1 on 1" in context
+    assert "Comment 1 on 2" in context
+    assert "Comment 2 on 1" not in context
+    assert context.index("## 2.") > context.index("Comment 1 on 1")
+    assert estimate_tokens(context) <= budget + 10
+
+
+def test_pack_context_stays_within_budget():
+    """Packing stops adding material once the token budget is used up."""
+    issues = [_issue(n, body="text " * 100, comments=5) for n in range(1, 21)]
+
+    context = pack_context(issues, token_budget=500, max_item_tokens=200)
+
+    assert 0 < estimate_tokens(context) <= 500 + 20
+    assert "## 1." in context
+    assert "## 20." not in context
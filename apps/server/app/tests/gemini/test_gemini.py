@@ -1,9 +1,25 @@
+import asyncio
 from unittest.mock import AsyncMock, MagicMock
 
 import pytest
 from fastapi import Request
 
-from app.services.gemini import generate_issue_queries, generate_streaming_answer
+from app.core.config import settings
+from app.core.metrics import StageTimer, upstream_duration
+from app.models import (
+    CitationSource,
+    IssueQueryBatch,
+    IssueQueryResult,
+    SearchResponse,
+)
+from app.services.admission import stage_limits
+from app.services.gemini import (
+    canonicalize_query,
+    generate_issue_queries,
+    generate_streaming_answer,
+    plan_issue_queries,
+    query_plan_cache,
+)
 
 """Unit tests for Gemini service functions."""
 
@@ -41,6 +57,19 @@ async def test_generate_issue_queries_success():
     mock_llm.messages.create.assert_called_once()
 
 
+def mock_partial_stream(deltas: list[str], sources: list[CitationSource] | None = None):
+    """Mimic instructor's create_partial: each partial carries the answer so far."""
+
+    async def stream():
+        answer = ""
+        for delta in deltas:
+            answer += delta
+            yield SearchResponse.model_construct(answer=answer, sources=None)
+        yield SearchResponse.model_construct(answer=answer, sources=sources or [])
+
+    return stream()
+
+
 @pytest.mark.anyio
 async def test_generate_streaming_answer_success():
     """Test successful streaming answer generation."""
@@ -48,16 +77,24 @@ async def test_generate_streaming_answer_success():
     mock_llm = AsyncMock()
     mock_request.state.llm = mock_llm
 
-    # Mock streaming response
-    async def mock_stream():
-        yield "To make a table header fixed and the body scrollable, "
-        yield "you can utilize CSS positioning and a scrollable container. "
-        yield "Here are approaches based on the provided information:\n\n"
-        yield "## Solution 1: Using `ScrollArea` and `sticky` positioning\n\n"
-        yield "This method involves wrapping your `Table` component with `ScrollArea` "
-        yield "and applying `sticky top-0` to the `TableHeader`."
-
-    mock_llm.messages.create.return_value = mock_stream()
+    deltas = [
+        "To make a table header fixed and the body scrollable, ",
+        "you can utilize CSS positioning and a scrollable container. ",
+        "Here are approaches based on the provided information:\n\n",
+        "## Solution 1: Using `ScrollArea` and `sticky` positioning\n\n",
+        "This method involves wrapping your `Table` component with `ScrollArea` ",
+        "and applying `sticky top-0` to the `TableHeader`.",
+    ]
+    source = CitationSource(
+        id="1",
+        type="comment",
+        title="Table header not sticky in ScrollArea",
+        url="https://github.com/shadcn-ui/ui/issues/1234#issuecomment-1",
+        issue_number=1234,
+    )
+    mock_llm.messages.create_partial = MagicMock(
+        return_value=mock_partial_stream(deltas, [source])
+    )
 
     mock_issues = [
         {
@@ -80,10 +117,84 @@ async def test_generate_streaming_answer_success():
     ):
         chunks.append(chunk)
 
-    assert len(chunks) == 6
-    assert "ScrollArea" in "".join(chunks)
-    assert "sticky" in "".join(chunks)
-    mock_llm.messages.create.assert_called_once()
+    answer_chunks = [chunk["data"] for chunk in chunks if chunk["type"] == "answer"]
+    assert answer_chunks == deltas
+    assert "ScrollArea" in "".join(answer_chunks)
+    assert "sticky" in "".join(answer_chunks)
+    assert chunks[-1] == {"type": "sources", "data": [source.model_dump()]}
+    mock_llm.messages.create_partial.assert_called_once()
+
+
+@pytest.mark.anyio
+async def test_answer_latency_excludes_the_wait_for_an_llm_slot():
+    """First-chunk latency and the LLM stages are measured once the slot is held."""
+    mock_request = MagicMock(spec=Request)
+    mock_llm = AsyncMock()
+    mock_request.state.llm = mock_llm
+    mock_llm.messages.create_partial = MagicMock(
+        return_value=mock_partial_stream(["Clear the cache."])
+    )
+
+    def total_seconds() -> float:
+        _, total = upstream_duration.values.get(("gemini", "answer"), ([], 0.0))
+        return total
+
+    before = total_seconds()
+    limiter = stage_limits["llm"]
+    for _ in range(limiter.limit):
+        await limiter._semaphore.acquire()
+
+    timer = StageTimer()
+
+    async def answer() -> list[dict]:
+        return [
+            chunk
+            async for chunk in generate_streaming_answer(
+                request=mock_request,
+                user_query="cache",
+                issues_with_comments=[],
+                timer=timer,
+            )
+        ]
+
+    pending = asyncio.create_task(answer())
+    await asyncio.sleep(0.2)
+    assert limiter.waiting == 1
+    for _ in range(limiter.limit):
+        limiter._semaphore.release()
+    await asyncio.wait_for(pending, timeout=1)
+
+    assert total_seconds() - before < 0.1
+    assert timer.durations["llm_first_token"] < 0.1
+    assert timer.durations["llm_completion"] < 0.1
+
+
+@pytest.mark.anyio
+async def test_query_generation_excludes_the_wait_for_an_llm_slot():
+    """The query_generation stage starts once the stage slot is held."""
+    mock_request = MagicMock(spec=Request)
+    mock_llm = AsyncMock()
+    mock_request.state.llm = mock_llm
+    mock_llm.messages.create.return_value = IssueQueryResult(
+        technology="vite", queries=["vite build failed"], confidence=0.9
+    )
+    timer = StageTimer()
+
+    limiter = stage_limits["llm"]
+    for _ in range(limiter.limit):
+        await limiter._semaphore.acquire()
+    pending = asyncio.create_task(
+        generate_issue_queries(
+            request=mock_request, user_query="vite build failed", timer=timer
+        )
+    )
+    await asyncio.sleep(0.2)
+    assert limiter.waiting == 1
+    for _ in range(limiter.limit):
+        limiter._semaphore.release()
+    await asyncio.wait_for(pending, timeout=1)
+
+    assert timer.durations["query_generation"] < 0.1
 
 
 @pytest.mark.anyio
@@ -149,14 +260,17 @@ async def test_generate_streaming_answer_with_code_examples():
     mock_llm = AsyncMock()
     mock_request.state.llm = mock_llm
 
-    async def mock_stream_with_code():
-        yield "```tsx\n"
-        yield '<TableHeader className="sticky top-0 bg-secondary">\n'
-        yield "  {/* Table header content */}\n"
-        yield "</TableHeader>\n"
-        yield "```"
-
-    mock_llm.messages.create.return_value = mock_stream_with_code()
+    mock_llm.messages.create_partial = MagicMock(
+        return_value=mock_partial_stream(
+            [
+                "```tsx\n",
+                '<TableHeader className="sticky top-0 bg-secondary">\n',
+                "  {/* Table header content */}\n",
+                "</TableHeader>\n",
+                "```",
+            ]
+        )
+    )
 
     mock_issues = [
         {
@@ -174,7 +288,122 @@ async def test_generate_streaming_answer_with_code_examples():
     ):
         chunks.append(chunk)
 
-    full_response = "".join(chunks)
+    full_response = "".join(chunk["data"] for chunk in chunks)
     assert "```tsx" in full_response
     assert "TableHeader" in full_response
     assert "sticky top-0" in full_response
+    # No sources were cited, so none are sent
+    assert all(chunk["type"] == "answer" for chunk in chunks)
+
+
+def test_canonicalize_query_ignores_trivial_rephrasing():
+    """Case, whitespace, punctuation and stop words do not change the key."""
+    assert canonicalize_query("How do I fix the Next.js build?!") == canonicalize_query(
+        "fix   next.js BUILD"
+    )
+    assert canonicalize_query("C++ template error") == "c++ template error"
+    assert canonicalize_query("how do i") == "how do i"
+
+
+@pytest.mark.anyio
+async def test_generate_issue_queries_memoizes_plans():
+    """Rephrased queries reuse the cached plan instead of calling Gemini again."""
+    mock_request = MagicMock(spec=Request)
+    mock_llm = AsyncMock()
+    mock_request.state.llm = mock_llm
+    mock_llm.messages.create.return_value = IssueQueryResult(
+        technology="vite", queries=["vite build failed"], confidence=0.9
+    )
+
+    first = await generate_issue_queries(
+        request=mock_request, user_query="Vite build failed after upgrading"
+    )
+    second = await generate_issue_queries(
+        request=mock_request, user_query="vite build FAILED after upgrading!"
+    )
+
+    assert first == second
+    mock_llm.messages.create.assert_called_once()
+    assert query_plan_cache.hits == 1
+    assert query_plan_cache.misses == 1
+
+
+@pytest.mark.anyio
+async def test_generate_issue_queries_remembers_irrelevant_verdicts():
+    """Junk queries are rejected from the cache on repeat."""
+    mock_request = MagicMock(spec=Request)
+    mock_llm = AsyncMock()
+    mock_request.state.llm = mock_llm
+    mock_llm.messages.create.return_value = IssueQueryResult(
+        technology="irrelevant", queries=["irrelevant"], confidence=1.0
+    )
+
+    for _ in range(2):
+        result = await generate_issue_queries(
+            request=mock_request, user_query="best pizza in nyc right now"
+        )
+        assert result.technology == "irrelevant"
+
+    mock_llm.messages.create.assert_called_once()
+
+
+@pytest.mark.anyio
+async def test_plan_issue_queries_plans_many_queries_per_call(monkeypatch):
+    """Batched queries are planned together, and the searches then hit the cache."""
+    monkeypatch.setattr(settings, "BATCH_QUERY_PLAN_GROUP_SIZE", 2)
+    mock_request = MagicMock(spec=Request)
+    mock_llm = AsyncMock()
+    mock_request.state.llm = mock_llm
+
+    def plans(*, messages, response_model):
+        lines = messages[-1]["content"].splitlines()[1:]
+        return IssueQueryBatch(
+            results=[
+                IssueQueryResult(
+                    technology="vite", queries=[line.split(". ", 1)[1]], confidence=0.9
+                )
+                for line in lines
+            ]
+        )
+
+    mock_llm.messages.create.side_effect = plans
+    user_queries = [
+        "vite build failed after upgrading",
+        "Vite build failed after upgrading!",
+        "vite dev server keeps reloading",
+        "vite env variables are undefined",
+    ]
+
+    calls = await plan_issue_queries(request=mock_request, user_queries=user_queries)
+
+    # Three distinct queries in groups of two
+    assert calls == mock_llm.messages.create.call_count == 2
+    result = await generate_issue_queries(
+        request=mock_request, user_query="vite dev server keeps reloading"
+    )
+    assert result.queries == ["vite dev server keeps reloading"]
+    assert mock_llm.messages.create.call_count == 2
+    assert (
+        await plan_issue_queries(request=mock_request, user_queries=user_queries) == 0
+    )
+
+
+@pytest.mark.anyio
+async def test_plan_issue_queries_drops_results_it_cannot_match():
+    """A reply with the wrong number of plans leaves the queries to be planned alone."""
+    mock_request = MagicMock(spec=Request)
+    mock_llm = AsyncMock()
+    mock_request.state.llm = mock_llm
+    mock_llm.messages.create.return_value = IssueQueryBatch(
+        results=[IssueQueryResult(technology="vite", queries=["build"], confidence=0.9)]
+    )
+
+    await plan_issue_queries(
+        request=mock_request,
+        user_queries=["vite build failed after upgrading", "vite dev server reloads"],
+    )
+
+    assert (
+        await query_plan_cache.get(canonicalize_query("vite dev server reloads"))
+        is None
+    )
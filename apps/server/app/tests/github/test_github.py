@@ -1,62 +1,42 @@
+import asyncio
 from unittest.mock import AsyncMock, MagicMock, patch
 
+import httpx
 import pytest
+from fastapi import HTTPException
+from githubkit.exception import RequestFailed
 
-from app.services.github import get_issues_with_comments, get_repository, search_issues
+from app.core.config import settings
+from app.core.metrics import StageTimer, upstream_duration, upstream_requests
+from app.exceptions.github_exceptions import RateLimitBudgetExhausted
+from app.services.github import (
+    ConditionalCacheStrategy,
+    _fetch_comments_batch,
+    create_github_client,
+    get_repository,
+    http_cache_stats,
+    stream_issues_with_comments,
+)
 
 """Unit tests for GitHub service functions."""
 
 
-@pytest.mark.anyio
-async def test_search_issues_success():
-    """Test successful issue search."""
-    # Create mock IssueSearchResultItem-like objects with attributes
-    mock_issue = MagicMock()
-    mock_issue.id = 1
-    mock_issue.number = 123
-    mock_issue.title = "Test issue"
-    mock_issue.html_url = "https://github.com/owner/repo/issues/123"
-    mock_issue.body = "Test body"
-    mock_issue.state = "open"
-
-    with patch("app.services.github.gh") as mock_gh:
-        mock_gh.rest.search.async_issues_and_pull_requests = AsyncMock(
-            return_value=MagicMock(parsed_data=MagicMock(items=[mock_issue]))
-        )
+def _issue(number: int) -> MagicMock:
+    issue = MagicMock(id=number, number=number, title=f"Issue {number}", body="Body")
+    issue.html_url = f"https://github.com/owner/repo/issues/{number}"
+    return issue
 
-        result = await search_issues(repo="owner/repo", queries=["test query"])
 
-        assert len(result) == 1
-        assert result[0].number == 123
-        assert result[0].title == "Test issue"
+def _comment(body: str) -> MagicMock:
+    comment = MagicMock(body=body, user=MagicMock(login="user"))
+    comment.html_url = "https://github.com/owner/repo/issues/1#issuecomment-1"
+    comment.reactions = MagicMock(total_count=0)
+    return comment
 
 
 @pytest.mark.anyio
-async def test_search_issues_empty_result():
-    """Test search with no results."""
-    with patch("app.services.github.gh") as mock_gh:
-        mock_gh.rest.search.async_issues_and_pull_requests = AsyncMock(
-            return_value=MagicMock(parsed_data=MagicMock(items=[]))
-        )
-
-        result = await search_issues(repo="owner/repo", queries=["nonexistent query"])
-
-        assert result == []
-
-
-@pytest.mark.anyio
-async def test_get_issues_with_comments():
-    """Test fetching issues with comments."""
-    # Create mock IssueSearchResultItem-like input
-    mock_issue = MagicMock()
-    mock_issue.id = 1
-    mock_issue.number = 123
-    mock_issue.title = "Test issue"
-    mock_issue.html_url = "https://github.com/owner/repo/issues/123"
-    mock_issue.body = "Issue body"
-    issues = [mock_issue]
-
-    # Create mock comment objects with expected attributes
+async def test_stream_issues_with_comments_success():
+    """Found issues come back with their comments."""
     mock_comment = MagicMock()
     mock_comment.body = "Test comment"
     mock_comment.user = MagicMock(login="testuser")
@@ -64,17 +44,47 @@ async def test_get_issues_with_comments():
     mock_comment.reactions = MagicMock(total_count=5)
 
     with patch("app.services.github.gh") as mock_gh:
+        mock_gh.rest.search.async_issues_and_pull_requests = AsyncMock(
+            return_value=MagicMock(parsed_data=MagicMock(items=[_issue(123)]))
+        )
         mock_gh.rest.issues.async_list_comments = AsyncMock(
             return_value=MagicMock(parsed_data=[mock_comment])
         )
 
-        result = await get_issues_with_comments(repo="owner/repo", issues=issues)
+        payloads = [
+            payload
+            async for payload in stream_issues_with_comments(
+                repo="owner/repo", queries=["test query"]
+            )
+        ]
+
+    result = payloads[-1]["data"]
+    assert len(result) == 1
+    assert result[0]["issue_number"] == 123
+    assert result[0]["title"] == "Issue 123"
+    assert len(result[0]["comments"]) == 1
+    assert result[0]["comments"][0]["body"] == "Test comment"
+    assert result[0]["comments"][0]["username"] == "testuser"
+
+
+@pytest.mark.anyio
+async def test_stream_issues_with_comments_empty_result():
+    """A search with no results fetches no comments and ends with an empty result."""
+    with patch("app.services.github.gh") as mock_gh:
+        mock_gh.rest.search.async_issues_and_pull_requests = AsyncMock(
+            return_value=MagicMock(parsed_data=MagicMock(items=[]))
+        )
+        mock_gh.rest.issues.async_list_comments = AsyncMock()
+
+        payloads = [
+            payload
+            async for payload in stream_issues_with_comments(
+                repo="owner/repo", queries=["nonexistent query"]
+            )
+        ]
 
-        assert len(result) == 1
-        assert result[0]["issue_number"] == 123
-        assert len(result[0]["comments"]) == 1
-        assert result[0]["comments"][0]["body"] == "Test comment"
-        assert result[0]["comments"][0]["username"] == "testuser"
+    mock_gh.rest.issues.async_list_comments.assert_not_called()
+    assert payloads[-1]["data"] == []
 
 
 @pytest.mark.anyio
@@ -102,3 +112,288 @@ async def test_get_repository_no_results():
         result = await get_repository(technology="nonexistent")
 
         assert result is None
+
+
+@pytest.mark.anyio
+async def test_github_client_revalidates_with_etag(tmp_path):
+    """Repeated calls are revalidated with If-None-Match and served from a 304."""
+    seen_etags = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen_etags.append(request.headers.get("If-None-Match"))
+        if request.headers.get("If-None-Match") == '"v1"':
+            return httpx.Response(304, headers={"ETag": '"v1"'})
+        return httpx.Response(
+            200,
+            json={"id": 1, "full_name": "owner/repo"},
+            headers={"ETag": '"v1"', "Cache-Control": "private, max-age=60"},
+        )
+
+    client = create_github_client(
+        async_transport=httpx.MockTransport(handler),
+        cache_strategy=ConditionalCacheStrategy(path=str(tmp_path / "http.db")),
+    )
+    http_cache_stats.clear()
+
+    first = await client.arequest("GET", "/repos/owner/repo")
+    second = await client.arequest("GET", "/repos/owner/repo")
+
+    assert seen_etags == [None, '"v1"']
+    assert first.json() == second.json() == {"id": 1, "full_name": "owner/repo"}
+    assert http_cache_stats == {"miss": 1, "revalidated": 1}
+
+
+@pytest.mark.anyio
+async def test_github_client_records_upstream_calls(tmp_path):
+    """Every GitHub response is counted by operation and outcome, and timed."""
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path.startswith("/repos/owner/missing"):
+            return httpx.Response(404, json={"message": "Not Found"})
+        if request.headers.get("If-None-Match") == '"v1"':
+            return httpx.Response(304, headers={"ETag": '"v1"'})
+        return httpx.Response(
+            200,
+            json=[],
+            headers={"ETag": '"v1"', "Cache-Control": "private, max-age=60"},
+        )
+
+    client = create_github_client(
+        async_transport=httpx.MockTransport(handler),
+        cache_strategy=ConditionalCacheStrategy(path=str(tmp_path / "http.db")),
+    )
+
+    def count(operation: str, outcome: str) -> float:
+        return upstream_requests.get(
+            upstream="github", operation=operation, outcome=outcome
+        )
+
+    before = {
+        "ok": count("list_comments", "ok"),
+        "not_modified": count("list_comments", "not_modified"),
+        "client_error": count("get_repository", "client_error"),
+        "timed": upstream_duration.count(upstream="github", operation="list_comments"),
+    }
+
+    path = "/repos/owner/repo/issues/1/comments"
+    await client.arequest("GET", path)
+    await client.arequest("GET", path)
+    with pytest.raises(RequestFailed):
+        await client.arequest("GET", "/repos/owner/missing")
+
+    assert count("list_comments", "ok") == before["ok"] + 1
+    assert count("list_comments", "not_modified") == before["not_modified"] + 1
+    assert count("get_repository", "client_error") == before["client_error"] + 1
+    assert (
+        upstream_duration.count(upstream="github", operation="list_comments")
+        == before["timed"] + 2
+    )
+
+
+@pytest.mark.anyio
+async def test_stream_issues_with_comments_does_not_wait_for_slow_queries():
+    """Comments for a fast query's issues are fetched while a slow query is running."""
+    slow_query_done = asyncio.Event()
+    comment_fetched_early = asyncio.Event()
+
+    async def search(*, q, **kwargs):
+        if "slow" in q:
+            await asyncio.wait_for(comment_fetched_early.wait(), timeout=1)
+            slow_query_done.set()
+            return MagicMock(parsed_data=MagicMock(items=[_issue(2)]))
+        return MagicMock(parsed_data=MagicMock(items=[_issue(1)]))
+
+    async def list_comments(*, issue_number, **kwargs):
+        if not slow_query_done.is_set():
+            comment_fetched_early.set()
+        return MagicMock(parsed_data=[_comment(f"Comment on {issue_number}")])
+
+    with patch("app.services.github.gh") as mock_gh:
+        mock_gh.rest.search.async_issues_and_pull_requests = search
+        mock_gh.rest.issues.async_list_comments = list_comments
+
+        payloads = [
+            payload
+            async for payload in stream_issues_with_comments(
+                repo="owner/repo", queries=["fast", "slow"]
+            )
+        ]
+
+    assert comment_fetched_early.is_set()
+    kinds = [payload["type"] for payload in payloads]
+    assert kinds.count("issues") == 2
+    assert kinds[-1] == "result"
+    assert [issue["issue_number"] for issue in payloads[-1]["data"]] == [1, 2]
+
+
+@pytest.mark.anyio
+async def test_stream_issues_with_comments_respects_budget_and_dedup():
+    """Duplicate issues are fetched once and only the budgeted number get comments."""
+    timer = StageTimer()
+    with patch("app.services.github.gh") as mock_gh:
+        mock_gh.rest.search.async_issues_and_pull_requests = AsyncMock(
+            return_value=MagicMock(
+                parsed_data=MagicMock(items=[_issue(n) for n in range(1, 6)])
+            )
+        )
+        mock_gh.rest.issues.async_list_comments = AsyncMock(
+            return_value=MagicMock(parsed_data=[_comment("a"), _comment("b")])
+        )
+
+        payloads = [
+            payload
+            async for payload in stream_issues_with_comments(
+                repo="owner/repo",
+                queries=["one", "two"],
+                max_comments_per_issue=2,
+                max_total_comments=6,
+                timer=timer,
+            )
+        ]
+
+    assert mock_gh.rest.issues.async_list_comments.call_count == 3
+    assert [p["data"] for p in payloads if p["type"] == "issues"][-1] == 5
+    assert [p["data"] for p in payloads if p["type"] == "comments"][-1] == 6
+    assert len(payloads[-1]["data"]) == 3
+    assert set(timer.durations) == {"issue_search", "comment_fetch"}
+
+
+@pytest.mark.anyio
+async def test_stream_issues_with_comments_reports_failed_fetches():
+    """A failed comment fetch leaves its issue out and marks the result incomplete."""
+
+    async def list_comments(*, issue_number, **kwargs):
+        if issue_number == 2:
+            raise RuntimeError("connection reset")
+        return MagicMock(parsed_data=[_comment("a")])
+
+    with patch("app.services.github.gh") as mock_gh:
+        mock_gh.rest.search.async_issues_and_pull_requests = AsyncMock(
+            return_value=MagicMock(parsed_data=MagicMock(items=[_issue(1), _issue(2)]))
+        )
+        mock_gh.rest.issues.async_list_comments = list_comments
+
+        payloads = [
+            payload
+            async for payload in stream_issues_with_comments(
+                repo="owner/repo", queries=["one"]
+            )
+        ]
+
+    assert [issue["issue_number"] for issue in payloads[-1]["data"]] == [1]
+    assert payloads[-1]["complete"] is False
+
+
+@pytest.mark.anyio
+async def test_stream_issues_with_comments_fails_when_the_budget_runs_out():
+    """Running out of rate-limit budget is a 429, not an empty result."""
+    with patch("app.services.github.gh") as mock_gh:
+        mock_gh.rest.search.async_issues_and_pull_requests = AsyncMock(
+            side_effect=RateLimitBudgetExhausted(retry_after=30)
+        )
+
+        with pytest.raises(HTTPException) as excinfo:
+            async for _ in stream_issues_with_comments(
+                repo="owner/repo", queries=["one", "two"]
+            ):
+                pass
+
+    assert excinfo.value.status_code == 429
+    assert excinfo.value.headers["Retry-After"] == "30"
+
+
+def _graphql_issue(*reactions: int) -> dict:
+    return {
+        "comments": {
+            "nodes": [
+                {
+                    "body": f"Comment with {count} reactions",
+                    "url": f"https://github.com/owner/repo/issues/1#issuecomment-{count}",
+                    "author": {"login": "user"},
+                    "reactions": {"totalCount": count},
+                }
+                for count in reactions
+            ]
+        }
+    }
+
+
+@pytest.mark.anyio
+async def test_fetch_comments_batch_graphql_batches_issues(monkeypatch):
+    """The GraphQL backend fetches every issue's comments in one request."""
+    monkeypatch.setattr(settings, "GITHUB_COMMENTS_BACKEND", "graphql")
+
+    with patch("app.services.github.gh") as mock_gh:
+        mock_gh.async_graphql = AsyncMock(
+            return_value={
+                "repository": {"i1": _graphql_issue(1, 7, 3), "i2": _graphql_issue()}
+            }
+        )
+        mock_gh.rest.issues.async_list_comments = AsyncMock()
+
+        comments = await _fetch_comments_batch("owner/repo", [1, 2])
+
+    mock_gh.async_graphql.assert_called_once()
+    mock_gh.rest.issues.async_list_comments.assert_not_called()
+    assert list(comments) == [1, 2]
+    assert [(reactions, c["body"]) for reactions, c in comments[1]] == [
+        (1, "Comment with 1 reactions"),
+        (7, "Comment with 7 reactions"),
+        (3, "Comment with 3 reactions"),
+    ]
+    assert comments[2] == []
+
+
+@pytest.mark.anyio
+async def test_fetch_comments_batch_graphql_falls_back_to_rest(monkeypatch):
+    """Issues GraphQL could not return are fetched over REST."""
+    monkeypatch.setattr(settings, "GITHUB_COMMENTS_BACKEND", "graphql")
+
+    with patch("app.services.github.gh") as mock_gh:
+        mock_gh.async_graphql = AsyncMock(
+            return_value={"repository": {"i1": _graphql_issue(1), "i2": None}}
+        )
+        mock_gh.rest.issues.async_list_comments = AsyncMock(
+            return_value=MagicMock(parsed_data=[_comment("From REST")])
+        )
+
+        comments = await _fetch_comments_batch("owner/repo", [1, 2])
+
+    mock_gh.rest.issues.async_list_comments.assert_called_once()
+    assert comments[2][0][1]["body"] == "From REST"
+
+
+@pytest.mark.anyio
+async def test_concurrent_identical_calls_share_one_request():
+    """Concurrent searches for the same query and issue make one GitHub call each."""
+    release = asyncio.Event()
+
+    async def search(**kwargs):
+        await release.wait()
+        return MagicMock(parsed_data=MagicMock(items=[_issue(1)]))
+
+    async def list_comments(**kwargs):
+        return MagicMock(parsed_data=[_comment("Comment")])
+
+    with patch("app.services.github.gh") as mock_gh:
+        mock_gh.rest.search.async_issues_and_pull_requests = AsyncMock(
+            side_effect=search
+        )
+        mock_gh.rest.issues.async_list_comments = AsyncMock(side_effect=list_comments)
+
+        async def collect():
+            return [
+                payload
+                async for payload in stream_issues_with_comments(
+                    repo="owner/repo", queries=["same query"]
+                )
+            ]
+
+        tasks = [asyncio.create_task(collect()) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        release.set()
+        results = await asyncio.gather(*tasks)
+
+    assert mock_gh.rest.search.async_issues_and_pull_requests.call_count == 1
+    assert mock_gh.rest.issues.async_list_comments.call_count == 1
+    assert results[0] == results[1] == results[2]
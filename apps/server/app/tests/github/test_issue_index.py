@@ -0,0 +1,162 @@
+from datetime import UTC, datetime
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.services.github import stream_issues_with_comments, sync_issue_index
+from app.services.issue_index import IndexedIssue, IssueIndex
+
+"""Unit tests for the local issue index."""
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _indexed(number: int, title: str, body: str = "") -> IndexedIssue:
+    return IndexedIssue(
+        id=number * 10,
+        number=number,
+        title=title,
+        body=body,
+        html_url=f"https://github.com/owner/repo/issues/{number}",
+        state="closed",
+        reaction_count=number,
+        updated_at=datetime(2025, 1, number, tzinfo=UTC),
+    )
+
+
+def _comment(body: str, reactions: int = 0) -> tuple[int, dict]:
+    return reactions, {
+        "body": body,
+        "username": "user",
+        "comment_url": f"https://github.com/owner/repo/issues/1#{body}",
+    }
+
+
+@pytest.fixture
+async def index(tmp_path, monkeypatch):
+    index = IssueIndex(path=str(tmp_path / "issues.db"), max_age=60, clock=FakeClock())
+    monkeypatch.setattr("app.services.github.issue_index", index)
+    yield index
+    await index.close()
+
+
+@pytest.mark.anyio
+async def test_issue_index_full_text_search(index):
+    """Search matches titles and bodies, ranks title matches first and is per repo."""
+    await index.store("owner/repo", _indexed(1, "Docs typo"), [])
+    await index.store(
+        "owner/repo", _indexed(2, "Crash on start", "esbuild error in next.js"), []
+    )
+    await index.store("owner/repo", _indexed(3, "esbuild error during build"), [])
+    await index.store("other/repo", _indexed(4, "esbuild error"), [])
+
+    results = await index.search("Owner/Repo", "how do I fix the esbuild error?")
+
+    assert [issue.number for issue in results] == [3, 2]
+    assert (await index.search("owner/repo", "next.js"))[0].number == 2
+
+
+@pytest.mark.anyio
+async def test_issue_index_comments_and_freshness(index):
+    """Stored comments come back per issue; the repo is fresh only after a sync."""
+    await index.store("owner/repo", _indexed(1, "Title"), [_comment("fix", 3)])
+    await index.store("owner/repo", _indexed(2, "Title"), [])
+
+    assert not await index.is_fresh("owner/repo")
+    await index.mark_synced("owner/repo")
+    assert await index.is_fresh("owner/repo")
+
+    assert await index.comments("owner/repo", [1, 2, 99]) == {
+        1: [_comment("fix", 3)],
+        2: [],
+    }
+
+    index._clock.now += 61
+    assert not await index.is_fresh("owner/repo")
+
+
+def _api_issue(number: int, *, comments: int = 1, pull_request=None) -> MagicMock:
+    issue = MagicMock(
+        id=number,
+        number=number,
+        title=f"Vite build error {number}",
+        body="Body",
+        state="open",
+        comments=comments,
+        pull_request=pull_request,
+        updated_at=datetime(2025, 2, number, tzinfo=UTC),
+    )
+    issue.html_url = f"https://github.com/owner/repo/issues/{number}"
+    issue.reactions = MagicMock(total_count=0)
+    return issue
+
+
+def _paginate(items):
+    async def pages():
+        for item in items:
+            yield item
+
+    return MagicMock(side_effect=lambda *args, **kwargs: pages())
+
+
+@pytest.mark.anyio
+async def test_sync_issue_index_is_incremental(index):
+    """Syncs skip pull requests and resume from the last synced update time."""
+    comment = MagicMock(body="Clear the cache", user=MagicMock(login="user"))
+    comment.html_url = "https://github.com/owner/repo/issues/1#issuecomment-1"
+    comment.reactions = MagicMock(total_count=2)
+
+    with patch("app.services.github.gh") as mock_gh:
+        mock_gh.rest.paginate = _paginate(
+            [
+                _api_issue(1),
+                _api_issue(2, pull_request=MagicMock()),
+                _api_issue(3, comments=0),
+            ]
+        )
+        mock_gh.rest.issues.async_list_comments = AsyncMock(
+            return_value=MagicMock(parsed_data=[comment])
+        )
+
+        assert await sync_issue_index(repo="owner/repo") == 2
+        assert "since" not in mock_gh.rest.paginate.call_args.kwargs
+        # Only issue 1 has comments to fetch
+        assert mock_gh.rest.issues.async_list_comments.call_count == 1
+
+        mock_gh.rest.paginate = _paginate([])
+        assert await sync_issue_index(repo="owner/repo") == 0
+        assert mock_gh.rest.paginate.call_args.kwargs["since"] == datetime(
+            2025, 2, 3, tzinfo=UTC
+        )
+
+    assert await index.is_fresh("owner/repo")
+    comments = await index.comments("owner/repo", [1])
+    assert comments[1][0][1]["body"] == "Clear the cache"
+
+
+@pytest.mark.anyio
+async def test_stream_issues_with_comments_served_from_fresh_index(index):
+    """A freshly indexed repo is answered without calling the GitHub API."""
+    await index.store(
+        "owner/repo", _indexed(1, "Vite build error"), [_comment("fix", 1)]
+    )
+    await index.mark_synced("owner/repo")
+
+    with patch("app.services.github.gh") as mock_gh:
+        payloads = [
+            payload
+            async for payload in stream_issues_with_comments(
+                repo="owner/repo", queries=["vite build error"]
+            )
+        ]
+
+    assert not mock_gh.mock_calls
+    result = payloads[-1]["data"]
+    assert result[0]["issue_number"] == 1
+    assert result[0]["comments"] == [_comment("fix", 1)[1]]
@@ -0,0 +1,101 @@
+from datetime import UTC, datetime, timedelta
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.services.github import stream_issues_with_comments
+from app.services.ranking import bm25_scores, rank_issues
+
+"""Unit tests for local reranking of candidate issues."""
+
+NOW = datetime(2025, 1, 1, tzinfo=UTC)
+
+
+def _issue(
+    number: int,
+    title: str,
+    body: str = "",
+    *,
+    reactions: int = 0,
+    state: str = "open",
+    updated_at: datetime = NOW,
+) -> MagicMock:
+    issue = MagicMock(id=number, number=number, title=title, body=body, state=state)
+    issue.html_url = f"https://github.com/owner/repo/issues/{number}"
+    issue.reactions = MagicMock(total_count=reactions)
+    issue.updated_at = updated_at
+    return issue
+
+
+def test_bm25_scores_favor_matching_documents():
+    """Documents sharing rare query terms score above unrelated ones."""
+    scores = bm25_scores(
+        ["vite build fails with esbuild error"],
+        [
+            "Dev server port already in use",
+            "Build fails: esbuild error on vite 5",
+            "Docs typo",
+        ],
+    )
+
+    assert scores[1] > scores[0]
+    assert scores[1] > scores[2]
+    assert scores[2] == 0
+
+
+def test_rank_issues_puts_the_best_match_first():
+    """Relevance to the queries outweighs GitHub's reactions order."""
+    issues = [
+        _issue(1, "Feature request: dark mode", reactions=500),
+        _issue(2, "Table header not sticky inside ScrollArea", "sticky header"),
+        _issue(3, "ScrollArea scrollbar flickers"),
+    ]
+
+    ranked = rank_issues(
+        issues, ["shadcn table header sticky", "sticky table header scroll"], now=NOW
+    )
+
+    assert ranked[0].number == 2
+
+
+def test_rank_issues_breaks_ties_with_reactions_recency_and_state():
+    """Among equally relevant issues, popular, recent and closed ones come first."""
+    issues = [
+        _issue(1, "Hydration mismatch", updated_at=NOW - timedelta(days=1500)),
+        _issue(2, "Hydration mismatch", reactions=40, state="closed"),
+        _issue(3, "Hydration mismatch"),
+    ]
+
+    ranked = rank_issues(issues, ["hydration mismatch"], now=NOW)
+
+    assert [issue.number for issue in ranked] == [2, 3, 1]
+
+
+@pytest.mark.anyio
+async def test_stream_issues_with_comments_fetches_only_the_top_issues():
+    """Only the best-ranked issues go on to comment fetching, best match first."""
+    issues = [_issue(n, f"Unrelated issue {n}") for n in range(1, 10)]
+    issues.insert(5, _issue(42, "Vite build fails with esbuild error"))
+
+    with patch("app.services.github.gh") as mock_gh:
+        mock_gh.rest.search.async_issues_and_pull_requests = AsyncMock(
+            return_value=MagicMock(parsed_data=MagicMock(items=issues))
+        )
+        mock_gh.rest.issues.async_list_comments = AsyncMock(
+            return_value=MagicMock(parsed_data=[])
+        )
+
+        payloads = [
+            payload
+            async for payload in stream_issues_with_comments(
+                repo="owner/repo",
+                queries=["vite build esbuild error"],
+                user_query="My vite build fails with an esbuild error",
+                max_issues=3,
+            )
+        ]
+
+    result = payloads[-1]["data"]
+    assert mock_gh.rest.issues.async_list_comments.call_count == 3
+    assert len(result) == 3
+    assert result[0]["issue_number"] == 42
@@ -0,0 +1,211 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from app.exceptions.github_exceptions import RateLimitBudgetExhausted
+from app.services.github import ConditionalCacheStrategy, create_github_client
+from app.services.rate_limit import RateLimitScheduler, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _scheduler(**kwargs) -> RateLimitScheduler:
+    config = {
+        "initial_concurrency": 2,
+        "max_concurrency": 4,
+        "latency_target": 1.0,
+        "max_wait": 30,
+    }
+    return RateLimitScheduler(**{**config, **kwargs})
+
+
+def _search_request() -> httpx.Request:
+    return httpx.Request("GET", "https://api.github.com/search/issues?q=bug")
+
+
+def test_token_bucket_paces_reservations_in_order():
+    """Reservations beyond the burst wait one refill interval more than the previous one."""
+    clock = FakeClock()
+    bucket = TokenBucket(capacity=2, period=2, clock=clock)
+
+    assert [bucket.reserve() for _ in range(4)] == [0, 0, 1, 2]
+
+    clock.now = 3
+    assert bucket.delay() == 0
+
+
+def test_token_bucket_syncs_with_github_headers():
+    """An exhausted budget blocks the bucket until GitHub's reset time."""
+    clock = FakeClock()
+    bucket = TokenBucket(capacity=30, period=60, clock=clock)
+
+    bucket.sync(limit=30, remaining=0, reset_in=45)
+
+    assert bucket.delay() == 45
+
+
+def test_token_bucket_follows_the_reported_budget_up_and_down():
+    """The reported budget replaces the local estimate, less calls still in flight."""
+    clock = FakeClock()
+    bucket = TokenBucket(capacity=5000, period=3600, clock=clock)
+    for _ in range(3):
+        bucket.reserve()
+
+    # Answer to the first of three pending calls, the other two are not counted yet
+    bucket.sync(limit=5000, remaining=4990, reset_in=3600)
+    assert bucket.tokens == 4988
+    bucket.settle()
+
+    bucket.sync(limit=5000, remaining=4999, reset_in=3600)
+    assert bucket.tokens == 4998
+
+
+@pytest.mark.anyio
+async def test_scheduler_tracks_rate_limit_headers():
+    """Budgets reported in responses update the bucket for that resource."""
+    scheduler = _scheduler()
+    response = httpx.Response(
+        200,
+        headers={
+            "x-ratelimit-resource": "search",
+            "x-ratelimit-limit": "30",
+            "x-ratelimit-remaining": "0",
+            "x-ratelimit-reset": str(int(time.time()) + 120),
+        },
+    )
+
+    await scheduler.observe(response)
+
+    assert scheduler.buckets["search"].delay() > 60
+    assert scheduler.buckets["core"].delay() == 0
+    with pytest.raises(RateLimitBudgetExhausted):
+        async with scheduler.async_acquire(_search_request()):
+            pass
+
+
+@pytest.mark.anyio
+async def test_scheduler_halves_concurrency_on_secondary_rate_limit():
+    """A Retry-After response halves the in-flight limit and pauses new calls."""
+    scheduler = _scheduler(initial_concurrency=4)
+
+    await scheduler.observe(httpx.Response(403, headers={"retry-after": "60"}))
+
+    assert scheduler.concurrency_limit == 2
+    with pytest.raises(RateLimitBudgetExhausted):
+        async with scheduler.async_acquire(_search_request()):
+            pass
+
+
+@pytest.mark.anyio
+async def test_scheduler_grows_concurrency_while_calls_are_fast():
+    """Fast calls raise the in-flight limit additively, up to the maximum."""
+    scheduler = _scheduler()
+
+    for _ in range(20):
+        async with scheduler.async_acquire(_search_request()):
+            pass
+
+    assert 2 < scheduler.concurrency_limit <= 4
+
+
+@pytest.mark.anyio
+async def test_scheduler_queues_calls_over_the_concurrency_limit():
+    """Calls over the in-flight limit wait in the queue until a slot frees up."""
+    scheduler = _scheduler(initial_concurrency=1, max_concurrency=1)
+    release = asyncio.Event()
+    entered = []
+
+    async def call(n):
+        async with scheduler.async_acquire(_search_request()):
+            entered.append(n)
+            await release.wait()
+
+    tasks = [asyncio.create_task(call(n)) for n in range(3)]
+    await asyncio.sleep(0.01)
+
+    assert entered == [0]
+    assert scheduler.in_flight == 1
+    assert scheduler.queue_depth == 2
+
+    release.set()
+    await asyncio.gather(*tasks)
+
+    assert entered == [0, 1, 2]
+    assert scheduler.in_flight == 0
+    assert scheduler.queue_depth == 0
+
+
+@pytest.mark.anyio
+async def test_github_client_reports_responses_to_the_scheduler():
+    """The GitHub client routes calls through the scheduler and its response hook."""
+    scheduler = _scheduler()
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(
+            200,
+            json={"id": 1},
+            headers={
+                "x-ratelimit-resource": "core",
+                "x-ratelimit-limit": "5000",
+                "x-ratelimit-remaining": "10",
+                "x-ratelimit-reset": str(int(time.time()) + 3600),
+            },
+        )
+
+    client = create_github_client(
+        http_cache=False,
+        async_transport=httpx.MockTransport(handler),
+        throttler=scheduler,
+        async_event_hooks={"response": [scheduler.observe]},
+    )
+
+    await client.arequest("GET", "/repos/owner/repo")
+
+    assert scheduler.buckets["core"].capacity == 5000
+    assert scheduler.buckets["core"].tokens <= 10
+
+
+@pytest.mark.anyio
+async def test_cached_responses_do_not_spend_the_budget(tmp_path):
+    """Cache hits and 304 revalidations give their token back."""
+    scheduler = _scheduler()
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        if request.headers.get("If-None-Match") == '"v1"':
+            return httpx.Response(304, headers={"ETag": '"v1"'})
+        return httpx.Response(
+            200,
+            json={"id": 1},
+            headers={
+                "ETag": '"v1"',
+                "x-ratelimit-resource": "core",
+                "x-ratelimit-limit": "5000",
+                "x-ratelimit-remaining": "4000",
+                "x-ratelimit-reset": str(int(time.time()) + 3600),
+            },
+        )
+
+    client = create_github_client(
+        async_transport=httpx.MockTransport(handler),
+        cache_strategy=ConditionalCacheStrategy(path=str(tmp_path / "http.db")),
+        throttler=scheduler,
+        async_event_hooks={"response": [scheduler.observe]},
+    )
+
+    for _ in range(3):
+        await client.arequest("GET", "/repos/owner/repo")
+
+    assert len(calls) == 3
+    bucket = scheduler.buckets["core"]
+    assert bucket.pending == 0
+    assert 4000 <= bucket.tokens < 4001
@@ -0,0 +1,91 @@
+import logging
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.services.github import get_repository
+from app.services.repositories import RepositoryIndex
+
+"""Unit tests for the technology -> repository index."""
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.mark.parametrize(
+    "technology", ["nextjs", "next.js", "Next", "Next.JS", "nexjs"]
+)
+def test_repository_index_resolves_aliases(technology):
+    """Aliases, punctuation variants and near misses resolve from the seed."""
+    index = RepositoryIndex(ttl=60)
+
+    assert index.lookup(technology) == "vercel/next.js"
+
+
+def test_repository_index_does_not_fuzzy_match_unknowns():
+    """Unrelated or short names are left to the search API."""
+    index = RepositoryIndex(ttl=60)
+
+    assert index.lookup("nonexistent") is None
+    assert index.lookup("zig") is None
+
+
+def test_repository_index_persists_and_expires_learned_entries(tmp_path):
+    """Learned entries survive a restart and go stale after the TTL."""
+    clock = FakeClock()
+    path = tmp_path / "index.json"
+    RepositoryIndex(path=str(path), ttl=60, clock=clock).remember("Zig", "ziglang/zig")
+
+    index = RepositoryIndex(path=str(path), ttl=60, clock=clock)
+    assert index.lookup("zig") == "ziglang/zig"
+
+    clock.now += 61
+    assert index.lookup("zig") is None
+    assert index.lookup("zig", allow_stale=True) == "ziglang/zig"
+    assert [file.name for file in tmp_path.iterdir()] == ["index.json"]
+
+
+def test_repository_index_logs_failed_saves(tmp_path, monkeypatch, caplog):
+    """A failed save is logged and leaves no temp file behind."""
+    caplog.set_level(logging.WARNING, logger="app.services.repositories")
+
+    def fail_replace(src, dst):
+        raise PermissionError(dst)
+
+    monkeypatch.setattr("app.services.repositories.os.replace", fail_replace)
+    index = RepositoryIndex(path=str(tmp_path / "index.json"), ttl=60)
+    index.remember("Zig", "ziglang/zig")
+
+    assert index.lookup("zig") == "ziglang/zig"
+    assert "Failed to save the repository index" in caplog.text
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.anyio
+async def test_get_repository_uses_index_before_search():
+    """Seeded technologies never spend a search API call."""
+    with patch("app.services.github.gh") as mock_gh:
+        mock_gh.rest.search.async_repos = AsyncMock()
+
+        assert await get_repository(technology="Next.js") == "vercel/next.js"
+        mock_gh.rest.search.async_repos.assert_not_called()
+
+
+@pytest.mark.anyio
+async def test_get_repository_writes_back_search_results():
+    """A search result is remembered so the next lookup is local."""
+    with patch("app.services.github.gh") as mock_gh:
+        mock_gh.rest.search.async_repos = AsyncMock(
+            return_value=MagicMock(
+                parsed_data=MagicMock(items=[MagicMock(full_name="ziglang/zig")])
+            )
+        )
+
+        assert await get_repository(technology="zig") == "ziglang/zig"
+        assert await get_repository(technology="Zig") == "ziglang/zig"
+        mock_gh.rest.search.async_repos.assert_called_once()
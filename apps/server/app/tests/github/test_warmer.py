@@ -0,0 +1,119 @@
+import asyncio
+import logging
+from unittest.mock import AsyncMock
+
+import pytest
+
+from app.services.rate_limit import RateLimitScheduler
+from app.services.warmer import PopularityTracker, run_warmer, warm_once
+
+"""Unit tests for the background warmer."""
+
+
+@pytest.fixture
+def tracker(monkeypatch) -> PopularityTracker:
+    tracker = PopularityTracker(max_entries=10)
+    monkeypatch.setattr("app.services.warmer.popularity", tracker)
+    return tracker
+
+
+@pytest.fixture
+def scheduler(monkeypatch) -> RateLimitScheduler:
+    scheduler = RateLimitScheduler(
+        initial_concurrency=4, max_concurrency=4, latency_target=1.0, max_wait=30
+    )
+    monkeypatch.setattr("app.services.warmer.github_scheduler", scheduler)
+    return scheduler
+
+
+@pytest.fixture
+def warmed_plans(monkeypatch) -> list:
+    plans = []
+
+    async def stream(*, repo, queries):
+        plans.append((repo, queries))
+        yield {"type": "result", "data": []}
+
+    monkeypatch.setattr("app.services.warmer.stream_issues_with_comments", stream)
+    return plans
+
+
+def test_popularity_tracker_ranks_and_decays():
+    """The most searched plans come first and fade once nobody searches them."""
+    tracker = PopularityTracker(max_entries=2)
+    tracker.record("vitejs/vite", ["build error"])
+    tracker.record("Vitejs/Vite", ["build error"])
+    tracker.record("vercel/next.js", ["hydration"])
+    tracker.record("facebook/react", ["hooks"])
+
+    assert tracker.top_repos(1) == ["vitejs/vite"]
+    assert tracker.top_plans(1) == [("vitejs/vite", ("build error",))]
+    assert len(tracker.plans) == 2
+
+    for _ in range(5):
+        tracker.decay()
+    assert tracker.top_plans(5) == []
+
+
+@pytest.mark.anyio
+async def test_warm_once_refreshes_popular_plans(tracker, scheduler, warmed_plans):
+    """Popular query plans are re-run while the rate limit is idle."""
+    tracker.record("vitejs/vite", ["build error", "esbuild"])
+    tracker.record("vercel/next.js", ["hydration"])
+
+    assert await warm_once(max_repos=5, max_plans=1, share=0.2) == 1
+    assert warmed_plans == [("vitejs/vite", ["build error", "esbuild"])]
+
+
+@pytest.mark.anyio
+async def test_warm_once_leaves_busy_quota_to_users(tracker, scheduler, warmed_plans):
+    """Nothing is warmed while user calls are queued or the budget is in use."""
+    tracker.record("vitejs/vite", ["build error"])
+
+    scheduler.queue_depth = 1
+    assert await warm_once(share=0.2) == 0
+
+    scheduler.queue_depth = 0
+    scheduler.buckets["search"].tokens = 20
+    assert await warm_once(share=0.2) == 0
+    assert warmed_plans == []
+
+
+@pytest.mark.anyio
+async def test_warm_once_syncs_indexed_repositories(
+    tracker, scheduler, warmed_plans, monkeypatch
+):
+    """Stale indexed repositories get an incremental sync instead of plan re-runs."""
+    tracker.record("vitejs/vite", ["build error"])
+    index = AsyncMock()
+    index.sync_cursor.return_value = object()
+    index.is_fresh.side_effect = [False, True]
+    sync = AsyncMock(return_value=3)
+    monkeypatch.setattr("app.services.warmer.issue_index", index)
+    monkeypatch.setattr("app.services.warmer.sync_issue_index", sync)
+
+    assert await warm_once(share=0.2) == 1
+    sync.assert_awaited_once_with(repo="vitejs/vite")
+    assert warmed_plans == []
+
+
+@pytest.mark.anyio
+async def test_warmer_keeps_running_after_a_failed_cycle(tracker, monkeypatch, caplog):
+    """A cycle that raises is logged and the next cycle still runs."""
+    cycles = []
+
+    async def warm():
+        cycles.append(len(cycles))
+        if len(cycles) == 1:
+            raise RuntimeError("boom")
+
+    monkeypatch.setattr("app.services.warmer.warm_once", warm)
+    caplog.set_level(logging.ERROR, logger="app.services.warmer")
+    warmer = asyncio.create_task(run_warmer(interval=0))
+    while len(cycles) < 2:
+        await asyncio.sleep(0)
+    warmer.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await warmer
+
+    assert "Warm cycle failed" in caplog.text
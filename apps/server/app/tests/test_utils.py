@@ -0,0 +1,61 @@
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from fastapi import HTTPException
+from githubkit.exception import RequestFailed
+
+from app.utils import check_repo_exists, remember_repo_exists
+
+"""Unit tests for the repository existence check."""
+
+
+@pytest.mark.anyio
+async def test_check_repo_exists_caches_confirmed_repos():
+    """A confirmed repo is not validated against GitHub again."""
+    with patch("app.utils.gh") as mock_gh:
+        mock_gh.rest.repos.async_get = AsyncMock()
+
+        assert await check_repo_exists(repo="vuejs/core") is True
+        assert await check_repo_exists(repo="VueJS/Core") is True
+        mock_gh.rest.repos.async_get.assert_called_once()
+
+
+@pytest.mark.anyio
+async def test_check_repo_exists_caches_missing_repos():
+    """A 404 is remembered so a typo'd repo does not hit GitHub on every search."""
+    with patch("app.utils.gh") as mock_gh:
+        mock_gh.rest.repos.async_get = AsyncMock(
+            side_effect=RequestFailed(MagicMock(status_code=404))
+        )
+
+        for _ in range(2):
+            with pytest.raises(HTTPException) as exc_info:
+                await check_repo_exists(repo="vuejs/vew")
+            assert exc_info.value.status_code == 404
+
+        mock_gh.rest.repos.async_get.assert_called_once()
+
+
+@pytest.mark.anyio
+async def test_check_repo_exists_rejects_invalid_format():
+    """Malformed repos fail with a 422 without calling GitHub."""
+    with patch("app.utils.gh") as mock_gh:
+        mock_gh.rest.repos.async_get = AsyncMock()
+
+        with pytest.raises(HTTPException) as exc_info:
+            await check_repo_exists(repo="not-a-repo")
+
+        assert exc_info.value.status_code == 422
+        mock_gh.rest.repos.async_get.assert_not_called()
+
+
+@pytest.mark.anyio
+async def test_check_repo_exists_trusts_remembered_repos():
+    """Repos resolved by the search fallback skip validation."""
+    await remember_repo_exists("facebook/react")
+
+    with patch("app.utils.gh") as mock_gh:
+        mock_gh.rest.repos.async_get = AsyncMock()
+
+        assert await check_repo_exists(repo="facebook/react") is True
+        mock_gh.rest.repos.async_get.assert_not_called()
@@ -1,10 +1,22 @@
-import json
-
 from fastapi import HTTPException
+from githubkit.exception import RequestFailed
 
+from .core.cache import SharedCache
+from .core.config import settings
+from .core.sse import encode_event
 from .exceptions.github_exceptions import handle_github_exceptions
 from .services.github import gh
 
+# Repository existence by lowercased `owner/name`; misses are kept only briefly
+repo_exists_cache: SharedCache[bool] = SharedCache(
+    "repo_exists", ttl=settings.REPO_EXISTS_TTL_SECONDS
+)
+
+
+async def remember_repo_exists(repo: str) -> None:
+    """Record a repository known to exist, e.g. one returned by the search API."""
+    await repo_exists_cache.set(repo.strip().lower(), True)
+
 
 @handle_github_exceptions
 async def check_repo_exists(*, repo: str) -> bool:
@@ -19,9 +31,25 @@ async def check_repo_exists(*, repo: str) -> bool:
         )
     username, repo_name = parts[0], parts[1]
 
-    await gh.rest.repos.async_get(owner=username, repo=repo_name)
+    key = repo_str.lower()
+    exists = await repo_exists_cache.get(key)
+    if exists is True:
+        return True
+    if exists is False:
+        raise HTTPException(status_code=404, detail="Resource not found")
+
+    try:
+        await gh.rest.repos.async_get(owner=username, repo=repo_name)
+    except RequestFailed as e:
+        if e.response.status_code == 404:
+            await repo_exists_cache.set(
+                key, False, ttl=settings.REPO_MISSING_TTL_SECONDS
+            )
+        raise
+
+    await repo_exists_cache.set(key, True)
     return True
 
 
-def event_message(event_type: str, data: dict) -> str:
-    return f"event: {event_type}\ndata: {json.dumps(data)}\n\n"
+def event_message(event_type: str, data: dict) -> bytes:
+    return encode_event(event_type, data)
@@ -0,0 +1,222 @@
+"""
+Concurrent SSE clients for /api/v1/search, or batch clients for
+/api/v1/search/batch, and the statistics of their runs.
+"""
+
+import asyncio
+import itertools
+import json
+import math
+import random
+import time
+from dataclasses import dataclass
+
+import httpx
+
+from .stubs import TECHNOLOGIES
+
+_PROBLEMS = [
+    "build fails after upgrading to the latest version",
+    "hot module reload stops working with a custom plugin",
+    "hydration mismatch when rendering dates on the server",
+    "typescript path aliases are not resolved in tests",
+    "memory usage keeps growing during long dev server sessions",
+    "environment variables are undefined in production builds",
+]
+
+
+@dataclass
+class Sample:
+    """Timings of one search, in seconds from sending the request."""
+
+    ttfb: float | None = None
+    first_answer_chunk: float | None = None
+    total: float | None = None
+    # HTTP status or SSE error, None when the search completed
+    error: str | None = None
+
+
+def make_queries(count: int, seed: int = 0) -> list[str]:
+    """`count` distinct, realistic user queries."""
+    rng = random.Random(seed)
+    combinations = list(
+        itertools.product([tech for tech, _ in TECHNOLOGIES], _PROBLEMS)
+    )
+    rng.shuffle(combinations)
+    queries = []
+    for i in range(count):
+        tech, problem = combinations[i % len(combinations)]
+        variant = i // len(combinations)
+        queries.append(
+            f"{tech} {problem}" + (f" in project {variant}" if variant else "")
+        )
+    return queries
+
+
+async def search_once(
+    client: httpx.AsyncClient, query: str, repo: str | None
+) -> Sample:
+    """Run one search and time its stream."""
+    sample = Sample()
+    params = {"query": query, **({"repo": repo} if repo else {})}
+    start = time.perf_counter()
+    buffer = ""
+    try:
+        async with client.stream("GET", "/api/v1/search", params=params) as response:
+            if response.status_code != 200:
+                sample.error = f"http_{response.status_code}"
+                return sample
+            async for text in response.aiter_text():
+                if sample.ttfb is None:
+                    sample.ttfb = time.perf_counter() - start
+                buffer += text
+                *messages, buffer = buffer.split("\n\n")
+                for message in messages:
+                    event = message.partition("event: ")[2].partition("\n")[0]
+                    if (
+                        event == "streaming_answer_chunk"
+                        and sample.first_answer_chunk is None
+                    ):
+                        sample.first_answer_chunk = time.perf_counter() - start
+                    elif event == "streaming_error":
+                        data = json.loads(message.partition("data: ")[2])
+                        sample.error = f"{event}: {data.get('message')}"
+                    elif event == "query_not_relevant":
+                        sample.error = event
+                    elif event == "streaming_answer_end":
+                        sample.total = time.perf_counter() - start
+    except httpx.HTTPError as e:
+        sample.error = type(e).__name__
+    if sample.total is None and sample.error is None:
+        sample.error = "incomplete"
+    return sample
+
+
+async def batch_once(
+    client: httpx.AsyncClient, queries: list[str], repo: str | None
+) -> list[Sample]:
+    """Run one batch of searches and time the result line of each."""
+    samples = [Sample() for _ in queries]
+    body = {
+        "searches": [
+            {"query": query, **({"repo": repo} if repo else {})} for query in queries
+        ]
+    }
+    start = time.perf_counter()
+    try:
+        async with client.stream("POST", "/api/v1/search/batch", json=body) as response:
+            if response.status_code != 200:
+                for sample in samples:
+                    sample.error = f"http_{response.status_code}"
+                return samples
+            ttfb = None
+            async for line in response.aiter_lines():
+                if ttfb is None:
+                    ttfb = time.perf_counter() - start
+                if not line:
+                    continue
+                result = json.loads(line)
+                sample = samples[result["index"]]
+                sample.ttfb = ttfb
+                sample.total = time.perf_counter() - start
+                if result["outcome"] == "not_relevant":
+                    sample.error = "query_not_relevant"
+                elif result["error"] is not None:
+                    sample.error = f"streaming_error: {result['error']}"
+    except httpx.HTTPError as e:
+        for sample in samples:
+            if sample.total is None:
+                sample.error = type(e).__name__
+    for sample in samples:
+        if sample.total is None and sample.error is None:
+            sample.error = "incomplete"
+    return samples
+
+
+async def run_load(
+    base_url: str,
+    queries: list[str],
+    *,
+    concurrency: int,
+    requests: int,
+    repo: str | None = None,
+    batch_size: int | None = None,
+) -> tuple[list[Sample], float]:
+    """
+    Send `requests` searches from `concurrency` clients, cycling through `queries`,
+    each client sending batches of `batch_size` searches when it is set.
+    Returns the samples and the wall-clock duration of the run.
+    """
+    pending = iter(itertools.islice(itertools.cycle(queries), requests))
+    samples: list[Sample] = []
+
+    async def client_loop(client: httpx.AsyncClient) -> None:
+        if batch_size:
+            while batch := list(itertools.islice(pending, batch_size)):
+                samples.extend(await batch_once(client, batch, repo))
+            return
+        for query in pending:
+            samples.append(await search_once(client, query, repo))
+
+    limits = httpx.Limits(
+        max_connections=concurrency, max_keepalive_connections=concurrency
+    )
+    async with httpx.AsyncClient(
+        base_url=base_url, timeout=None, limits=limits
+    ) as client:
+        start = time.perf_counter()
+        async with asyncio.TaskGroup() as tg:
+            for _ in range(concurrency):
+                tg.create_task(client_loop(client))
+        duration = time.perf_counter() - start
+    return samples, duration
+
+
+def percentile(values: list[float], q: float) -> float:
+    """The `q`-th percentile (0-100) with linear interpolation."""
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * q / 100
+    low, high = math.floor(rank), math.ceil(rank)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def distribution(values: list[float]) -> dict[str, float] | None:
+    if not values:
+        return None
+    return {
+        "mean": sum(values) / len(values),
+        "p50": percentile(values, 50),
+        "p90": percentile(values, 90),
+        "p99": percentile(values, 99),
+        "max": max(values),
+    }
+
+
+def summarize(samples: list[Sample], duration: float) -> dict:
+    """Request counts, throughput and latency percentiles of a run."""
+    completed = [sample for sample in samples if sample.error is None]
+    errors: dict[str, int] = {}
+    for sample in samples:
+        if sample.error is not None:
+            errors[sample.error] = errors.get(sample.error, 0) + 1
+    return {
+        "requests": {
+            "total": len(samples),
+            "completed": len(completed),
+            "failed": len(samples) - len(completed),
+            "errors": errors,
+        },
+        "duration_seconds": duration,
+        "throughput_rps": len(completed) / duration if duration else 0.0,
+        "latency_seconds": {
+            "ttfb": distribution([s.ttfb for s in samples if s.ttfb is not None]),
+            "first_answer_chunk": distribution(
+                [
+                    s.first_answer_chunk
+                    for s in completed
+                    if s.first_answer_chunk is not None
+                ]
+            ),
+            "total": distribution([s.total for s in completed]),
+        },
+    }
@@ -0,0 +1,368 @@
+"""
+End-to-end benchmark of /api/v1/search against local GitHub and Gemini stubs.
+
+The app runs as a real uvicorn server in a subprocess, configured to call the
+stubs instead of the real APIs, while concurrent SSE clients drive searches.
+
+    python -m benchmarks.run --concurrency 20 --requests 200 --output run.json
+    python -m benchmarks.run --baseline run.json --max-regression 0.1
+
+With `--baseline`, the run fails when a tracked metric is worse than the
+baseline by more than the allowed share.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
+from dataclasses import asdict
+from pathlib import Path
+
+import httpx
+import uvicorn
+
+from .load import make_queries, run_load, summarize
+from .stubs import (
+    OUTCOMES,
+    GeminiStubConfig,
+    GitHubStubConfig,
+    Latency,
+    create_gemini_stub,
+    create_github_stub,
+)
+
+SERVER_DIR = Path(__file__).resolve().parent.parent
+
+# (path in the results, whether higher is better)
+TRACKED_METRICS = [
+    ("latency_seconds.ttfb.p99", False),
+    ("latency_seconds.first_answer_chunk.p50", False),
+    ("latency_seconds.first_answer_chunk.p99", False),
+    ("latency_seconds.total.p50", False),
+    ("latency_seconds.total.p99", False),
+    ("throughput_rps", True),
+    ("upstream_calls_per_search", False),
+    ("peak_rss_bytes", False),
+]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@asynccontextmanager
+async def serve_stub(app):
+    """Serve a stub app in this process, yielding its base URL."""
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    server = uvicorn.Server(
+        uvicorn.Config(app, log_level="warning", lifespan="off", access_log=False)
+    )
+    task = asyncio.create_task(server.serve(sockets=[sock]))
+    while not server.started:
+        if task.done():
+            task.result()
+        await asyncio.sleep(0.01)
+    try:
+        yield f"http://127.0.0.1:{sock.getsockname()[1]}"
+    finally:
+        server.should_exit = True
+        await task
+        sock.close()
+
+
+@asynccontextmanager
+async def serve_app(env: dict[str, str], workers: int):
+    """Run the app under uvicorn in a subprocess, yielding its base URL."""
+    port = _free_port()
+    process = await asyncio.create_subprocess_exec(
+        sys.executable,
+        "-m",
+        "uvicorn",
+        "app.main:app",
+        "--host",
+        "127.0.0.1",
+        "--port",
+        str(port),
+        "--workers",
+        str(workers),
+        "--log-level",
+        "warning",
+        "--no-access-log",
+        cwd=SERVER_DIR,
+        env={**os.environ, **env},
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        async with httpx.AsyncClient(base_url=base_url) as client:
+            deadline = time.monotonic() + 30
+            while True:
+                if process.returncode is not None:
+                    raise RuntimeError(f"Server exited with {process.returncode}")
+                try:
+                    if (await client.get("/")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                if time.monotonic() > deadline:
+                    raise RuntimeError("Server did not start within 30 seconds")
+                await asyncio.sleep(0.1)
+        yield base_url
+    finally:
+        if process.returncode is None:
+            process.terminate()
+        await process.wait()
+
+
+def _peak_child_rss() -> int:
+    """Peak resident set size of the largest finished child process, in bytes."""
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=SERVER_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run_benchmark(
+    args: argparse.Namespace,
+    github_config: GitHubStubConfig,
+    gemini_config: GeminiStubConfig,
+) -> dict:
+    calls: Counter = Counter()
+    queries = make_queries(args.distinct_queries or args.requests, seed=args.seed)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        async with (
+            serve_stub(create_github_stub(github_config, calls)) as github_url,
+            serve_stub(create_gemini_stub(gemini_config, calls)) as gemini_url,
+        ):
+            env = {
+                "GITHUB_TOKEN": "benchmark",
+                "GOOGLE_API_KEY": "benchmark",
+                "GITHUB_CLIENT_ID": "benchmark",
+                "GITHUB_CLIENT_SECRET": "benchmark",
+                "SECRET_KEY": "benchmark",
+                "ENVIRONMENT": "local",
+                "WARMER_ENABLED": "false",
+                # All clients share one address, don't rate-limit them as one user
+                "ADMISSION_CLIENT_RATE_PER_MINUTE": "1000000",
+                "ADMISSION_CLIENT_BURST": "1000000",
+                "REPO_INDEX_PATH": str(Path(tmp) / "repositories.json"),
+                "CACHE_SQLITE_PATH": str(Path(tmp) / "cache.db"),
+                **dict(setting.split("=", 1) for setting in args.env),
+                "GITHUB_API_BASE_URL": github_url,
+                "GEMINI_BASE_URL": gemini_url,
+            }
+            async with serve_app(env, args.workers) as app_url:
+                if args.warmup:
+                    await run_load(
+                        app_url,
+                        queries,
+                        concurrency=args.concurrency,
+                        requests=args.warmup,
+                        repo=args.repo,
+                        batch_size=args.batch_size,
+                    )
+                    calls.clear()
+                samples, duration = await run_load(
+                    app_url,
+                    queries,
+                    concurrency=args.concurrency,
+                    requests=args.requests,
+                    repo=args.repo,
+                    batch_size=args.batch_size,
+                )
+
+    results = summarize(samples, duration)
+    upstream_calls = sum(n for name, n in calls.items() if name not in OUTCOMES)
+    return {
+        "benchmark": "search",
+        "git_revision": _git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "config": {
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "distinct_queries": len(queries),
+            "warmup": args.warmup,
+            "repo": args.repo,
+            "batch_size": args.batch_size,
+            "workers": args.workers,
+            "env": args.env,
+            "github": {k: str(v) for k, v in asdict(github_config).items()},
+            "gemini": {k: str(v) for k, v in asdict(gemini_config).items()},
+        },
+        **results,
+        "upstream_calls": dict(sorted(calls.items())),
+        "upstream_calls_per_search": upstream_calls / max(1, len(samples)),
+        "peak_rss_bytes": _peak_child_rss(),
+    }
+
+
+def _metric(results: dict, path: str) -> float | None:
+    value = results
+    for part in path.split("."):
+        if not isinstance(value, dict) or value.get(part) is None:
+            return None
+        value = value[part]
+    return value
+
+
+def compare(results: dict, baseline: dict, max_regression: float) -> list[str]:
+    """Describe every tracked metric that regressed by more than `max_regression`."""
+    regressions = []
+    for path, higher_is_better in TRACKED_METRICS:
+        current, previous = _metric(results, path), _metric(baseline, path)
+        if current is None or not previous:
+            continue
+        change = (current - previous) / previous
+        if (-change if higher_is_better else change) > max_regression:
+            regressions.append(
+                f"{path}: {previous:.4g} -> {current:.4g} ({change:+.1%})"
+            )
+    return regressions
+
+
+def _print_report(results: dict) -> None:
+    requests = results["requests"]
+    print(
+        f"{requests['completed']}/{requests['total']} searches completed in "
+        f"{results['duration_seconds']:.2f}s ({results['throughput_rps']:.2f}/s)"
+    )
+    if requests["errors"]:
+        print(f"errors: {requests['errors']}")
+    for name, stats in results["latency_seconds"].items():
+        if stats:
+            print(
+                f"{name:>20}: "
+                + "  ".join(
+                    f"{key} {value * 1000:8.1f}ms" for key, value in stats.items()
+                )
+            )
+    print(f"upstream calls: {results['upstream_calls']}")
+    print(f"upstream calls per search: {results['upstream_calls_per_search']:.2f}")
+    print(f"peak RSS: {results['peak_rss_bytes'] / 2**20:.1f} MiB")
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.run",
+        description="End-to-end benchmark of /api/v1/search against local stubs.",
+    )
+    load = parser.add_argument_group("load")
+    load.add_argument("--concurrency", type=int, default=10)
+    load.add_argument("--requests", type=int, default=100)
+    load.add_argument(
+        "--distinct-queries",
+        type=int,
+        help="Size of the query pool, repeats hit the caches (default: --requests)",
+    )
+    load.add_argument(
+        "--warmup", type=int, default=0, help="Unrecorded searches to run first"
+    )
+    load.add_argument("--repo", help="Search this owner/repo instead of auto-selecting")
+    load.add_argument(
+        "--batch-size",
+        type=int,
+        help="Send searches in batches of this size to /search/batch instead",
+    )
+    load.add_argument("--seed", type=int, default=0)
+
+    app = parser.add_argument_group("app")
+    app.add_argument("--workers", type=int, default=1)
+    app.add_argument(
+        "--env",
+        action="append",
+        default=[],
+        metavar="KEY=VALUE",
+        help="App setting for the run, e.g. GITHUB_COMMENTS_BACKEND=graphql",
+    )
+
+    github = parser.add_argument_group("GitHub stub")
+    github.add_argument(
+        "--github-latency", type=Latency.parse, default="lognormal:0.08:0.5"
+    )
+    github.add_argument("--issues-per-search", type=int, default=30)
+    github.add_argument("--issue-body-bytes", type=int, default=2000)
+    github.add_argument("--comments-per-issue", type=int, default=10)
+    github.add_argument("--comment-body-bytes", type=int, default=600)
+    # Unlimited by default so runs measure the app, github.com allows 30 and 5000
+    github.add_argument("--search-limit", type=int, default=10_000, help="Per minute")
+    github.add_argument("--core-limit", type=int, default=1_000_000, help="Per hour")
+    github.add_argument("--secondary-limit-rate", type=float, default=0.0)
+
+    gemini = parser.add_argument_group("Gemini stub")
+    gemini.add_argument(
+        "--plan-latency", type=Latency.parse, default="lognormal:0.4:0.3"
+    )
+    gemini.add_argument(
+        "--first-chunk-latency", type=Latency.parse, default="lognormal:0.5:0.3"
+    )
+    gemini.add_argument("--chunk-latency", type=Latency.parse, default="constant:0.02")
+    gemini.add_argument("--answer-bytes", type=int, default=1500)
+    gemini.add_argument("--answer-chunks", type=int, default=30)
+
+    report = parser.add_argument_group("report")
+    report.add_argument("--output", type=Path, help="Write the results as JSON here")
+    report.add_argument("--baseline", type=Path, help="Results JSON to compare against")
+    report.add_argument("--max-regression", type=float, default=0.1)
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+    github_config = GitHubStubConfig(
+        latency=args.github_latency,
+        issues_per_search=args.issues_per_search,
+        issue_body_bytes=args.issue_body_bytes,
+        comments_per_issue=args.comments_per_issue,
+        comment_body_bytes=args.comment_body_bytes,
+        search_limit=args.search_limit,
+        core_limit=args.core_limit,
+        secondary_limit_rate=args.secondary_limit_rate,
+    )
+    gemini_config = GeminiStubConfig(
+        plan_latency=args.plan_latency,
+        first_chunk_latency=args.first_chunk_latency,
+        chunk_latency=args.chunk_latency,
+        answer_bytes=args.answer_bytes,
+        answer_chunks=args.answer_chunks,
+    )
+
+    results = asyncio.run(run_benchmark(args, github_config, gemini_config))
+    _print_report(results)
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2) + "\n")
+
+    if args.baseline:
+        regressions = compare(
+            results, json.loads(args.baseline.read_text()), args.max_regression
+        )
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
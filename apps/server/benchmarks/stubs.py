@@ -0,0 +1,490 @@
+"""
+Local stand-ins for the GitHub REST/GraphQL API and the Gemini API.
+
+The payloads are shaped like the real APIs closely enough for githubkit and
+google-genai to parse them, with configurable latency, payload sizes and rate
+limits. Every call is counted so a benchmark can report upstream traffic.
+"""
+
+import asyncio
+import hashlib
+import json
+import math
+import random
+import re
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import StreamingResponse
+
+TECHNOLOGIES = [
+    ("vite", "vitejs/vite"),
+    ("next.js", "vercel/next.js"),
+    ("react", "facebook/react"),
+    ("vue", "vuejs/core"),
+    ("svelte", "sveltejs/svelte"),
+    ("angular", "angular/angular"),
+    ("astro", "withastro/astro"),
+    ("nuxt", "nuxt/nuxt"),
+]
+
+# Counted next to the endpoint calls, describing how some of them were answered
+OUTCOMES = {
+    "github.rate_limited",
+    "github.secondary_rate_limited",
+    "github.not_modified",
+}
+
+_WORDS = (  # noqa: SIM905
+    "build error config plugin module import export server client render cache "
+    "deploy upgrade version runtime bundle hydration router typescript test"
+).split()
+
+_REPO_URL_FIELDS = (  # noqa: SIM905
+    "forks keys collaborators teams hooks issue_events events assignees branches "
+    "tags blobs git_tags git_refs trees statuses languages stargazers contributors "
+    "subscribers subscription commits git_commits comments issue_comment contents "
+    "compare merges archive downloads issues pulls milestones notifications labels "
+    "releases deployments"
+).split()
+
+_USER_URL_FIELDS = (  # noqa: SIM905
+    "followers following gists starred subscriptions organizations repos events "
+    "received_events"
+).split()
+
+
+@dataclass
+class Latency:
+    """
+    A response delay distribution, parsed from `kind:arg[:arg]`:
+    `constant:0.05`, `uniform:0.02:0.2` or `lognormal:<median>:<sigma>`.
+    """
+
+    kind: str = "constant"
+    args: tuple[float, ...] = (0.0,)
+
+    @classmethod
+    def parse(cls, spec: str) -> "Latency":
+        kind, *args = spec.split(":")
+        expected = {"constant": 1, "uniform": 2, "lognormal": 2}
+        if kind not in expected or len(args) != expected[kind]:
+            raise ValueError(f"Invalid latency {spec!r}")
+        return cls(kind, tuple(float(arg) for arg in args))
+
+    def sample(self) -> float:
+        if self.kind == "uniform":
+            return random.uniform(*self.args)
+        if self.kind == "lognormal":
+            median, sigma = self.args
+            return random.lognormvariate(math.log(median), sigma) if median > 0 else 0
+        return self.args[0]
+
+    async def sleep(self) -> None:
+        delay = self.sample()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def __str__(self) -> str:
+        return ":".join([self.kind, *(f"{arg:g}" for arg in self.args)])
+
+
+@dataclass
+class GitHubStubConfig:
+    latency: Latency = field(default_factory=lambda: Latency.parse("constant:0.05"))
+    issues_per_search: int = 30
+    issue_body_bytes: int = 2000
+    comments_per_issue: int = 10
+    comment_body_bytes: int = 600
+    # Requests allowed per window and resource, as on github.com
+    search_limit: int = 30
+    search_window: float = 60
+    core_limit: int = 5000
+    core_window: float = 3600
+    # Share of requests answered with a secondary rate limit (403 + Retry-After)
+    secondary_limit_rate: float = 0.0
+    retry_after: float = 1
+
+
+@dataclass
+class GeminiStubConfig:
+    # Time to the full query plan, and to the first answer chunk
+    plan_latency: Latency = field(default_factory=lambda: Latency.parse("constant:0.4"))
+    first_chunk_latency: Latency = field(
+        default_factory=lambda: Latency.parse("constant:0.5")
+    )
+    chunk_latency: Latency = field(
+        default_factory=lambda: Latency.parse("constant:0.02")
+    )
+    answer_bytes: int = 1500
+    answer_chunks: int = 30
+
+
+def _text(rng: random.Random, size: int) -> str:
+    words = []
+    length = 0
+    while length < size:
+        word = rng.choice(_WORDS)
+        words.append(word)
+        length += len(word) + 1
+    return " ".join(words)[:size]
+
+
+def _seed(*parts: object) -> int:
+    return int.from_bytes(hashlib.sha1(repr(parts).encode()).digest()[:8], "big")
+
+
+def _timestamp(seconds_ago: float) -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(time.time() - seconds_ago))
+
+
+class _Window:
+    """Fixed-window request counter for one rate-limit resource."""
+
+    def __init__(self, limit: int, period: float):
+        self.limit = limit
+        self.period = period
+        self.started = time.time()
+        self.used = 0
+
+    def take(self) -> bool:
+        now = time.time()
+        if now - self.started >= self.period:
+            self.started = now
+            self.used = 0
+        if self.used >= self.limit:
+            return False
+        self.used += 1
+        return True
+
+    def headers(self, resource: str) -> dict[str, str]:
+        return {
+            "x-ratelimit-limit": str(self.limit),
+            "x-ratelimit-remaining": str(max(0, self.limit - self.used)),
+            "x-ratelimit-used": str(self.used),
+            "x-ratelimit-reset": str(math.ceil(self.started + self.period)),
+            "x-ratelimit-resource": resource,
+        }
+
+
+def _user(base_url: str, login: str) -> dict:
+    user_id = _seed("user", login) % 10_000_000
+    url = f"{base_url}/users/{login}"
+    return {
+        "login": login,
+        "id": user_id,
+        "node_id": f"U_{user_id}",
+        "avatar_url": f"{base_url}/avatars/{login}",
+        "gravatar_id": "",
+        "url": url,
+        "html_url": f"https://github.com/{login}",
+        **{f"{part}_url": f"{url}/{part}" for part in _USER_URL_FIELDS},
+        "type": "User",
+        "site_admin": False,
+    }
+
+
+def _repository(base_url: str, full_name: str) -> dict:
+    owner, name = full_name.split("/")
+    repo_id = _seed("repo", full_name) % 100_000_000
+    url = f"{base_url}/repos/{full_name}"
+    return {
+        "id": repo_id,
+        "node_id": f"R_{repo_id}",
+        "name": name,
+        "full_name": full_name,
+        "owner": _user(base_url, owner),
+        "private": False,
+        "html_url": f"https://github.com/{full_name}",
+        "description": f"The {name} repository",
+        "fork": False,
+        "url": url,
+        **{f"{part}_url": f"{url}/{part}" for part in _REPO_URL_FIELDS},
+        "git_url": f"git://github.com/{full_name}.git",
+        "ssh_url": f"git@github.com:{full_name}.git",
+        "clone_url": f"https://github.com/{full_name}.git",
+        "svn_url": f"https://github.com/{full_name}",
+        "mirror_url": None,
+        "homepage": None,
+        "language": "TypeScript",
+        "created_at": _timestamp(86400 * 3000),
+        "updated_at": _timestamp(3600),
+        "pushed_at": _timestamp(3600),
+        "size": 100_000,
+        "stargazers_count": 50_000,
+        "watchers_count": 50_000,
+        "watchers": 50_000,
+        "forks_count": 5_000,
+        "forks": 5_000,
+        "open_issues_count": 500,
+        "open_issues": 500,
+        "default_branch": "main",
+        "score": 1.0,
+        "has_issues": True,
+        "has_projects": True,
+        "has_pages": False,
+        "has_wiki": True,
+        "archived": False,
+        "disabled": False,
+        "license": None,
+    }
+
+
+def _reactions(url: str, total: int) -> dict:
+    kinds = ["+1", "-1", "laugh", "confused", "heart", "hooray", "eyes", "rocket"]
+    return {"url": url, "total_count": total, **dict.fromkeys(kinds, 0)}
+
+
+def _issue(base_url: str, repo: str, number: int, config: GitHubStubConfig) -> dict:
+    rng = random.Random(_seed("issue", repo, number))
+    url = f"{base_url}/repos/{repo}/issues/{number}"
+    closed = rng.random() < 0.6
+    return {
+        "url": url,
+        "repository_url": f"{base_url}/repos/{repo}",
+        "labels_url": f"{url}/labels{{/name}}",
+        "comments_url": f"{url}/comments",
+        "events_url": f"{url}/events",
+        "html_url": f"https://github.com/{repo}/issues/{number}",
+        "id": _seed("issue-id", repo, number) % 1_000_000_000,
+        "node_id": f"I_{repo}_{number}",
+        "number": number,
+        "title": _text(rng, 60),
+        "locked": False,
+        "user": _user(base_url, f"user{rng.randrange(1000)}"),
+        "labels": [],
+        "state": "closed" if closed else "open",
+        "milestone": None,
+        "comments": config.comments_per_issue,
+        "created_at": _timestamp(rng.uniform(86400, 86400 * 1000)),
+        "updated_at": _timestamp(rng.uniform(0, 86400)),
+        "closed_at": _timestamp(3600) if closed else None,
+        "body": _text(rng, config.issue_body_bytes),
+        "score": 1.0,
+        "author_association": "NONE",
+        "reactions": _reactions(f"{url}/reactions", rng.randrange(100)),
+    }
+
+
+def _comment(base_url: str, repo: str, number: int, index: int, size: int) -> dict:
+    rng = random.Random(_seed("comment", repo, number, index))
+    comment_id = _seed("comment-id", repo, number, index) % 1_000_000_000
+    return {
+        "id": comment_id,
+        "node_id": f"IC_{comment_id}",
+        "url": f"{base_url}/repos/{repo}/issues/comments/{comment_id}",
+        "html_url": f"https://github.com/{repo}/issues/{number}#issuecomment-{comment_id}",
+        "body": _text(rng, size),
+        "user": _user(base_url, f"user{rng.randrange(1000)}"),
+        "created_at": _timestamp(86400),
+        "updated_at": _timestamp(86400),
+        "issue_url": f"{base_url}/repos/{repo}/issues/{number}",
+        "author_association": "NONE",
+        "reactions": _reactions(
+            f"{base_url}/repos/{repo}/issues/comments/{comment_id}/reactions",
+            rng.randrange(20),
+        ),
+    }
+
+
+def create_github_stub(config: GitHubStubConfig, calls: Counter) -> FastAPI:
+    """A GitHub API stand-in whose calls are counted in `calls`."""
+    app = FastAPI()
+    windows = {
+        "search": _Window(config.search_limit, config.search_window),
+        "core": _Window(config.core_limit, config.core_window),
+        "graphql": _Window(config.core_limit, config.core_window),
+    }
+
+    async def respond(
+        request: Request, name: str, resource: str, payload: object
+    ) -> Response:
+        calls[f"github.{name}"] += 1
+        await config.latency.sleep()
+        window = windows[resource]
+
+        if random.random() < config.secondary_limit_rate:
+            calls["github.secondary_rate_limited"] += 1
+            return Response(
+                json.dumps({"message": "You have exceeded a secondary rate limit."}),
+                status_code=403,
+                media_type="application/json",
+                headers={"retry-after": f"{config.retry_after:g}"},
+            )
+
+        body = json.dumps(payload).encode()
+        etag = f'W/"{hashlib.sha1(body).hexdigest()}"'
+        # Conditional requests answered with 304 are free on github.com
+        if request.headers.get("if-none-match") == etag:
+            calls["github.not_modified"] += 1
+            return Response(status_code=304, headers={"etag": etag})
+
+        if not window.take():
+            calls["github.rate_limited"] += 1
+            return Response(
+                json.dumps({"message": "API rate limit exceeded"}),
+                status_code=403,
+                media_type="application/json",
+                headers=window.headers(resource),
+            )
+        return Response(
+            body,
+            media_type="application/json",
+            headers={
+                **window.headers(resource),
+                "etag": etag,
+                "cache-control": "private, max-age=60, s-maxage=60",
+            },
+        )
+
+    def issue_numbers(repo: str, query: str) -> list[int]:
+        rng = random.Random(_seed("search", repo, query))
+        return rng.sample(range(1, 20_000), config.issues_per_search)
+
+    @app.get("/search/issues")
+    async def search_issues(request: Request, q: str):
+        repo = re.search(r"repo:(\S+)", q)
+        repo = repo.group(1) if repo else "octo/octo"
+        items = [
+            _issue(str(request.base_url).rstrip("/"), repo, number, config)
+            for number in issue_numbers(repo, q)
+        ]
+        payload = {
+            "total_count": len(items),
+            "incomplete_results": False,
+            "search_type": "lexical",
+            "items": items,
+        }
+        return await respond(request, "search_issues", "search", payload)
+
+    @app.get("/search/repositories")
+    async def search_repositories(request: Request, q: str):
+        matches = [repo for tech, repo in TECHNOLOGIES if tech in q.lower()]
+        base_url = str(request.base_url).rstrip("/")
+        payload = {
+            "total_count": len(matches),
+            "incomplete_results": False,
+            "items": [_repository(base_url, repo) for repo in matches],
+        }
+        return await respond(request, "search_repositories", "search", payload)
+
+    @app.get("/repos/{owner}/{name}")
+    async def get_repository(request: Request, owner: str, name: str):
+        payload = _repository(str(request.base_url).rstrip("/"), f"{owner}/{name}")
+        return await respond(request, "get_repository", "core", payload)
+
+    @app.get("/repos/{owner}/{name}/issues/{number}/comments")
+    async def list_comments(request: Request, owner: str, name: str, number: int):
+        base_url = str(request.base_url).rstrip("/")
+        payload = [
+            _comment(base_url, f"{owner}/{name}", number, i, config.comment_body_bytes)
+            for i in range(config.comments_per_issue)
+        ]
+        return await respond(request, "list_comments", "core", payload)
+
+    @app.post("/graphql")
+    async def graphql(request: Request):
+        body = await request.json()
+        variables = body.get("variables") or {}
+        repo = f"{variables.get('owner')}/{variables.get('name')}"
+        base_url = str(request.base_url).rstrip("/")
+        repository = {}
+        for number in map(int, re.findall(r"i(\d+): issue\(", body["query"])):
+            nodes = []
+            for i in range(config.comments_per_issue):
+                comment = _comment(base_url, repo, number, i, config.comment_body_bytes)
+                nodes.append(
+                    {
+                        "body": comment["body"],
+                        "url": comment["html_url"],
+                        "author": {"login": comment["user"]["login"]},
+                        "reactions": {
+                            "totalCount": comment["reactions"]["total_count"]
+                        },
+                    }
+                )
+            repository[f"i{number}"] = {"comments": {"nodes": nodes}}
+        payload = {"data": {"repository": repository}}
+        return await respond(request, "graphql", "graphql", payload)
+
+    return app
+
+
+def _prompt(body: dict) -> str:
+    parts = [
+        part.get("text", "")
+        for content in body.get("contents") or []
+        for part in content.get("parts") or []
+    ]
+    return "\n".join(parts)
+
+
+def _candidate(text: str, finished: bool) -> dict:
+    candidate = {"content": {"parts": [{"text": text}], "role": "model"}, "index": 0}
+    if finished:
+        candidate["finishReason"] = "STOP"
+    return {"candidates": [candidate], "modelVersion": "gemini-stub"}
+
+
+def create_gemini_stub(config: GeminiStubConfig, calls: Counter) -> FastAPI:
+    """A Gemini API stand-in whose calls are counted in `calls`."""
+    app = FastAPI()
+
+    def plan(query: str) -> dict:
+        technology, _ = TECHNOLOGIES[_seed("tech", query) % len(TECHNOLOGIES)]
+        words = [word for word in re.findall(r"\w+", query.lower()) if len(word) > 3]
+        queries = [" ".join(words[i : i + 3]) or query for i in range(0, 9, 3)]
+        return {"technology": technology, "queries": queries, "confidence": 0.9}
+
+    def query_plan(prompt: str) -> dict:
+        if "User Queries:" in prompt:
+            # Grouped plans for a batch, one per numbered query
+            lines = prompt.rsplit("User Queries:", 1)[-1].strip().splitlines()
+            return {"results": [plan(line.split(". ", 1)[-1]) for line in lines]}
+        return plan(prompt.rsplit("User Query:", 1)[-1].strip())
+
+    def answer(prompt: str) -> str:
+        rng = random.Random(_seed("answer", prompt[:200]))
+        urls = re.findall(r"<(https://github\.com/[^>]+/issues/(\d+))>", prompt)[:3]
+        sources = [
+            {
+                "id": str(i + 1),
+                "type": "issue",
+                "title": f"Issue #{number}",
+                "url": url,
+                "issue_number": int(number),
+            }
+            for i, (url, number) in enumerate(urls)
+        ]
+        return json.dumps(
+            {"answer": _text(rng, config.answer_bytes), "sources": sources}
+        )
+
+    @app.post("/{version}/models/{target}")
+    async def generate(request: Request, version: str, target: str):
+        _, _, method = target.partition(":")
+        prompt = _prompt(await request.json())
+
+        if method == "generateContent":
+            calls["gemini.generate_content"] += 1
+            await config.plan_latency.sleep()
+            return _candidate(json.dumps(query_plan(prompt)), finished=True)
+
+        calls["gemini.stream_generate_content"] += 1
+        text = answer(prompt)
+        size = math.ceil(len(text) / max(1, config.answer_chunks))
+        chunks = [text[i : i + size] for i in range(0, len(text), size)]
+
+        async def stream():
+            await config.first_chunk_latency.sleep()
+            for i, chunk in enumerate(chunks):
+                if i:
+                    await config.chunk_latency.sleep()
+                event = _candidate(chunk, finished=i == len(chunks) - 1)
+                yield f"data: {json.dumps(event)}\r\n\r\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    return app